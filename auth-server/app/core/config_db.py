@@ -1,5 +1,10 @@
 from sqlmodel import create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy.ext.asyncio import create_async_engine
+from typing import Union
 from app.core import settings
+from app.core.db_pool import StatsQueuePool, StatsAsyncAdaptedQueuePool
+from app.core.metrics import instrument_engine, register_pool_collector
 from sqlmodel import SQLModel
 from app.models import USER
 
@@ -9,18 +14,64 @@ connection_string = str(settings.DB_URL).replace(
     "postgresql", "postgresql+psycopg"
 )
 
+# Each engine gets its own pool of this size
+pool_options = {
+    "pool_size": settings.DB_POOL_SIZE,
+    "max_overflow": settings.DB_MAX_OVERFLOW,
+    "pool_timeout": settings.DB_POOL_TIMEOUT,
+    "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    "pool_recycle": settings.DB_POOL_RECYCLE,
+}
 
 engine = create_engine(
-    connection_string, connect_args={"sslmode": "require"}, pool_recycle=300
+    connection_string,
+    connect_args={"sslmode": settings.DB_SSLMODE},
+    poolclass=StatsQueuePool,
+    **pool_options,
 )
 
+# psycopg 3 picks its async connection class from the same postgresql+psycopg URL
+async_engine = create_async_engine(
+    connection_string, connect_args={"sslmode": settings.DB_SSLMODE}, poolclass=StatsAsyncAdaptedQueuePool, **pool_options
+) if settings.DB_ASYNC else None
+
+# Statement timings for /metrics, the async engine runs its statements on its sync_engine
+instrument_engine(engine, "sync")
+if async_engine is not None:
+    instrument_engine(async_engine.sync_engine, "async")
+
+# Either session works with the service layer
+DBSession = Union[Session, AsyncSession]
+
 # Dependency with retry mechanism for OperationalError
 
 
 def get_db():
-    with Session(engine) as session:
+    # A user rehashed on login is serialized after the commit, don't expire it and SELECT again on the event loop
+    with Session(engine, expire_on_commit=False) as session:
+        yield session
+
+
+async def get_async_db():
+    # Expired attributes can't lazy load outside of an await
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
         yield session
 
+# Session dependency used by the auth routes, switched with DB_ASYNC
+get_session = get_async_db if settings.DB_ASYNC else get_db
+
+
+def pool_stats() -> dict[str, dict]:
+    """
+    Checked out connections, overflow in use, checkout waits & timeouts of each engine's pool.
+    """
+    stats = {"sync": engine.pool.stats()}
+    if async_engine is not None:
+        stats["async"] = async_engine.pool.stats()
+    return stats
+
+register_pool_collector(pool_stats)
+
 
 def create_db_and_tables():
     SQLModel.metadata.create_all(engine)
@@ -0,0 +1,61 @@
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+import threading
+import time
+
+
+class PoolStatsMixin:
+    """
+    Counts a QueuePool's checkouts, the time they wait for a connection and the ones that
+    time out after pool_timeout, on top of the pool's own size & overflow counters.
+
+    The wait includes opening a new connection when the pool grows, and the pre-ping.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.checkout_timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def connect(self):
+        start = time.perf_counter()
+        timed_out = False
+        try:
+            return super().connect()
+        except PoolTimeoutError:
+            timed_out = True
+            raise
+        finally:
+            wait = time.perf_counter() - start
+            # Sync routes check out connections from threadpool threads
+            with self._stats_lock:
+                self.checkouts += 1
+                self.checkout_timeouts += timed_out
+                self.wait_seconds_total += wait
+                self.wait_seconds_max = max(self.wait_seconds_max, wait)
+
+    def stats(self) -> dict[str, int | float]:
+        return {
+            "size": self.size(),
+            "max_overflow": self._max_overflow,
+            "timeout": self.timeout(),
+            "checked_out": self.checkedout(),
+            "checked_in": self.checkedin(),
+            # Negative while the pool hasn't opened pool_size connections yet
+            "overflow_in_use": max(self.overflow(), 0),
+            "checkouts": self.checkouts,
+            "checkout_timeouts": self.checkout_timeouts,
+            "wait_seconds_total": self.wait_seconds_total,
+            "wait_seconds_max": self.wait_seconds_max,
+        }
+
+
+class StatsQueuePool(PoolStatsMixin, QueuePool):
+    pass
+
+
+class StatsAsyncAdaptedQueuePool(PoolStatsMixin, AsyncAdaptedQueuePool):
+    pass
@@ -0,0 +1,138 @@
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.registry import REGISTRY, Collector
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from typing import Callable
+import time
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template",
+    ["method", "route", "status"],
+)
+REQUESTS_IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests being served")
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds", "Database statement latency by engine and statement type",
+    ["engine", "statement"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+PASSWORD_HASH_DURATION = Histogram(
+    "password_hash_duration_seconds", "Password hashing & verification time",
+    ["operation"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+PASSWORD_HASH_QUEUE_WAIT = Histogram(
+    "password_hash_queue_wait_seconds", "Time a password hash or verification waited for a free hashing worker",
+    ["operation"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+PASSWORD_HASH_PENDING = Gauge(
+    "password_hash_pending", "Password hashes & verifications submitted to the hashing pool, running or queued",
+)
+PASSWORD_REHASHES = Counter(
+    "password_rehashes_total", "Stored password hashes replaced on login because their scheme or rounds are deprecated",
+)
+JWT_DURATION = Histogram(
+    "jwt_duration_seconds", "JWT encode & decode time",
+    ["operation"],
+    buckets=(0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.01),
+)
+
+# First keyword of a statement, anything else is counted as "OTHER" to keep the label bounded
+STATEMENT_TYPES = {"SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "LOCK", "ALTER", "CREATE", "DROP", "ANALYZE"}
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing every HTTP request until its response is sent, labeled with the
+    route template (e.g. /api/todos/{todo_id}) so ids don't create new series.
+
+    Streaming responses are timed until the stream ends.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+
+        async def send_wrapper(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            # The router adds the matched route to the scope
+            route = getattr(scope.get("route"), "path", "unmatched")
+            REQUEST_DURATION.labels(scope["method"], route, status).observe(time.perf_counter() - start)
+
+
+def instrument_engine(engine: Engine, name: str):
+    """
+    Time every statement run on the engine.
+    """
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._query_start = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        keyword = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+        DB_QUERY_DURATION.labels(name, keyword if keyword in STATEMENT_TYPES else "OTHER").observe(
+            time.perf_counter() - context._query_start)
+
+
+class PoolCollector(Collector):
+    """
+    Exposes the connection pool stats of each engine, read when /metrics is scraped.
+    """
+
+    def __init__(self, pool_stats: Callable[[], dict[str, dict]]):
+        self.pool_stats = pool_stats
+
+    def collect(self):
+        gauges = {
+            name: GaugeMetricFamily(f"db_pool_{name}", help_text, labels=["engine"])
+            for name, help_text in (
+                ("size", "Connections kept open by the pool"),
+                ("max_overflow", "Connections the pool may open beyond its size"),
+                ("checked_out", "Connections in use"),
+                ("overflow_in_use", "Connections in use beyond the pool size"),
+                ("wait_seconds_max", "Longest checkout wait"),
+            )
+        }
+        counters = {
+            name: CounterMetricFamily(f"db_pool_{name}", help_text, labels=["engine"])
+            for name, help_text in (
+                ("checkouts", "Connection checkouts"),
+                ("checkout_timeouts", "Checkouts that gave up after pool_timeout"),
+                ("wait_seconds", "Time spent waiting for a connection"),
+            )
+        }
+        for engine, stats in self.pool_stats().items():
+            for name, gauge in gauges.items():
+                gauge.add_metric([engine], stats[name])
+            counters["checkouts"].add_metric([engine], stats["checkouts"])
+            counters["checkout_timeouts"].add_metric([engine], stats["checkout_timeouts"])
+            counters["wait_seconds"].add_metric([engine], stats["wait_seconds_total"])
+        yield from gauges.values()
+        yield from counters.values()
+
+
+def register_pool_collector(pool_stats: Callable[[], dict[str, dict]]):
+    REGISTRY.register(PoolCollector(pool_stats))
+
+
+def metrics_response() -> Response:
+    return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
@@ -1,5 +1,6 @@
 from starlette.config import Config
-from starlette.datastructures import Secret
+from starlette.datastructures import CommaSeparatedStrings, Secret
+import os
 
 try:
     config = Config(".env")
@@ -8,8 +9,34 @@ except FileNotFoundError:
 
 DB_URL = config("DB_URL", cast=Secret)
 TEST_DB_URL = config("TEST_DB_URL", cast=Secret)
+# libpq sslmode for DB_URL, "disable" for a local Postgres without SSL
+DB_SSLMODE = config("DB_SSLMODE", default="require")
+
+# Connection pool of each engine (sync, and async with DB_ASYNC) per worker: pool_size kept open, max_overflow more under load, seconds a
+# checkout waits before failing, a liveness check on checkout & seconds before a connection is replaced
+DB_POOL_SIZE = config("DB_POOL_SIZE", cast=int, default=5)
+DB_MAX_OVERFLOW = config("DB_MAX_OVERFLOW", cast=int, default=10)
+DB_POOL_TIMEOUT = config("DB_POOL_TIMEOUT", cast=float, default=30)
+DB_POOL_PRE_PING = config("DB_POOL_PRE_PING", cast=bool, default=False)
+DB_POOL_RECYCLE = config("DB_POOL_RECYCLE", cast=int, default=300)
+
+# Serve the auth routes with an async engine & AsyncSession (psycopg 3 async), otherwise the sync
+# Session's queries run in the threadpool
+DB_ASYNC = config("DB_ASYNC", cast=bool, default=False)
+
+# Serve the /api/internal stats routes, 404 otherwise. They aren't authenticated,
+# only enable them where the port isn't reachable from outside
+INTERNAL_ENDPOINTS = config("INTERNAL_ENDPOINTS", cast=bool, default=False)
 
 SECRET_KEY = config("SECRET_KEY", cast=Secret)
 ALGORITHM = config("ALGORITHM", cast=Secret)
 ACCESS_TOKEN_EXPIRE_MINUTES = config("ACCESS_TOKEN_EXPIRE_MINUTES", cast=Secret)
-REFRESH_TOKEN_EXPIRE_MINUTES = config("REFRESH_TOKEN_EXPIRE_MINUTES", cast=Secret)
\ No newline at end of file
+REFRESH_TOKEN_EXPIRE_MINUTES = config("REFRESH_TOKEN_EXPIRE_MINUTES", cast=Secret)
+# Password hashing: new hashes use the first scheme, hashes in the others (or with rounds other than PASSWORD_HASH_ROUNDS)
+# are replaced on the next login. bcrypt & argon2 need the bcrypt / argon2-cffi packages installed
+PASSWORD_HASH_SCHEMES = config("PASSWORD_HASH_SCHEMES", cast=CommaSeparatedStrings, default="sha256_crypt")
+PASSWORD_HASH_ROUNDS = config("PASSWORD_HASH_ROUNDS", cast=int, default=None)
+# Hashing runs off the event loop on at most PASSWORD_HASH_CONCURRENCY workers, the rest queue.
+# "process" for sha256_crypt, which holds the GIL while hashing, "thread" is enough for bcrypt & argon2
+PASSWORD_HASH_EXECUTOR = config("PASSWORD_HASH_EXECUTOR", default="process")
+PASSWORD_HASH_CONCURRENCY = config("PASSWORD_HASH_CONCURRENCY", cast=int, default=os.cpu_count() or 1)
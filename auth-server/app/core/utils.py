@@ -2,14 +2,19 @@
 from fastapi import HTTPException, status, Security
 from fastapi.security import OAuth2PasswordBearer
 
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from typing import Union, Any
 from uuid import UUID
+import asyncio
+import multiprocessing
+import time
 
 from jose import jwt, JWTError
 from passlib.context import CryptContext
 
 from app.core import settings
+from app.core.metrics import PASSWORD_HASH_DURATION, PASSWORD_HASH_QUEUE_WAIT, PASSWORD_HASH_PENDING, JWT_DURATION
 
 SECRET_KEY = settings.SECRET_KEY
 ALGORITHM = settings.ALGORITHM
@@ -17,19 +22,105 @@ ACCESS_TOKEN_EXPIRE_MINUTES = settings.ACCESS_TOKEN_EXPIRE_MINUTES
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
-pwd_context = CryptContext(schemes=["sha256_crypt"], deprecated="auto")
+def password_context_options() -> dict:
+    """
+    CryptContext options from the settings, the first scheme is the default & the rest deprecated.
+    """
+    schemes = list(settings.PASSWORD_HASH_SCHEMES)
+    options: dict[str, Any] = {"schemes": schemes, "deprecated": "auto"}
+    if settings.PASSWORD_HASH_ROUNDS is not None:
+        # Hashes made with other rounds fall outside min / max and are updated on login
+        for option in ("default_rounds", "min_rounds", "max_rounds"):
+            options[f"{schemes[0]}__{option}"] = settings.PASSWORD_HASH_ROUNDS
+    return options
+
+pwd_context = CryptContext(**password_context_options())
 
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    with PASSWORD_HASH_DURATION.labels("verify").time():
+        return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    with PASSWORD_HASH_DURATION.labels("hash").time():
+        return pwd_context.hash(password)
+
+# Run in the hashing pool, return the result with the seconds spent hashing so the caller can tell it from queueing
+def _timed_hash(password: str) -> tuple[str, float]:
+    start = time.perf_counter()
+    return pwd_context.hash(password), time.perf_counter() - start
+
+def _timed_verify_and_update(plain_password: str, hashed_password: str) -> tuple[tuple[bool, Union[str, None]], float]:
+    start = time.perf_counter()
+    return pwd_context.verify_and_update(plain_password, hashed_password), time.perf_counter() - start
+
+_hash_executor: Union[Executor, None] = None
+
+def hash_process_context():
+    """
+    Start method for hashing processes. fork would copy a process that already runs threads
+    (the threadpool, the executor's own manager thread) and can deadlock the child on a lock
+    one of them held, a forkserver forks from a clean single-threaded server instead.
+    """
+    if "forkserver" not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("spawn")
+    context = multiprocessing.get_context("forkserver")
+    # Workers start with this module imported from the server, not each on its own
+    context.set_forkserver_preload([__name__])
+    return context
+
+def start_hash_executor() -> Executor:
+    """
+    Creates the pool password hashing runs on, at startup. Outside the app (scripts, tests) the
+    first hash creates it.
+    """
+    global _hash_executor
+    if _hash_executor is None:
+        if settings.PASSWORD_HASH_EXECUTOR == "process":
+            _hash_executor = ProcessPoolExecutor(max_workers=settings.PASSWORD_HASH_CONCURRENCY, mp_context=hash_process_context())
+        else:
+            _hash_executor = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_CONCURRENCY, thread_name_prefix="password-hash")
+    return _hash_executor
+
+async def shutdown_hash_executor():
+    global _hash_executor
+    executor, _hash_executor = _hash_executor, None
+    if executor is not None:
+        # Waiting for the workers to exit blocks, keep it off the event loop
+        await asyncio.to_thread(executor.shutdown, cancel_futures=True)
+
+async def _run_hashing(operation: str, fn, *args):
+    """
+    Runs fn in the hashing pool, recording the hashing time and how long it queued behind other hashes.
+    """
+    PASSWORD_HASH_PENDING.inc()
+    start = time.perf_counter()
+    try:
+        result, seconds = await asyncio.get_running_loop().run_in_executor(start_hash_executor(), fn, *args)
+    finally:
+        PASSWORD_HASH_PENDING.dec()
+    PASSWORD_HASH_DURATION.labels(operation).observe(seconds)
+    PASSWORD_HASH_QUEUE_WAIT.labels(operation).observe(max(0.0, time.perf_counter() - start - seconds))
+    return result
+
+async def get_password_hash_async(password: str) -> str:
+    return await _run_hashing("hash", _timed_hash, password)
+
+async def verify_and_update_password_async(plain_password: str, hashed_password: str) -> tuple[bool, Union[str, None]]:
+    """
+    Verifies the password off the event loop.
+
+    Returns:
+        (verified, new_hash): new_hash is set when the stored hash uses a deprecated scheme or too few rounds
+        and should replace it.
+    """
+    return await _run_hashing("verify", _timed_verify_and_update, plain_password, hashed_password)
 
 async def get_current_user_dep(token: str | None = Security(oauth2_scheme)):
     try:
         if not token:
             raise credentials_exception
-        payload = jwt.decode(token, str(SECRET_KEY), algorithms=[str(ALGORITHM)])
+        with JWT_DURATION.labels("decode").time():
+            payload = jwt.decode(token, str(SECRET_KEY), algorithms=[str(ALGORITHM)])
         user_id: UUID = UUID(payload.get("id"))
         # You can add more user-related validation here if needed
         return user_id
@@ -44,7 +135,8 @@ async def get_current_user_dep(token: str | None = Security(oauth2_scheme)):
 async def validate_refresh_token(refresh_token: str) -> Union[str, None]:
     try:
 
-        payload: dict[str, Any] = jwt.decode(refresh_token, str(SECRET_KEY), algorithms=[str(ALGORITHM)])
+        with JWT_DURATION.labels("decode").time():
+            payload: dict[str, Any] = jwt.decode(refresh_token, str(SECRET_KEY), algorithms=[str(ALGORITHM)])
         user_id: Union[str, None] = payload.get("id")
 
         # If user_id is None, the token is invalid
@@ -68,7 +160,8 @@ def create_refresh_token(data: dict, expires_delta: Union[timedelta, None] = Non
 
     to_encode.update({"exp": expire})
 
-    encoded_jwt = jwt.encode(to_encode, str(SECRET_KEY), algorithm=str(ALGORITHM))
+    with JWT_DURATION.labels("encode").time():
+        encoded_jwt = jwt.encode(to_encode, str(SECRET_KEY), algorithm=str(ALGORITHM))
 
     return encoded_jwt
 
@@ -77,4 +170,12 @@ credentials_exception = HTTPException(
     status_code=status.HTTP_401_UNAUTHORIZED,
     headers={"WWW-Authenticate": 'Bearer'},
     detail={"error": "invalid_token", "error_description": "The access token expired"}
-)
\ No newline at end of file
+)
+
+
+def internal_endpoints_enabled():
+    """
+    Dependency of the /api/internal routes, they 404 unless INTERNAL_ENDPOINTS is set.
+    """
+    if not settings.INTERNAL_ENDPOINTS:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
@@ -1,8 +1,10 @@
-from sqlmodel import Session, select
+from sqlmodel import Session, select, or_
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from typing import Union
 
-from app.models import RegisterUser, USER
-from app.core.utils import get_password_hash
+from app.models import USER
+from app.core.metrics import PASSWORD_REHASHES
 
 
 class InvalidUserException(Exception):
@@ -16,18 +18,20 @@ class InvalidUserException(Exception):
         super().__init__(detail)
 
 
+def user_query(username: str):
+    return select(USER).where(USER.username == username)
+
+
 def get_user(db: Session, username: Union[str, None] = None):
 
     try:
         if username is None:
             raise InvalidUserException(status_code=404, detail="Username not provided")
 
-        user_query = select(USER).where(USER.username == username)
-        user = db.exec(user_query).first()
+        user = db.exec(user_query(username)).first()
 
         if not user:
             raise InvalidUserException(status_code=404, detail="User not found")
-        print("user", user)
         return user
     except InvalidUserException:
         raise
@@ -36,36 +40,136 @@ def get_user(db: Session, username: Union[str, None] = None):
         raise InvalidUserException(status_code=400, detail=str(e))
 
 
-async def db_signup_users(
-    user_data: RegisterUser, db: Session
-):
-    # Check if user already exists
-    existing_user_email_query = select(USER).where((USER.email == user_data.email))
-    existing_user_email = db.exec(existing_user_email_query).first()
-    if existing_user_email:
-        raise InvalidUserException(status_code=400, detail="Email already registered")
-    
-    existing_user_query = select(USER).where((USER.username == user_data.username))
-    existing_user = db.exec(existing_user_query).first()
-    if existing_user:
-        raise InvalidUserException(status_code=400, detail="Username already registered")
-
-    # Hash the password
-    hashed_password = get_password_hash(user_data.password)
-
-    # Create new user instance
-    new_user = USER(
-        username=user_data.username,
-        email=user_data.email,
-        full_name=user_data.full_name,
-        hashed_password=hashed_password,
-    )
-
-    # Add new user to the database
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+async def get_user_async(db: AsyncSession, username: Union[str, None] = None):
+    """
+    Async variant of get_user.
+    """
+    try:
+        if username is None:
+            raise InvalidUserException(status_code=404, detail="Username not provided")
+
+        user = (await db.exec(user_query(username))).first()
+
+        if not user:
+            raise InvalidUserException(status_code=404, detail="User not found")
+        return user
+    except InvalidUserException:
+        raise
+    except Exception as e:
+        print("Exception", e)
+        raise InvalidUserException(status_code=400, detail=str(e))
+
+
+def update_user_password_hash(db: Session, user: USER, hashed_password: str):
+    """
+    Replaces a user's password hash after a login found it deprecated. A failure only keeps the
+    old hash, the login goes on.
+    """
+    try:
+        user.hashed_password = hashed_password
+        db.add(user)
+        db.commit()
+        PASSWORD_REHASHES.inc()
+    except Exception as e:
+        db.rollback()
+        print("Exception", e)
+
+
+async def update_user_password_hash_async(db: AsyncSession, user: USER, hashed_password: str):
+    """
+    Async variant of update_user_password_hash.
+    """
+    try:
+        user.hashed_password = hashed_password
+        db.add(user)
+        await db.commit()
+        PASSWORD_REHASHES.inc()
+    except Exception as e:
+        await db.rollback()
+        print("Exception", e)
+
+
+def signup_user_statement(user: USER):
+    """
+    INSERT of a new user that does nothing when the email or username is taken, returning the
+    row when it was inserted.
+    """
+    return (pg_insert(USER).values(**user.model_dump())
+            .on_conflict_do_nothing()
+            .returning(*USER.__table__.columns))
+
+
+def signup_conflict_query(user: USER):
+    """
+    Which of email / username a failed signup collided with.
+    """
+    return select(USER.email, USER.username).where(or_(USER.email == user.email, USER.username == user.username))
+
+
+def signup_conflict_error(user: USER, taken) -> InvalidUserException:
+    # Report the email first like the old pre-check SELECTs did
+    if any(email == user.email for email, _ in taken):
+        return InvalidUserException(status_code=400, detail="Email already registered")
+    return InvalidUserException(status_code=400, detail="Username already registered")
+
+
+def db_check_signup_available(db: Session, new_user: USER):
+    """
+    Raises when the email or username is already taken, one lookup on their unique indexes.
+
+    Runs before the password is hashed so a taken signup doesn't pay for the hash, the
+    INSERT's ON CONFLICT still catches a signup racing this one.
+    """
+    taken = db.execute(signup_conflict_query(new_user)).all()
+    if taken:
+        raise signup_conflict_error(new_user, taken)
+
+
+async def db_check_signup_available_async(db: AsyncSession, new_user: USER):
+    """
+    Async variant of db_check_signup_available.
+    """
+    taken = (await db.execute(signup_conflict_query(new_user))).all()
+    if taken:
+        raise signup_conflict_error(new_user, taken)
+
+
+def db_signup_users(db: Session, new_user: USER):
+    """
+    Inserts a new user with its password already hashed, in one statement: the unique indexes
+    on email & username decide if the user already exists.
+    """
+    try:
+        row = db.execute(signup_user_statement(new_user)).first()
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print("Exception", e)
+        raise InvalidUserException(status_code=400, detail=str(e))
+
+    if row is None:
+        # Only a taken email or username gets here
+        raise signup_conflict_error(new_user, db.execute(signup_conflict_query(new_user)).all())
 
     # Return the new user data
-    return new_user
+    return USER.model_validate(row._mapping)
 
+
+async def db_signup_users_async(db: AsyncSession, new_user: USER):
+    """
+    Async variant of db_signup_users.
+    """
+    try:
+        row = (await db.execute(signup_user_statement(new_user))).first()
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        print("Exception", e)
+        raise InvalidUserException(status_code=400, detail=str(e))
+
+    if row is None:
+        # Only a taken email or username gets here
+        raise signup_conflict_error(new_user, (await db.execute(signup_conflict_query(new_user))).all())
+
+    # Return the new user data
+    return USER.model_validate(row._mapping)
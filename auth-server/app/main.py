@@ -1,5 +1,4 @@
 from typing import Annotated, Optional
-from sqlmodel import Session
 
 from fastapi import Depends, FastAPI, Form, HTTPException
 from fastapi.security import OAuth2PasswordRequestForm
@@ -9,15 +8,19 @@ from contextlib import asynccontextmanager
 
 # Now you can use relative imports
 from app.models import RegisterUser, UserOutput, LoginResonse, GPTToken
-from app.core.config_db import get_db, create_db_and_tables
+from app.core.config_db import get_session, create_db_and_tables, pool_stats, DBSession
 from app.service import service_signup_users, service_login_for_access_token, create_access_token, gpt_tokens_service
-from app.core.utils import get_current_user_dep
+from app.core.utils import get_current_user_dep, start_hash_executor, shutdown_hash_executor, internal_endpoints_enabled
+from app.core.metrics import MetricsMiddleware, metrics_response
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     print("Creating Tables")
     create_db_and_tables()
+    # Before any request, so hashing processes aren't started from a busy worker
+    start_hash_executor()
     yield
+    await shutdown_hash_executor()
 
 
 app = FastAPI(
@@ -38,15 +41,28 @@ app = FastAPI(
     docs_url="/api/docs"
 )
 
+# Request latency & in-flight requests for /metrics
+app.add_middleware(MetricsMiddleware)
+
+# Prometheus scrape endpoint: request latency, DB statement timings, pool stats, password hashing & JWT timings
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return metrics_response()
+
+# Connection pool saturation, checked out vs size + max_overflow, waits & timeouts
+@app.get("/api/internal/db-pool", include_in_schema=False, dependencies=[Depends(internal_endpoints_enabled)])
+async def db_pool_stats():
+    return pool_stats()
+
 # user_auth.py web layer routes
 @app.post("/api/oauth/login", response_model=LoginResonse, tags=["OAuth2 Authentication"])
-async def login_authorization(form_data: Annotated[OAuth2PasswordRequestForm, Depends()], db: Session = Depends(get_db)):
+async def login_authorization(form_data: Annotated[OAuth2PasswordRequestForm, Depends()], db: DBSession = Depends(get_session)):
     """
     Authorization URL for OAuth2
 
     Args:
         form_data (Annotated[OAuth2PasswordRequestForm, Depends()]): Form Data
-        db (Session, optional): Dependency Injection
+        db (DBSession, optional): Dependency Injection
 
     Returns:
         LoginResonse: Login Response
@@ -101,14 +117,14 @@ async def get_temp_code(user_id: UUID):
 
 @app.post("/api/oauth/signup", response_model=UserOutput, tags=["OAuth2 Authentication"])
 async def signup_users(
-    user_data: RegisterUser, db: Session = Depends(get_db)
+    user_data: RegisterUser, db: DBSession = Depends(get_session)
 ):
     """
     Signup Users
 
     Args:
         user_data (RegisterUser): User Data
-        db (Session, optional):  Dependency Injection
+        db (DBSession, optional):  Dependency Injection
 
     Returns:
         UserOutput: User Output
@@ -1,7 +1,8 @@
 from datetime import datetime, timedelta, timezone
-from typing import Annotated, Optional
+from typing import Annotated, Any, Callable, Optional
 
-from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from starlette.concurrency import run_in_threadpool
 from fastapi import Depends, HTTPException, status, Form
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 
@@ -10,11 +11,12 @@ from jose import JWTError, jwt
 from uuid import UUID
 
 from app.core import settings
+from app.core.metrics import JWT_DURATION
 
-from app.models import TokenData, RegisterUser
-from app.core.config_db import get_db
-from app.core.utils import verify_password, credentials_exception, create_refresh_token, validate_refresh_token, get_current_user_dep
-from app.crud import get_user, db_signup_users, InvalidUserException
+from app.models import TokenData, RegisterUser, USER
+from app.core.config_db import get_session, DBSession
+from app.core.utils import get_password_hash_async, verify_and_update_password_async, credentials_exception, create_refresh_token, validate_refresh_token, get_current_user_dep
+from app.crud import get_user, get_user_async, db_check_signup_available, db_check_signup_available_async, db_signup_users, db_signup_users_async, update_user_password_hash, update_user_password_hash_async, InvalidUserException
 
 # to get a string like this run:
 # openssl rand -hex 32
@@ -26,12 +28,33 @@ REFRESH_TOKEN_EXPIRE_MINUTES = float(str(settings.REFRESH_TOKEN_EXPIRE_MINUTES))
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 
-def authenticate_user(db, username: str, password: str):
+async def run_crud(db: DBSession, sync_fn: Callable[..., Any], async_fn: Callable[..., Any], **kwargs: Any) -> Any:
+    """
+    Run a crud function against the session in use.
+
+    Args:
+        db (DBSession): A sync Session or an AsyncSession, depending on DB_ASYNC.
+        sync_fn (Callable): The crud function for a sync Session, run in the threadpool.
+        async_fn (Callable): Its async variant for an AsyncSession, awaited on the event loop.
+        **kwargs: Arguments for the crud function, except db.
+
+    Returns:
+        The crud function's result.
+    """
+    if isinstance(db, AsyncSession):
+        return await async_fn(db=db, **kwargs)
+    return await run_in_threadpool(sync_fn, db=db, **kwargs)
+
+
+async def authenticate_user(db, username: str, password: str):
     """
     Authenticates a user by checking if the provided username and password match the stored credentials.
 
+    The password is verified in the hashing pool, off the event loop. A stored hash in a deprecated
+    scheme or with rounds other than the configured ones is replaced by a fresh one.
+
     Args:
-        db: The database object used for querying user information.
+        db (DBSession): The database session, sync or async.
         username (str): The username of the user to authenticate.
         password (str): The password of the user to authenticate.
 
@@ -39,12 +62,15 @@ def authenticate_user(db, username: str, password: str):
         user: The authenticated user object if the credentials are valid, False otherwise.
     """
     try: 
-        user = get_user(db, username)
+        user = await run_crud(db, get_user, get_user_async, username=username)
         if not user:
             return False
         print("\n ------------- \n user.hashed_password", user.hashed_password)
-        if not verify_password(password, user.hashed_password):
+        verified, new_hash = await verify_and_update_password_async(password, user.hashed_password)
+        if not verified:
             return False
+        if new_hash:
+            await run_crud(db, update_user_password_hash, update_user_password_hash_async, user=user, hashed_password=new_hash)
         return user
     except InvalidUserException:
         raise
@@ -75,19 +101,20 @@ def create_access_token(data: dict, expires_delta: Union[timedelta, None] = None
 
     to_encode.update({"exp": expire})
 
-    encoded_jwt = jwt.encode(to_encode, str(
-        SECRET_KEY), algorithm=str(ALGORITHM))
+    with JWT_DURATION.labels("encode").time():
+        encoded_jwt = jwt.encode(to_encode, str(
+            SECRET_KEY), algorithm=str(ALGORITHM))
 
     return encoded_jwt
 
 
-async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)], db: Session = Depends(get_db)):
+async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)], db: DBSession = Depends(get_session)):
     """
     Get the current authenticated user based on the provided token.
 
     Args:
         token (str): The authentication token.
-        db (Session): The database session.
+        db (DBSession): The database session.
 
     Returns:
         User: The authenticated user.
@@ -102,35 +129,36 @@ async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)], db: Se
     )
     try:
 
-        payload = jwt.decode(token, str(SECRET_KEY),
-                             algorithms=[str(ALGORITHM)])
+        with JWT_DURATION.labels("decode").time():
+            payload = jwt.decode(token, str(SECRET_KEY),
+                                 algorithms=[str(ALGORITHM)])
         username: Union[str, None] = payload.get("sub")
         if username is None:
             raise credentials_exception
         token_data = TokenData(username=username)
     except JWTError:
         raise credentials_exception
-    user = get_user(db, username=token_data.username)
+    user = await run_crud(db, get_user, get_user_async, username=token_data.username)
     if user is None:
         raise credentials_exception
     return user
 
 
 async def service_login_for_access_token(
-    form_data: Annotated[OAuth2PasswordRequestForm, Depends()], db: Session = Depends(get_db)
+    form_data: Annotated[OAuth2PasswordRequestForm, Depends()], db: DBSession = Depends(get_session)
 ):
     """
     Authenticates the user and generates an access token.
 
     Args:
         form_data (OAuth2PasswordRequestForm): The form data containing the username and password.
-        db (Session, optional): The database session. Defaults to Depends(get_db).
+        db (DBSession, optional): The database session. Defaults to Depends(get_session).
 
     Returns:
         dict: A dictionary containing the access token, token type, and user information.
     """
     try:
-        user = authenticate_user(db, form_data.username, form_data.password)
+        user = await authenticate_user(db, form_data.username, form_data.password)
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -157,14 +185,14 @@ async def service_login_for_access_token(
 
 
 async def service_signup_users(
-    user_data: RegisterUser, db: Session = Depends(get_db)
+    user_data: RegisterUser, db: DBSession = Depends(get_session)
 ):
     """
     Service function to sign up users.
 
     Args:
         user_data (RegisterUser): The user data to be registered.
-        db (Session, optional): The database session. Defaults to Depends(get_db).
+        db (DBSession, optional): The database session. Defaults to Depends(get_session).
 
     Returns:
         The result of the user registration.
@@ -173,7 +201,16 @@ async def service_signup_users(
         HTTPException: If there is an invalid user exception or any other unforeseen exception.
     """
     try:
-        return await db_signup_users(user_data, db)
+        new_user = USER(
+            username=user_data.username,
+            email=user_data.email,
+            full_name=user_data.full_name,
+        )
+        # A taken email or username is turned away before the hash, the most expensive step
+        await run_crud(db, db_check_signup_available, db_check_signup_available_async, new_user=new_user)
+        # The request body is validated by now, hash the password off the event loop
+        new_user.hashed_password = await get_password_hash_async(user_data.password)
+        return await run_crud(db, db_signup_users, db_signup_users_async, new_user=new_user)
     except InvalidUserException as e:
         # Catch the InvalidUserException and raise an HTTPException
         raise HTTPException(status_code=e.status_code, detail=e.detail)
@@ -0,0 +1,191 @@
+"""
+Throughput & latency of the password hashing and JWT calls on the login and token refresh paths.
+
+    python -m benchmarks.crypto [--hash sha256_crypt:100000 --hash pbkdf2_sha256] [--algorithm HS256 --algorithm RS256]
+                                [--claims 0 --claims 20] [--seconds 1] [--out crypto.json] [--baseline crypto.json]
+
+Two groups of cases:
+
+- app: verify_password, get_password_hash, create_access_token, create_refresh_token,
+  validate_refresh_token & get_current_user_dep as configured by the environment, metrics included
+- matrix: passlib hash / verify per --hash (SCHEME[:ROUNDS]) and jose encode / decode per
+  --algorithm and --claims (extra claims on top of sub, id & exp)
+
+Each case runs for --seconds on one core, no database or HTTP. Needs the app's settings in the
+environment (DB_URL, TEST_DB_URL, SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES,
+REFRESH_TOKEN_EXPIRE_MINUTES), nothing is connected to. --out stores the results as JSON,
+--baseline prints the change against an earlier --out.
+"""
+from datetime import datetime, timedelta, timezone
+from functools import partial
+from uuid import uuid4
+import argparse
+import asyncio
+import inspect
+import json
+import platform
+import time
+
+from jose import jwt
+from passlib.context import CryptContext
+
+from app.core import settings
+from app.core.utils import verify_password, get_password_hash, create_refresh_token, validate_refresh_token, get_current_user_dep
+from app.service import create_access_token
+
+PASSWORD = "correct horse battery staple"
+
+
+def percentile(ordered: list[float], pct: float) -> float:
+    rank = max(0, -(-len(ordered) * pct // 100) - 1)
+    return ordered[int(rank)]
+
+
+def summarize(latencies: list[float]) -> dict:
+    ordered = sorted(latencies)
+    return {
+        "ops": len(ordered),
+        "ops_per_sec": round(len(ordered) / sum(ordered), 1),
+        "mean_us": round(sum(ordered) / len(ordered) * 1e6, 2),
+        "p50_us": round(percentile(ordered, 50) * 1e6, 2),
+        "p95_us": round(percentile(ordered, 95) * 1e6, 2),
+        "p99_us": round(percentile(ordered, 99) * 1e6, 2),
+    }
+
+
+def measure(fn, seconds: float, min_ops: int = 5) -> dict:
+    """
+    Calls fn until seconds have passed, timing every call. Coroutine functions are awaited.
+    """
+    latencies: list[float] = []
+    if inspect.iscoroutinefunction(fn):
+        async def run():
+            deadline = time.perf_counter() + seconds
+            while time.perf_counter() < deadline or len(latencies) < min_ops:
+                start = time.perf_counter()
+                await fn()
+                latencies.append(time.perf_counter() - start)
+        asyncio.run(run())
+    else:
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline or len(latencies) < min_ops:
+            start = time.perf_counter()
+            fn()
+            latencies.append(time.perf_counter() - start)
+    return summarize(latencies)
+
+
+def app_cases() -> dict:
+    """
+    The app's own functions, with the configured scheme, secret & algorithm.
+    """
+    hashed = get_password_hash(PASSWORD)
+    data = {"sub": "benchmark", "id": uuid4()}
+    expires = timedelta(minutes=15)
+    access_token = create_access_token(data, expires)
+    refresh_token = create_refresh_token(data, expires)
+    return {
+        "app verify_password": partial(verify_password, PASSWORD, hashed),
+        "app get_password_hash": partial(get_password_hash, PASSWORD),
+        "app create_access_token": partial(create_access_token, data, expires),
+        "app create_refresh_token": partial(create_refresh_token, data, expires),
+        # partial keeps these coroutine functions, so measure() awaits them
+        "app validate_refresh_token": partial(validate_refresh_token, refresh_token),
+        "app get_current_user_dep": partial(get_current_user_dep, access_token),
+    }
+
+
+def hash_cases(spec: str) -> dict:
+    scheme, _, rounds = spec.partition(":")
+    options = {f"{scheme}__rounds": int(rounds)} if rounds else {}
+    context = CryptContext(schemes=[scheme], **options)
+    hashed = context.hash(PASSWORD)
+    label = f"{scheme} rounds={rounds or 'default'}"
+    return {
+        f"hash {label}": lambda: context.hash(PASSWORD),
+        f"verify {label}": lambda: context.verify(PASSWORD, hashed),
+    }
+
+
+def signing_keys(algorithm: str) -> tuple[str, str]:
+    """
+    (signing key, verifying key) for an algorithm, RSA & EC keys are generated per run.
+    """
+    if algorithm.startswith("HS"):
+        secret = str(settings.SECRET_KEY)
+        return secret, secret
+
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import ec, rsa
+
+    if algorithm.startswith(("RS", "PS")):
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    elif algorithm.startswith("ES"):
+        curve = {"ES256": ec.SECP256R1(), "ES384": ec.SECP384R1(), "ES512": ec.SECP521R1()}[algorithm]
+        private_key = ec.generate_private_key(curve)
+    else:
+        raise ValueError(f"Unsupported algorithm {algorithm}")
+    private_pem = private_key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                            serialization.NoEncryption()).decode()
+    public_pem = private_key.public_key().public_bytes(serialization.Encoding.PEM,
+                                                       serialization.PublicFormat.SubjectPublicKeyInfo).decode()
+    return private_pem, public_pem
+
+
+def jwt_cases(algorithm: str, claims: int) -> dict:
+    signing_key, verifying_key = signing_keys(algorithm)
+    payload = {"sub": "benchmark", "id": str(uuid4()), "exp": datetime.now(timezone.utc) + timedelta(hours=1)}
+    payload.update({f"claim_{i}": f"value-{i:04d}" for i in range(claims)})
+    token = jwt.encode(payload, signing_key, algorithm=algorithm)
+    label = f"{algorithm} claims={claims} bytes={len(token)}"
+    return {
+        f"jwt encode {label}": lambda: jwt.encode(payload, signing_key, algorithm=algorithm),
+        f"jwt decode {label}": lambda: jwt.decode(token, verifying_key, algorithms=[algorithm]),
+    }
+
+
+def compare(results: dict, baseline: dict) -> None:
+    for name, result in results.items():
+        base = baseline["results"].get(name)
+        if base is None:
+            continue
+        change = (result["ops_per_sec"] - base["ops_per_sec"]) / base["ops_per_sec"] * 100
+        print(f"{name:60} {base['ops_per_sec']:>12.1f} -> {result['ops_per_sec']:>12.1f} ops/s {change:+7.1f}%")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--hash", action="append", help="SCHEME[:ROUNDS], default sha256_crypt & sha256_crypt:100000")
+    parser.add_argument("--algorithm", action="append", help="JWT algorithm, default HS256, HS512 & RS256")
+    parser.add_argument("--claims", type=int, action="append", help="Extra JWT claims, default 0 & 20")
+    parser.add_argument("--seconds", type=float, default=1.0, help="Time per case")
+    parser.add_argument("--no-app", action="store_true", help="Skip the app's own functions")
+    parser.add_argument("--out", help="Write the results as JSON")
+    parser.add_argument("--baseline", help="Earlier --out to compare against")
+    args = parser.parse_args()
+
+    cases = {} if args.no_app else app_cases()
+    for spec in args.hash or ["sha256_crypt", "sha256_crypt:100000"]:
+        cases.update(hash_cases(spec))
+    for algorithm in args.algorithm or ["HS256", "HS512", "RS256"]:
+        for claims in args.claims or [0, 20]:
+            cases.update(jwt_cases(algorithm, claims))
+
+    results = {}
+    for name, fn in cases.items():
+        results[name] = measure(fn, args.seconds)
+        result = results[name]
+        print(f"{name:60} {result['ops_per_sec']:>12.1f} ops/s  p50 {result['p50_us']:>10.1f} us  "
+              f"p95 {result['p95_us']:>10.1f} us  p99 {result['p99_us']:>10.1f} us")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"meta": {"python": platform.python_version(), "machine": platform.machine(), "processor": platform.processor(),
+                                "algorithm": str(settings.ALGORITHM), "seconds": args.seconds}, "results": results}, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
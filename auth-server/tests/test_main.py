@@ -1,17 +1,26 @@
 from fastapi.testclient import TestClient
 from fastapi.exceptions import HTTPException
 
+from concurrent.futures import ThreadPoolExecutor
 from uuid import UUID
+import asyncio
 import pytest
-from unittest.mock import patch, AsyncMock
+from passlib.context import CryptContext
+from unittest.mock import patch, AsyncMock, Mock
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlmodel import SQLModel, create_engine, Session
+from sqlalchemy.dialects import postgresql
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 # Now you can use relative imports
 from app.main import app
 from app.core import settings
 from app.core.config_db import get_db
-from app.core.utils import get_password_hash
-from app.models import LoginResonse, UserOutput, UserInDB, RegisterUser, UserInDB, UserOutput
+from app.core.db_pool import StatsQueuePool
+from app.core.utils import get_password_hash, verify_and_update_password_async, hash_process_context
+from app.crud import signup_user_statement
+from app.service import run_crud, service_signup_users
+from app.models import USER, LoginResonse, UserOutput, UserInDB, RegisterUser, UserInDB, UserOutput
 
 
 connection_string = str(settings.TEST_DB_URL).replace(
@@ -198,4 +207,90 @@ def test_tokens_manager_oauth_code_flow_with_refresh_token():
 
             # Assert that an access token is present and is a string
             assert "access_token" in response_data
-            assert isinstance(response_data["access_token"], str)
\ No newline at end of file
+            assert isinstance(response_data["access_token"], str)
+
+
+def test_stats_queue_pool_counts_checkouts_and_timeouts():
+    pool = StatsQueuePool(lambda: Mock(), pool_size=1, max_overflow=0, timeout=0.01)
+
+    held = pool.connect()
+    assert pool.stats()["checked_out"] == 1
+    with pytest.raises(PoolTimeoutError):
+        pool.connect()
+    held.close()
+
+    stats = pool.stats()
+    assert stats["checked_out"] == 0 and stats["checked_in"] == 1
+    assert stats["checkouts"] == 2 and stats["checkout_timeouts"] == 1
+    assert stats["wait_seconds_max"] >= 0.01
+
+
+def test_metrics():
+    client.get("/api/oauth/temp-code", params={"user_id": "123e4567-e89b-12d3-a456-426655440000"})
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/oauth/temp-code",status="200"}' in response.text
+    assert 'jwt_duration_seconds_count{operation="encode"}' in response.text
+    assert 'db_pool_size{engine="sync"}' in response.text
+
+
+def test_internal_endpoints_disabled_by_default():
+    assert client.get("/api/internal/db-pool").status_code == 404
+
+
+def test_internal_endpoints_enabled():
+    with patch.object(settings, "INTERNAL_ENDPOINTS", True):
+        assert "sync" in client.get("/api/internal/db-pool").json()
+
+
+def test_verify_and_update_password_async_rehashes_deprecated_scheme():
+    old_hash = CryptContext(schemes=["md5_crypt"]).hash("testpass")
+    migrating_context = CryptContext(schemes=["sha256_crypt", "md5_crypt"], deprecated="auto")
+
+    with ThreadPoolExecutor(max_workers=1) as executor, \
+            patch("app.core.utils.pwd_context", migrating_context), patch("app.core.utils._hash_executor", executor):
+        assert asyncio.run(verify_and_update_password_async("wrongpass", old_hash)) == (False, None)
+        verified, new_hash = asyncio.run(verify_and_update_password_async("testpass", old_hash))
+        assert verified and migrating_context.identify(new_hash) == "sha256_crypt"
+        assert asyncio.run(verify_and_update_password_async("testpass", new_hash)) == (True, None)
+
+
+def test_signup_user_statement_is_a_single_insert():
+    user = USER(username="test", email="test@example.com", full_name="Test User", hashed_password="hash")
+
+    sql = str(signup_user_statement(user).compile(dialect=postgresql.dialect()))
+
+    assert sql.startswith('INSERT INTO "user"')
+    assert "ON CONFLICT DO NOTHING RETURNING" in sql
+
+
+def test_signup_taken_email_skips_password_hash():
+    db = Mock(spec=Session)
+    db.execute.return_value.all.return_value = [("test@example.com", "other")]
+    user_data = RegisterUser(username="test", email="test@example.com", full_name="Test User", password="testpass")
+
+    with patch("app.service.get_password_hash_async", new_callable=AsyncMock) as hash_password:
+        with pytest.raises(HTTPException) as exc_info:
+            asyncio.run(service_signup_users(user_data, db))
+
+    assert exc_info.value.status_code == 400 and exc_info.value.detail == "Email already registered"
+    hash_password.assert_not_awaited()
+    db.commit.assert_not_called()
+
+
+def test_run_crud_dispatches_on_session_type():
+    sync_fn, async_fn = Mock(return_value="sync"), AsyncMock(return_value="async")
+
+    assert asyncio.run(run_crud(Mock(spec=Session), sync_fn, async_fn, username="test")) == "sync"
+    assert asyncio.run(run_crud(Mock(spec=AsyncSession), sync_fn, async_fn, username="test")) == "async"
+    sync_fn.assert_called_once()
+    async_fn.assert_awaited_once()
+    assert async_fn.await_args.kwargs["username"] == "test"
+
+
+def test_hash_process_context_does_not_fork():
+    # The app's worker runs threads by the time hashing processes start
+    assert hash_process_context().get_start_method() != "fork"
@@ -0,0 +1,322 @@
+"""
+Load generator for the auth + todo request flow.
+
+    python loadtest/run.py [--auth-url http://localhost:8080] [--todo-url http://localhost:8000]
+                           [--concurrency 10] [--duration 10] [--out result.json] [--baseline baseline.json]
+
+Each scenario runs for --duration seconds with --concurrency workers, each worker sending its
+next request as soon as the last one answered. Results are written as JSON, per operation:
+requests, errors, rps and p50/p95/p99 latency in milliseconds. With --baseline the run is
+compared against an earlier result and exits 1 when an operation lost more than --tolerance
+of its rps or gained more than --tolerance on its p95.
+
+Both servers have to be running already, see loadtest/readme.md.
+"""
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from uuid import uuid4
+import argparse
+import asyncio
+import json
+import platform
+import sys
+import time
+
+import httpx
+
+SCENARIOS = ["login", "refresh", "list", "create", "patch_delete"]
+
+
+@dataclass
+class OpStats:
+    """
+    Latencies of one operation, in seconds.
+    """
+    latencies: list[float] = field(default_factory=list)
+    errors: int = 0
+
+    def summary(self, elapsed: float) -> dict:
+        ordered = sorted(self.latencies)
+        return {
+            "requests": len(ordered),
+            "errors": self.errors,
+            "rps": round(len(ordered) / elapsed, 2) if elapsed else 0.0,
+            "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3) if ordered else None,
+            "p50_ms": percentile(ordered, 50),
+            "p95_ms": percentile(ordered, 95),
+            "p99_ms": percentile(ordered, 99),
+            "max_ms": round(ordered[-1] * 1000, 3) if ordered else None,
+        }
+
+
+def percentile(ordered: list[float], pct: float) -> float | None:
+    """
+    Nearest-rank percentile of sorted latencies, in milliseconds.
+    """
+    if not ordered:
+        return None
+    rank = max(0, -(-len(ordered) * pct // 100) - 1)
+    return round(ordered[int(rank)] * 1000, 3)
+
+
+class Session:
+    """
+    One load test user, shared by every worker.
+
+    Access tokens are short lived (ACCESS_TOKEN_EXPIRE_MINUTES), a 401 from the todo server logs in
+    again outside the timed section.
+    """
+
+    def __init__(self, auth: httpx.AsyncClient, todo: httpx.AsyncClient, username: str, password: str):
+        self.auth = auth
+        self.todo = todo
+        self.username = username
+        self.password = password
+        self.access_token: str | None = None
+        self.refresh_token: str | None = None
+        self._login_lock = asyncio.Lock()
+
+    async def signup(self):
+        response = await self.auth.post("/api/oauth/signup", json={
+            "username": self.username, "email": f"{self.username}@loadtest.local",
+            "full_name": "Load Test", "password": self.password})
+        # An existing user is fine, the login below tells whether the password matches
+        if response.status_code >= 500:
+            response.raise_for_status()
+
+    async def login(self, stale: str | None = None):
+        async with self._login_lock:
+            # Another worker already replaced the token that got the 401
+            if stale is not None and self.access_token != stale:
+                return
+            response = await self.auth.post("/api/oauth/login", data={"username": self.username, "password": self.password})
+            response.raise_for_status()
+            tokens = response.json()
+            self.access_token = tokens["access_token"]
+            self.refresh_token = tokens["refresh_token"]
+
+    async def todo_request(self, method: str, url: str, **kwargs) -> tuple[httpx.Response, float]:
+        """
+        Sends a todo server request, returning the response and its latency.
+        """
+        for _ in range(2):
+            token = self.access_token
+            started = time.perf_counter()
+            response = await self.todo.request(method, url, headers={"Authorization": f"Bearer {token}"}, **kwargs)
+            elapsed = time.perf_counter() - started
+            if response.status_code != 401:
+                break
+            await self.login(stale=token)
+        return response, elapsed
+
+
+def new_todo(i: int) -> dict:
+    return {"title": f"Load test {i}", "description": "Created by loadtest/run.py", "completed": False}
+
+
+async def timed(stats: OpStats, request) -> httpx.Response | None:
+    started = time.perf_counter()
+    try:
+        response = await request
+    except httpx.HTTPError:
+        stats.errors += 1
+        return None
+    elapsed = time.perf_counter() - started
+    if response.is_error:
+        stats.errors += 1
+    else:
+        stats.latencies.append(elapsed)
+    return response
+
+
+def record(stats: OpStats, response: httpx.Response, elapsed: float):
+    if response.is_error:
+        stats.errors += 1
+    else:
+        stats.latencies.append(elapsed)
+
+
+async def login_worker(session: Session, ops: dict[str, OpStats], deadline: float, worker: int):
+    stats = ops.setdefault("login", OpStats())
+    while time.perf_counter() < deadline:
+        await timed(stats, session.auth.post("/api/oauth/login", data={"username": session.username, "password": session.password}))
+
+
+async def refresh_worker(session: Session, ops: dict[str, OpStats], deadline: float, worker: int):
+    stats = ops.setdefault("refresh", OpStats())
+    # Refresh tokens rotate, each worker follows its own chain
+    refresh_token = session.refresh_token
+    while time.perf_counter() < deadline:
+        response = await timed(stats, session.auth.post("/api/oauth/token", data={"grant_type": "refresh_token", "refresh_token": refresh_token}))
+        if response is not None and response.is_success:
+            refresh_token = response.json()["refresh_token"]
+        elif response is not None and response.status_code == 401:
+            # Expired chain, start from the session's latest login
+            await session.login(stale=session.access_token)
+            refresh_token = session.refresh_token
+
+
+async def list_worker(session: Session, ops: dict[str, OpStats], deadline: float, worker: int, per_page: int = 20, pages: int = 5):
+    stats = ops.setdefault("list", OpStats())
+    while time.perf_counter() < deadline:
+        # First page, then follow next_cursor
+        params: dict = {"per_page": per_page}
+        for _ in range(pages):
+            try:
+                response, elapsed = await session.todo_request("GET", "/api/todos", params=params)
+            except httpx.HTTPError:
+                stats.errors += 1
+                break
+            record(stats, response, elapsed)
+            cursor = response.json().get("next_cursor") if response.is_success else None
+            if not cursor or time.perf_counter() >= deadline:
+                break
+            params = {"per_page": per_page, "cursor": cursor}
+
+
+async def create_worker(session: Session, ops: dict[str, OpStats], deadline: float, worker: int):
+    stats = ops.setdefault("create", OpStats())
+    i = 0
+    while time.perf_counter() < deadline:
+        try:
+            response, elapsed = await session.todo_request("POST", "/api/todos", json=new_todo(i))
+        except httpx.HTTPError:
+            stats.errors += 1
+            continue
+        record(stats, response, elapsed)
+        i += 1
+
+
+async def patch_delete_worker(session: Session, ops: dict[str, OpStats], deadline: float, worker: int):
+    patch_stats = ops.setdefault("patch", OpStats())
+    delete_stats = ops.setdefault("delete", OpStats())
+    i = 0
+    while time.perf_counter() < deadline:
+        try:
+            # The create only makes something to patch & delete, it isn't timed here
+            created, _ = await session.todo_request("POST", "/api/todos", json=new_todo(i))
+            created.raise_for_status()
+            todo_id = created.json()["id"]
+            response, elapsed = await session.todo_request("PATCH", f"/api/todos/{todo_id}", json={**new_todo(i), "completed": True})
+            record(patch_stats, response, elapsed)
+            response, elapsed = await session.todo_request("DELETE", f"/api/todos/{todo_id}")
+            record(delete_stats, response, elapsed)
+        except httpx.HTTPError:
+            patch_stats.errors += 1
+        i += 1
+
+
+WORKERS = {
+    "login": login_worker,
+    "refresh": refresh_worker,
+    "list": list_worker,
+    "create": create_worker,
+    "patch_delete": patch_delete_worker,
+}
+
+
+async def seed(session: Session, count: int):
+    """
+    Gives the list scenario something to page through.
+    """
+    batch_size = 500
+    for start in range(0, count, batch_size):
+        todos = [new_todo(i) for i in range(start, min(count, start + batch_size))]
+        response, _ = await session.todo_request("POST", "/api/todos/batch", json=todos)
+        response.raise_for_status()
+
+
+async def run_scenario(session: Session, name: str, concurrency: int, duration: float, warmup: float) -> dict:
+    worker = WORKERS[name]
+    if warmup:
+        await asyncio.gather(*(worker(session, {}, time.perf_counter() + warmup, n) for n in range(concurrency)))
+
+    ops: dict[str, OpStats] = {}
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(session, ops, started + duration, n) for n in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {op: stats.summary(elapsed) for op, stats in ops.items()}
+
+
+async def run(args) -> dict:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.auth_url, limits=limits, timeout=args.timeout) as auth, \
+            httpx.AsyncClient(base_url=args.todo_url, limits=limits, timeout=args.timeout) as todo:
+        session = Session(auth, todo, args.username or f"loadtest-{uuid4().hex[:12]}", args.password)
+        await session.signup()
+        await session.login()
+        if "list" in args.scenarios and args.seed:
+            await seed(session, args.seed)
+
+        operations = {}
+        for name in args.scenarios:
+            print(f"Running {name} for {args.duration}s with {args.concurrency} workers", file=sys.stderr)
+            operations.update(await run_scenario(session, name, args.concurrency, args.duration, args.warmup))
+
+    return {
+        "meta": {
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "auth_url": args.auth_url,
+            "todo_url": args.todo_url,
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+        },
+        "operations": operations,
+    }
+
+
+def compare(result: dict, baseline: dict, tolerance: float) -> list[str]:
+    """
+    Lists the operations that got slower than the baseline by more than tolerance.
+    """
+    regressions = []
+    for op, base in baseline["operations"].items():
+        current = result["operations"].get(op)
+        if current is None:
+            continue
+        if base["rps"] and current["rps"] < base["rps"] * (1 - tolerance):
+            regressions.append(f"{op}: rps {current['rps']} < baseline {base['rps']}")
+        if base["p95_ms"] and current["p95_ms"] is not None and current["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{op}: p95 {current['p95_ms']}ms > baseline {base['p95_ms']}ms")
+        if current["errors"] > base["errors"]:
+            regressions.append(f"{op}: {current['errors']} errors, baseline had {base['errors']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--auth-url", default="http://localhost:8080")
+    parser.add_argument("--todo-url", default="http://localhost:8000")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=10, help="Seconds per scenario")
+    parser.add_argument("--warmup", type=float, default=1, help="Untimed seconds before each scenario")
+    parser.add_argument("--seed", type=int, default=200, help="TODOs created for the list scenario")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--username", help="Defaults to a new user per run")
+    parser.add_argument("--password", default="loadtest-password")
+    parser.add_argument("--out", help="Write the JSON result here as well as to stdout")
+    parser.add_argument("--baseline", help="Earlier --out to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed rps / p95 change against the baseline")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    output = json.dumps(result, indent=2)
+    print(output)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output + "\n")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -15,5 +15,6 @@ type TodoItem = {
     count: number;
     next: number;
     previous: number;
+    next_cursor: string | null;
   }
   
\ No newline at end of file
@@ -1,6 +1,15 @@
 from sqlmodel import create_engine, Session, SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import inspect, select, text
+from sqlalchemy.schema import CreateColumn
+from sqlalchemy.ext.asyncio import create_async_engine
+from typing import Union
 from app.core import settings
-from app.models import TODO
+from app.core.db_pool import StatsQueuePool, StatsAsyncAdaptedQueuePool
+from app.core.metrics import instrument_engine, register_pool_collector
+from app.core.query_budget import track_queries
+from app.models import TODO, TODOUserStats
+from app.crud import rebuild_todo_stats_statements
 
 # only needed for psycopg 3 - replace postgresql
 # with postgresql+psycopg in settings.DATABASE_URL
@@ -8,15 +17,82 @@ connection_string = str(settings.DB_URL).replace(
     "postgresql", "postgresql+psycopg"
 )
 
+# Each engine gets its own pool of this size
+pool_options = {
+    "pool_size": settings.DB_POOL_SIZE,
+    "max_overflow": settings.DB_MAX_OVERFLOW,
+    "pool_timeout": settings.DB_POOL_TIMEOUT,
+    "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    "pool_recycle": settings.DB_POOL_RECYCLE,
+}
 
 engine = create_engine(
-    connection_string, connect_args={"sslmode": "require"}, pool_recycle=300
+    connection_string, connect_args={"sslmode": settings.DB_SSLMODE}, poolclass=StatsQueuePool, **pool_options
 )
 
+# psycopg 3 picks its async connection class from the same postgresql+psycopg URL
+async_engine = create_async_engine(
+    connection_string, connect_args={"sslmode": settings.DB_SSLMODE}, poolclass=StatsAsyncAdaptedQueuePool, **pool_options
+) if settings.DB_ASYNC else None
+
+# Statement timings for /metrics & per-request query counts, the async engine runs its statements on its sync_engine
+instrument_engine(engine, "sync")
+track_queries(engine)
+if async_engine is not None:
+    instrument_engine(async_engine.sync_engine, "async")
+    track_queries(async_engine.sync_engine)
+
+# Either session works with the service layer
+DBSession = Union[Session, AsyncSession]
+
 # Dependency with retry mechanism for OperationalError
 def get_db():
-    with Session(engine) as session:
+    # Writes return complete rows, so don't expire them and SELECT again on serialization
+    with Session(engine, expire_on_commit=False) as session:
+        yield session
+
+async def get_async_db():
+    # Expired attributes can't lazy load outside of an await either
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
         yield session
 
+# Session dependency used by the TODO routes, switched with DB_ASYNC
+get_session = get_async_db if settings.DB_ASYNC else get_db
+
+def pool_stats() -> dict[str, dict]:
+    """
+    Checked out connections, overflow in use, checkout waits & timeouts of each engine's pool.
+    """
+    stats = {"sync": engine.pool.stats()}
+    if async_engine is not None:
+        stats["async"] = async_engine.pool.stats()
+    return stats
+
+register_pool_collector(pool_stats)
+
 def create_db_and_tables():
     SQLModel.metadata.create_all(engine)
+    upgrade_db()
+
+def upgrade_db():
+    # create_all skips existing tables, so add columns & indexes introduced later and drop ones
+    # the queries don't use (the primary key already covers id, nothing filters by title)
+    with engine.begin() as conn:
+        columns = {column["name"] for column in inspect(conn).get_columns(TODO.__tablename__)}
+        if "completed_at" not in columns:
+            completed_at = CreateColumn(TODO.__table__.c.completed_at).compile(dialect=conn.dialect)
+            conn.execute(text(f"ALTER TABLE {TODO.__tablename__} ADD COLUMN {completed_at}"))
+            # The last update is the closest thing to a completion time items completed before had
+            conn.execute(text(f"UPDATE {TODO.__tablename__} SET completed_at = updated_at WHERE completed"))
+        if "search_vector" not in columns:
+            # Adding the generated column rewrites the table once to fill it in
+            search_vector = CreateColumn(TODO.__table__.c.search_vector).compile(dialect=conn.dialect)
+            conn.execute(text(f"ALTER TABLE {TODO.__tablename__} ADD COLUMN {search_vector}"))
+        for index in TODO.__table__.indexes:
+            index.create(conn, checkfirst=True)
+        conn.execute(text("DROP INDEX IF EXISTS ix_todo_title"))
+        conn.execute(text("DROP INDEX IF EXISTS ix_todo_id"))
+        # Fill in the stats rollups for TODO items that predate them
+        if conn.execute(select(TODOUserStats.user_id).limit(1)).first() is None:
+            for statement in rebuild_todo_stats_statements():
+                conn.execute(statement)
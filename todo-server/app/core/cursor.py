@@ -0,0 +1,51 @@
+from datetime import datetime
+from typing import Any
+from uuid import UUID
+import base64
+import json
+
+
+class InvalidCursorError(ValueError):
+    """
+    Exception raised when a pagination cursor can't be decoded.
+    """
+    pass
+
+
+def encode_cursor(*values: Any) -> str:
+    """
+    Encode the sort key of the last item on a page as an opaque cursor.
+
+    Args:
+        *values: The sort key values, datetimes and UUIDs are stored as strings.
+
+    Returns:
+        str: A URL safe cursor.
+    """
+    raw = [value.isoformat() if isinstance(value, datetime) else str(value) if isinstance(value, UUID) else value
+           for value in values]
+    return base64.urlsafe_b64encode(json.dumps(raw, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, *types: type) -> tuple:
+    """
+    Decode a cursor created by encode_cursor.
+
+    Args:
+        cursor (str): The cursor sent by the client.
+        *types (type): The expected type of each value, e.g. datetime, UUID.
+
+    Returns:
+        tuple: The sort key values.
+
+    Raises:
+        InvalidCursorError: If the cursor is malformed.
+    """
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(raw, list) or len(raw) != len(types):
+            raise InvalidCursorError("Invalid cursor")
+        return tuple(datetime.fromisoformat(value) if type_ is datetime else type_(value)
+                     for type_, value in zip(types, raw))
+    except (ValueError, TypeError) as e:
+        raise InvalidCursorError("Invalid cursor") from e
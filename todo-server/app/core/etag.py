@@ -0,0 +1,67 @@
+from datetime import datetime
+from uuid import UUID
+import hashlib
+
+
+def todo_etag(user_id: UUID, version: int) -> str:
+    """
+    Build the strong ETag for a user's TODO responses at a version.
+
+    The user id is part of the hash, so a browser cache shared by two users
+    never gets a 304 for the other user's response.
+
+    Args:
+        user_id (UUID): The user's ID.
+        version (int): The user's TODO version.
+
+    Returns:
+        str: A quoted ETag.
+    """
+    digest = hashlib.sha256(f"{user_id}:{version}".encode()).hexdigest()[:32]
+    return f'"{digest}"'
+
+
+def todo_item_etag(todo_id: UUID, updated_at: datetime | None) -> str:
+    """
+    Build the strong ETag for a single TODO item.
+
+    Every write sets updated_at, so the ETag only changes when this item does,
+    not when another of the user's TODOs is written.
+
+    Args:
+        todo_id (UUID): The TODO's ID.
+        updated_at (datetime | None): The TODO's last update.
+
+    Returns:
+        str: A quoted ETag.
+    """
+    stamp = updated_at.isoformat() if updated_at is not None else ""
+    digest = hashlib.sha256(f"{todo_id}:{stamp}".encode()).hexdigest()[:32]
+    return f'"{digest}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    Check an If-None-Match header against an ETag, using weak comparison as RFC 9110 requires.
+
+    "*" matches any current representation, so only call this once the resource is known to exist.
+
+    Args:
+        if_none_match (str | None): The header, "*" or a list of ETags.
+        etag (str): The current ETag.
+
+    Returns:
+        bool: True if the client's copy is current.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+def etag_headers(etag: str) -> dict[str, str]:
+    """
+    Headers for 200 and 304 responses, no-cache makes clients revalidate with If-None-Match every time.
+    """
+    return {"ETag": etag, "Cache-Control": "private, no-cache"}
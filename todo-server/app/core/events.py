@@ -0,0 +1,111 @@
+from typing import Any
+from uuid import UUID
+import asyncio
+import json
+
+import psycopg
+
+from app.core import settings
+
+# Every write NOTIFYs {"user_id": ..., "version": ...} on this channel when it commits
+TODO_EVENTS_CHANNEL = "todo_changes"
+
+
+class ChangeBroker:
+    """
+    Fans TODO change events out to the subscribers of each user_id in this worker.
+
+    An event only says the user's TODO version changed, so each subscriber keeps the
+    latest one: a slow client skips versions instead of queueing every write.
+    """
+
+    def __init__(self):
+        self._subscribers: dict[UUID, set[asyncio.Queue]] = {}
+
+    @property
+    def subscriber_count(self) -> int:
+        return sum(len(queues) for queues in self._subscribers.values())
+
+    def subscribe(self, user_id: UUID) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+        self._subscribers.setdefault(user_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, user_id: UUID, queue: asyncio.Queue):
+        queues = self._subscribers.get(user_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[user_id]
+
+    def publish(self, user_id: UUID, event: dict[str, Any]):
+        for queue in self._subscribers.get(user_id, ()):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+    def publish_all(self, event: dict[str, Any]):
+        for user_id in list(self._subscribers):
+            self.publish(user_id, event)
+
+
+class ChangeListener:
+    """
+    Holds a single LISTEN connection per worker and publishes its notifications to the broker.
+
+    The connection is reopened with backoff when it drops. Notifications sent meanwhile are
+    lost, so every subscriber then gets an event with version None to catch up from the
+    change feed.
+    """
+
+    def __init__(self, conninfo: str, broker: ChangeBroker, **connect_kwargs: Any):
+        self.conninfo = conninfo
+        self.broker = broker
+        self.connect_kwargs = connect_kwargs
+        self.reconnect_delay = settings.TODO_EVENTS_RECONNECT_DELAY
+        self._task: asyncio.Task | None = None
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def aclose(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    async def _run(self):
+        attempt, connected_before = 0, False
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(self.conninfo, autocommit=True, **self.connect_kwargs) as conn:
+                    await conn.execute(f"LISTEN {TODO_EVENTS_CHANNEL}")
+                    attempt = 0
+                    if connected_before:
+                        self.broker.publish_all({"version": None})
+                    connected_before = True
+                    async for notify in conn.notifies():
+                        self.dispatch(notify.payload)
+            except (psycopg.Error, OSError) as e:
+                print(f"TODO events listener disconnected: {e}")
+            # Capped exponential backoff, a restarted database isn't hammered by every worker at once
+            await asyncio.sleep(min(self.reconnect_delay * 2 ** attempt, 30))
+            attempt += 1
+
+    def dispatch(self, payload: str):
+        try:
+            event = json.loads(payload)
+            user_id = UUID(event["user_id"])
+        except (ValueError, KeyError, TypeError):
+            print(f"Ignoring TODO event: {payload!r}")
+            return
+        self.broker.publish(user_id, {"version": event.get("version")})
+
+
+change_broker = ChangeBroker()
+# Same database & sslmode as the app's engine
+change_listener = ChangeListener(str(settings.DB_URL), change_broker, sslmode=settings.DB_SSLMODE)
@@ -0,0 +1,33 @@
+from fastapi.responses import ORJSONResponse
+from typing import Iterable, Mapping
+
+from app.models import TODO, TODOResponse
+
+TODO_RESPONSE_FIELDS = tuple(TODOResponse.model_fields)
+
+
+def todo_dicts(todos: Iterable[TODO]) -> list[dict]:
+    """
+    Build TODOResponse shaped dicts straight from TODO items, without validating them again.
+
+    orjson writes datetimes and UUIDs the way Pydantic does, so the JSON is the same as
+    the response_model path.
+    """
+    return [{field: getattr(todo, field) for field in TODO_RESPONSE_FIELDS} for todo in todos]
+
+
+def paginated_todos_response(paginated: dict, headers: Mapping[str, str] | None = None) -> ORJSONResponse:
+    """
+    Serialize a PaginatedTodos shaped dict with orjson.
+
+    Returning a Response skips the route's response_model, so the dict has to have
+    every PaginatedTodos field already.
+
+    Args:
+        paginated (dict): count, next, previous, next_cursor & todos as TODO items.
+        headers (Mapping[str, str], optional): Response headers, e.g. the ETag.
+
+    Returns:
+        ORJSONResponse: The response.
+    """
+    return ORJSONResponse({**paginated, "todos": todo_dicts(paginated["todos"])}, headers=headers)
@@ -0,0 +1,162 @@
+from fastapi import HTTPException, status
+
+from typing import Any
+import asyncio
+import random
+import time
+
+import httpx
+
+from app.core import settings
+from app.core.metrics import AUTH_REQUEST_DURATION
+
+auth_unavailable_exception = HTTPException(
+    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+    detail="Auth server unavailable",
+)
+
+
+class CircuitBreaker:
+    """
+    Fails fast after failure_threshold consecutive failures, then lets a single
+    trial request through every reset_timeout seconds until one succeeds.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: float | None = None
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow_request(self) -> bool:
+        state = self.state
+        if state == "half-open":
+            # Let one trial through and keep the rest failing fast until it reports back
+            self.opened_at = time.monotonic()
+            return True
+        return state == "closed"
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+
+class AuthServerClient:
+    """
+    Pooled httpx.AsyncClient for auth-server calls with retries and a circuit breaker.
+
+    The app lifespan calls start() and aclose(), the client is also created lazily so
+    it works when the lifespan is not run (e.g. TestClient used without a with block).
+    """
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+        self.timeout = httpx.Timeout(settings.AUTH_HTTP_TIMEOUT, connect=settings.AUTH_HTTP_CONNECT_TIMEOUT)
+        self.limits = httpx.Limits(
+            max_connections=settings.AUTH_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.AUTH_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        )
+        self.retries = settings.AUTH_HTTP_RETRIES
+        self.retry_backoff = settings.AUTH_HTTP_RETRY_BACKOFF
+        self.breaker = CircuitBreaker(settings.AUTH_CIRCUIT_FAILURE_THRESHOLD, settings.AUTH_CIRCUIT_RESET_TIMEOUT)
+        self._client: httpx.AsyncClient | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    async def start(self):
+        self._get_client()
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+        self._client = None
+        self._loop = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        # Pooled connections are bound to the event loop that opened them
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            if self._client is not None:
+                self._close_on_loop(self._client, self._loop)
+            self._client = httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout, limits=self.limits)
+            self._loop = loop
+        return self._client
+
+    @staticmethod
+    def _close_on_loop(client: httpx.AsyncClient, loop: asyncio.AbstractEventLoop):
+        # The replaced client's connections can only be closed on their own loop, if it still runs.
+        # A stopped loop's connections can't be closed from here, dropping the client frees them.
+        if loop.is_running():
+            asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+
+    async def _backoff(self, attempt: int):
+        # Full jitter keeps retries from many workers from arriving together
+        await asyncio.sleep(random.uniform(0, self.retry_backoff * 2 ** attempt))
+
+    async def request(self, method: str, url: str, retry: bool = False, **kwargs: Any) -> httpx.Response:
+        """
+        Send a request to the auth-server.
+
+        Args:
+            method (str): The HTTP method.
+            url (str): The path relative to AUTH_SERVER_URL.
+            retry (bool): Retry transport errors and 5xx responses, only for idempotent calls.
+
+        Returns:
+            httpx.Response: The auth-server response, 5xx included once retries are used up.
+
+        Raises:
+            HTTPException: 503 if the circuit is open or the auth-server could not be reached.
+        """
+        attempts = self.retries + 1 if retry else 1
+        for attempt in range(attempts):
+            if not self.breaker.allow_request():
+                raise auth_unavailable_exception
+            last_attempt = attempt == attempts - 1
+            start = time.perf_counter()
+            try:
+                response = await self._get_client().request(method, url, **kwargs)
+            except httpx.TransportError as e:
+                AUTH_REQUEST_DURATION.labels(method, url, "error").observe(time.perf_counter() - start)
+                self.breaker.record_failure()
+                print(f"Error calling auth server: {e!r}")
+                if last_attempt:
+                    raise auth_unavailable_exception
+                await self._backoff(attempt)
+                continue
+            AUTH_REQUEST_DURATION.labels(method, url, response.status_code).observe(time.perf_counter() - start)
+
+            if response.status_code >= 500:
+                self.breaker.record_failure()
+                if not last_attempt:
+                    await self._backoff(attempt)
+                    continue
+            else:
+                self.breaker.record_success()
+            return response
+
+        raise auth_unavailable_exception
+
+    async def get(self, url: str, **kwargs: Any) -> httpx.Response:
+        return await self.request("GET", url, retry=True, **kwargs)
+
+    async def post(self, url: str, **kwargs: Any) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    def stats(self) -> dict[str, Any]:
+        return {"circuit": self.breaker.state, "consecutive_failures": self.breaker.failures}
+
+
+auth_client = AuthServerClient(str(settings.AUTH_SERVER_URL))
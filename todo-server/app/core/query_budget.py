@@ -0,0 +1,87 @@
+from collections import Counter
+from contextvars import ContextVar
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+import time
+
+from app.core import settings
+
+
+class QueryStats:
+    """
+    The SQL statements a request ran and the time spent in them.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements: Counter[str] = Counter()
+
+    def record(self, statement: str, seconds: float):
+        self.count += 1
+        self.seconds += seconds
+        self.statements[statement] += 1
+
+    def repeated(self, threshold: int) -> list[tuple[str, int]]:
+        """
+        Statements run at least threshold times, the usual sign of an N+1 loop.
+        """
+        return [(statement, count) for statement, count in self.statements.most_common() if count >= threshold]
+
+
+# Set by QueryBudgetMiddleware for each request, sync routes see it from the threadpool too
+current_query_stats: ContextVar[QueryStats | None] = ContextVar("current_query_stats", default=None)
+
+
+def track_queries(engine: Engine):
+    """
+    Record every statement run on the engine in the current request's QueryStats.
+    """
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._query_budget_start = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        stats = current_query_stats.get()
+        if stats is not None:
+            stats.record(statement, time.perf_counter() - context._query_budget_start)
+
+
+class QueryBudgetMiddleware:
+    """
+    ASGI middleware counting the SQL statements & DB time of every request.
+
+    With QUERY_DEBUG_HEADERS the counts are sent as X-DB-Queries & X-DB-Time (ms) headers,
+    covering the statements run before the response starts. A statement repeated
+    QUERY_REPEAT_WARNING times in one request is logged as a possible N+1.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = QueryStats()
+        token = current_query_stats.set(stats)
+
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start" and settings.QUERY_DEBUG_HEADERS:
+                message.setdefault("headers", [])
+                message["headers"] = [
+                    *message["headers"],
+                    (b"x-db-queries", str(stats.count).encode()),
+                    (b"x-db-time", f"{stats.seconds * 1000:.2f}".encode()),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_query_stats.reset(token)
+            for statement, count in stats.repeated(settings.QUERY_REPEAT_WARNING):
+                route = getattr(scope.get("route"), "path", scope["path"])
+                print(f"Possible N+1 on {scope['method']} {route}: {count}x {' '.join(statement.split())[:200]}")
@@ -8,4 +8,80 @@ except FileNotFoundError:
 
 DB_URL = config("DB_URL", cast=Secret)
 TEST_DB_URL = config("TEST_DB_URL", cast=Secret)
-AUTH_SERVER_URL = config("AUTH_SERVER_URL", cast=Secret)
\ No newline at end of file
+# libpq sslmode for DB_URL, "disable" for a local Postgres without SSL
+DB_SSLMODE = config("DB_SSLMODE", default="require")
+AUTH_SERVER_URL = config("AUTH_SERVER_URL", cast=Secret)
+
+# "local" verifies bearer tokens in-process with the auth-server signing key,
+# "remote" asks the auth-server's /api/users/me endpoint on every request
+TOKEN_VERIFICATION = config("TOKEN_VERIFICATION", default="local")
+# Must match the auth-server SECRET_KEY & ALGORITHM for local verification
+SECRET_KEY = config("SECRET_KEY", cast=Secret, default="")
+ALGORITHM = config("ALGORITHM", cast=Secret, default="HS256")
+
+# Remote verification results are cached per token until the token's exp
+TOKEN_CACHE_MAXSIZE = config("TOKEN_CACHE_MAXSIZE", cast=int, default=10000)
+# Seconds to remember rejected (401) tokens
+TOKEN_CACHE_NEGATIVE_TTL = config("TOKEN_CACHE_NEGATIVE_TTL", cast=float, default=5)
+
+# Shared HTTP client for auth-server calls
+AUTH_HTTP_TIMEOUT = config("AUTH_HTTP_TIMEOUT", cast=float, default=5)
+AUTH_HTTP_CONNECT_TIMEOUT = config("AUTH_HTTP_CONNECT_TIMEOUT", cast=float, default=2)
+AUTH_HTTP_MAX_CONNECTIONS = config("AUTH_HTTP_MAX_CONNECTIONS", cast=int, default=100)
+AUTH_HTTP_MAX_KEEPALIVE_CONNECTIONS = config("AUTH_HTTP_MAX_KEEPALIVE_CONNECTIONS", cast=int, default=20)
+# Retries only apply to idempotent (GET) calls
+AUTH_HTTP_RETRIES = config("AUTH_HTTP_RETRIES", cast=int, default=2)
+AUTH_HTTP_RETRY_BACKOFF = config("AUTH_HTTP_RETRY_BACKOFF", cast=float, default=0.1)
+# Consecutive failures before failing fast, and seconds before trying again
+AUTH_CIRCUIT_FAILURE_THRESHOLD = config("AUTH_CIRCUIT_FAILURE_THRESHOLD", cast=int, default=5)
+AUTH_CIRCUIT_RESET_TIMEOUT = config("AUTH_CIRCUIT_RESET_TIMEOUT", cast=float, default=30)
+
+# Connection pool of each engine (sync, and async with DB_ASYNC) in each worker: pool_size kept
+# open, max_overflow more under load, seconds a checkout waits before failing, a liveness check on
+# checkout & seconds before a connection is replaced
+DB_POOL_SIZE = config("DB_POOL_SIZE", cast=int, default=5)
+DB_MAX_OVERFLOW = config("DB_MAX_OVERFLOW", cast=int, default=10)
+DB_POOL_TIMEOUT = config("DB_POOL_TIMEOUT", cast=float, default=30)
+DB_POOL_PRE_PING = config("DB_POOL_PRE_PING", cast=bool, default=False)
+DB_POOL_RECYCLE = config("DB_POOL_RECYCLE", cast=int, default=300)
+
+# Send X-DB-Queries & X-DB-Time headers with every response, for debugging only
+QUERY_DEBUG_HEADERS = config("QUERY_DEBUG_HEADERS", cast=bool, default=False)
+# Log a possible N+1 when one request runs the same statement this many times
+QUERY_REPEAT_WARNING = config("QUERY_REPEAT_WARNING", cast=int, default=10)
+
+# Serve the /api/internal stats routes, 404 otherwise. They aren't authenticated,
+# only enable them where the port isn't reachable from outside
+INTERNAL_ENDPOINTS = config("INTERNAL_ENDPOINTS", cast=bool, default=False)
+
+# Serve the TODO routes with an async engine & AsyncSession (psycopg 3 async)
+DB_ASYNC = config("DB_ASYNC", cast=bool, default=False)
+
+# Local Postgres used by tests/test_query_plans.py, the plan tests are skipped when empty
+PLAN_TEST_DB_URL = config("PLAN_TEST_DB_URL", cast=Secret, default="")
+
+# Most items accepted by one /api/todos/batch request
+TODO_BATCH_MAX_ITEMS = config("TODO_BATCH_MAX_ITEMS", cast=int, default=500)
+
+# Rows loaded per COPY by /api/todos/import, each chunk is committed on its own
+TODO_IMPORT_CHUNK_SIZE = config("TODO_IMPORT_CHUNK_SIZE", cast=int, default=5000)
+# Row errors listed in an import response, the rest are only counted
+TODO_IMPORT_MAX_ERRORS = config("TODO_IMPORT_MAX_ERRORS", cast=int, default=100)
+# Longest NDJSON line or CSV record accepted by /api/todos/import, in characters
+TODO_IMPORT_MAX_LINE_LENGTH = config("TODO_IMPORT_MAX_LINE_LENGTH", cast=int, default=1024 * 1024)
+
+# Deleted items are reported by /api/todos/changes for this long, older cursors get a 410 to resync
+TODO_TOMBSTONE_RETENTION_DAYS = config("TODO_TOMBSTONE_RETENTION_DAYS", cast=int, default=30)
+# Seconds the change feed cursor trails behind now, so writes committed after a poll with an
+# earlier updated_at are returned by the next one
+TODO_CHANGES_LAG = config("TODO_CHANGES_LAG", cast=float, default=5)
+
+# /api/todos/events: each worker LISTENs for write notifications on one connection, off leaves the
+# in-process broker without a feed (tests publish to it directly)
+TODO_EVENTS_LISTEN = config("TODO_EVENTS_LISTEN", cast=bool, default=True)
+# Seconds between keepalive comments on idle event streams, and the first reconnect delay of the listener
+TODO_EVENTS_HEARTBEAT = config("TODO_EVENTS_HEARTBEAT", cast=float, default=15)
+TODO_EVENTS_RECONNECT_DELAY = config("TODO_EVENTS_RECONNECT_DELAY", cast=float, default=1)
+
+# Serialize TODO list responses with orjson straight from the items, skipping response_model validation
+FAST_JSON = config("FAST_JSON", cast=bool, default=False)
@@ -0,0 +1,127 @@
+from fastapi import HTTPException
+
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable
+import asyncio
+import hashlib
+import time
+
+from jose import jwt, JWTError
+
+
+class TokenCache:
+    """
+    Bounded in-process cache of token -> user_id resolutions.
+
+    Entries are keyed by a SHA-256 of the token, successful lookups live until the
+    token's own exp and 401 outcomes for negative_ttl seconds. Concurrent lookups
+    for the same token share a single call to the loader.
+    """
+
+    def __init__(self, maxsize: int, negative_ttl: float):
+        self.maxsize = maxsize
+        self.negative_ttl = negative_ttl
+        self._entries: OrderedDict[str, tuple[float, Any, HTTPException | None]] = OrderedDict()
+        self._inflight: dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    @staticmethod
+    def _token_expiry(token: str) -> float | None:
+        try:
+            exp = jwt.get_unverified_claims(token).get("exp")
+            return float(exp) if exp is not None else None
+        except (JWTError, TypeError, ValueError):
+            return None
+
+    def _get(self, key: str, now: float):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= now:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _set(self, key: str, expires_at: float, value: Any, error: HTTPException | None):
+        self._entries[key] = (expires_at, value, error)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    @staticmethod
+    def _fail(future: asyncio.Future, error: Exception):
+        future.set_exception(error)
+        # Retrieve it so asyncio does not warn when no other lookup was waiting
+        future.exception()
+
+    async def resolve(self, token: str, loader: Callable[[str], Awaitable[Any]]):
+        """
+        Get the user_id for a token, awaiting loader(token) on a cache miss.
+
+        Args:
+            token (str): The bearer token.
+            loader (Callable[[str], Awaitable[Any]]): Resolves the token upstream, raising HTTPException on failure.
+
+        Returns:
+            The cached or freshly loaded user_id.
+        """
+        key = self._key(token)
+        entry = self._get(key, time.time())
+        if entry is not None:
+            _, value, error = entry
+            if error is not None:
+                self.negative_hits += 1
+                raise error
+            self.hits += 1
+            return value
+
+        future = self._inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            # shield so a cancelled waiter does not cancel the shared lookup
+            return await asyncio.shield(future)
+
+        self.misses += 1
+        future = self._inflight[key] = asyncio.get_running_loop().create_future()
+        try:
+            value = await loader(token)
+        except HTTPException as e:
+            if e.status_code == 401:
+                self._set(key, time.time() + self.negative_ttl, None, e)
+            self._fail(future, e)
+            raise
+        except Exception as e:
+            self._fail(future, e)
+            raise
+        except BaseException:
+            future.cancel()
+            raise
+        finally:
+            del self._inflight[key]
+
+        expires_at = self._token_expiry(token)
+        if expires_at is not None and expires_at > time.time():
+            self._set(key, expires_at, value, None)
+        future.set_result(value)
+        return value
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+        }
+
+    def clear(self):
+        self._entries.clear()
@@ -0,0 +1,98 @@
+from fastapi import HTTPException, status
+
+from typing import Any
+from uuid import UUID
+
+from jose import jwt, JWTError
+import httpx
+from app.core import settings
+from app.core.http_client import auth_client
+from app.core.token_cache import TokenCache
+
+SECRET_KEY = settings.SECRET_KEY
+ALGORITHM = settings.ALGORITHM
+
+# Local verification needs the shared signing key, without it we can only ask the auth-server
+LOCAL_TOKEN_VERIFICATION = settings.TOKEN_VERIFICATION == "local" and bool(str(SECRET_KEY))
+
+if settings.TOKEN_VERIFICATION == "local" and not LOCAL_TOKEN_VERIFICATION:
+    print("SECRET_KEY is not set, falling back to remote token verification")
+
+token_cache = TokenCache(maxsize=settings.TOKEN_CACHE_MAXSIZE, negative_ttl=settings.TOKEN_CACHE_NEGATIVE_TTL)
+
+credentials_exception = HTTPException(
+    status_code=status.HTTP_401_UNAUTHORIZED,
+    detail="Invalid authentication credentials",
+    headers={"WWW-Authenticate": "Bearer"},
+)
+
+
+def verify_token_local(token: str) -> UUID:
+    """
+    Verify an access token issued by the auth-server without calling it.
+
+    Args:
+        token (str): The bearer token.
+
+    Returns:
+        UUID: The user_id stored in the token's "id" claim.
+
+    Raises:
+        HTTPException: If the signature, expiry or "id" claim is invalid.
+    """
+    try:
+        payload: dict[str, Any] = jwt.decode(
+            token, str(SECRET_KEY), algorithms=[str(ALGORITHM)], options={"require_exp": True}
+        )
+        user_id = payload.get("id")
+        if user_id is None:
+            raise credentials_exception
+        return UUID(str(user_id))
+    except (JWTError, ValueError):
+        raise credentials_exception
+
+
+async def verify_token_remote(token: str):
+    """
+    Verify an access token by calling the auth-server's /api/users/me endpoint.
+    Results are served from token_cache while the token is valid.
+
+    Args:
+        token (str): The bearer token.
+
+    Returns:
+        The user_id returned by the auth-server.
+
+    Raises:
+        HTTPException: With the auth-server's status code and detail if the token is rejected.
+    """
+    return await token_cache.resolve(token, fetch_current_user)
+
+
+async def fetch_current_user(token: str):
+    headers = {"Authorization": f"Bearer {token}"}
+
+    response = await auth_client.get("/api/users/me", headers=headers)
+
+    if response.status_code == 200:
+        return response.json()
+    else:
+        raise HTTPException(status_code=response.status_code, detail=response_detail(response))
+
+
+def response_detail(response: httpx.Response):
+    """
+    Get the error detail from an auth-server response, which may not be JSON on 5xx.
+    """
+    try:
+        return response.json().get('detail')
+    except ValueError:
+        return response.text
+
+
+def internal_endpoints_enabled():
+    """
+    Dependency of the /api/internal routes, they 404 unless INTERNAL_ENDPOINTS is set.
+    """
+    if not settings.INTERNAL_ENDPOINTS:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
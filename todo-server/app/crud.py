@@ -1,9 +1,18 @@
 from sqlmodel import select, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import tuple_, insert, update, delete, values, column, cast, func, true, false, case, and_, not_, literal, text, Date, Text
+from sqlalchemy.dialects.postgresql import DOUBLE_PRECISION, REGCONFIG
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.exc import SQLAlchemyError
-from uuid import UUID
-from typing import Sequence
+from psycopg import Error as PsycopgError
+from collections import Counter
+from datetime import date, datetime, timedelta
+from uuid import UUID, uuid4
+from typing import AsyncIterator, Iterator, Sequence
 
-from app.models import TODOBase, TODO
+from app.core.events import TODO_EVENTS_CHANNEL
+from app.core.settings import TODO_TOMBSTONE_RETENTION_DAYS
+from app.models import TODOBase, TODO, TODOVersion, TODOUserStats, TODOCompletionDay, TODOTombstone, TODOFilter, SEARCH_CONFIG
 
 class TodoNotFoundError(Exception):
     """
@@ -11,9 +20,437 @@ class TodoNotFoundError(Exception):
     """
     pass
 
+# Core table for writes that return rows with RETURNING instead of loading ORM objects
+todo_table = TODO.__table__
+# A TODO item's columns, without the generated search_vector
+todo_columns = [column for column in todo_table.columns if column.computed is None]
+todo_version_table = TODOVersion.__table__
+todo_stats_table = TODOUserStats.__table__
+todo_completion_day_table = TODOCompletionDay.__table__
+todo_tombstone_table = TODOTombstone.__table__
+
+# An item's (completed, completed_at) before or after a write, what the stats rollups are kept from
+TodoState = tuple[bool, datetime | None]
+
 # get all TODO items
-# get all TODO items
-def get_all_todo_data(db: Session, user_id: UUID, offset: int, per_page: int) -> Sequence[TODO]:
+def todos_page_query(user_id: UUID, offset: int, per_page: int, after: tuple[datetime, UUID] | None = None, filters: TODOFilter | None = None):
+    """
+    Build the query for a page of a user's TODO items ordered by (sort field, id), created_at by default.
+
+    Args:
+        user_id (UUID): The user's ID.
+        offset (int): The number of items to skip, ignored when after is set.
+        per_page (int): The number of items per page.
+        after (tuple[datetime, UUID], optional): Keyset cursor, the (sort field, id) of the previous page's last item.
+        filters (TODOFilter, optional): Filters & sort order, ranges include after and exclude before.
+
+    Returns:
+        The select statement.
+    """
+    filters = filters or TODOFilter()
+    descending = filters.sort.startswith("-")
+    sort_column = getattr(TODO, filters.sort.lstrip("-"))
+
+    query = select(TODO).where(TODO.user_id == user_id)
+    if filters.completed is not None:
+        # A literal rather than a parameter, so the planner can match the partial index on open items
+        query = query.where(TODO.completed == (true() if filters.completed else false()))
+    if filters.created_after is not None:
+        query = query.where(TODO.created_at >= filters.created_after)
+    if filters.created_before is not None:
+        query = query.where(TODO.created_at < filters.created_before)
+    if filters.updated_after is not None:
+        query = query.where(TODO.updated_at >= filters.updated_after)
+    if filters.updated_before is not None:
+        query = query.where(TODO.updated_at < filters.updated_before)
+
+    if after is not None:
+        key = tuple_(sort_column, TODO.id)
+        query = query.where(key < tuple_(*after) if descending else key > tuple_(*after))
+    else:
+        query = query.offset(offset)
+    order = (sort_column.desc(), TODO.id.desc()) if descending else (sort_column, TODO.id)
+    return query.order_by(*order).limit(per_page)
+
+
+def todos_search_query(user_id: UUID, q: str, per_page: int, after: tuple[float, UUID] | None = None):
+    """
+    Build the ranked full-text search over a user's TODO items, ordered by (rank desc, id desc).
+
+    Args:
+        user_id (UUID): The user's ID.
+        q (str): The search terms, in web search syntax ("quoted phrases", or, -excluded).
+        per_page (int): The number of items per page.
+        after (tuple[float, UUID], optional): Keyset cursor, the (rank, id) of the previous page's last item.
+
+    Returns:
+        The select statement, rows are (TODO, rank).
+    """
+    tsquery = func.websearch_to_tsquery(cast(SEARCH_CONFIG, REGCONFIG), q)
+    # ts_rank returns real, which psycopg rounds to its shortest repr; as double precision the
+    # cursor carries the exact value, otherwise ties with the previous page's last rank repeat
+    rank = cast(func.ts_rank(todo_table.c.search_vector, tsquery), DOUBLE_PRECISION)
+    query = select(TODO, rank.label("rank")).where(TODO.user_id == user_id, todo_table.c.search_vector.bool_op("@@")(tsquery))
+    if after is not None:
+        query = query.where(tuple_(rank, TODO.id) < tuple_(*after))
+    return query.order_by(rank.desc(), TODO.id.desc()).limit(per_page)
+
+
+def todo_query(todo_id: UUID, user_id: UUID):
+    """
+    Build the query for a single TODO item owned by the user.
+    """
+    return select(TODO).where(TODO.id == todo_id, TODO.user_id == user_id)
+
+
+def completed_at_value(completed):
+    """
+    Build the completed_at for an UPDATE that sets completed: stamped when it turns true, kept while
+    it stays true, cleared when false. Column references in SET see the row before the update.
+    """
+    return case(
+        (and_(completed, not_(todo_table.c.completed)), datetime.now()),
+        (completed, todo_table.c.completed_at),
+        else_=None,
+    )
+
+
+def locked_todo_states(condition, user_id: UUID):
+    """
+    Build a FOR UPDATE subquery of the completed state of the user's TODO items matching the condition.
+
+    A plain self-join would keep the version read before waiting on a concurrent update's lock,
+    FOR UPDATE re-reads the committed version. Rows are locked in id order, so overlapping batches
+    don't deadlock.
+    """
+    return (select(todo_table.c.id, todo_table.c.completed, todo_table.c.completed_at)
+            .where(condition, todo_table.c.user_id == user_id)
+            .order_by(todo_table.c.id)
+            .with_for_update()
+            .subquery("old"))
+
+
+def todo_update_statement(todo_id: UUID, user_id: UUID, update_data: dict):
+    """
+    Build a single UPDATE ... RETURNING for a TODO item owned by the user.
+
+    The row joins its own pre-update version, so RETURNING also has the completed
+    state it had before (was_completed, was_completed_at) for the stats rollups.
+    The pre-update version is read FOR UPDATE: a concurrent update of the same item
+    waits for the first to commit and then sees its result, so a completion isn't
+    counted twice.
+    """
+    if "completed" in update_data:
+        update_data = {**update_data, "completed_at": completed_at_value(literal(update_data["completed"]))}
+    old = locked_todo_states(todo_table.c.id == todo_id, user_id)
+    return (update(todo_table)
+            .where(todo_table.c.id == todo_id, todo_table.c.user_id == user_id, old.c.id == todo_table.c.id)
+            .values(**update_data)
+            .returning(*todo_columns, old.c.completed.label("was_completed"), old.c.completed_at.label("was_completed_at")))
+
+
+def todo_delete_statement(todo_id: UUID, user_id: UUID):
+    """
+    Build a single DELETE ... RETURNING id, completed, completed_at for a TODO item owned by the user.
+    """
+    return (delete(todo_table)
+            .where(todo_table.c.id == todo_id, todo_table.c.user_id == user_id)
+            .returning(todo_table.c.id, todo_table.c.completed, todo_table.c.completed_at))
+
+
+def todo_version_query(user_id: UUID):
+    """
+    Build the query for a user's TODO version, a primary key lookup that doesn't touch the todo table.
+    """
+    return select(todo_version_table.c.version).where(todo_version_table.c.user_id == user_id)
+
+
+def bump_todo_version_statement(user_id: UUID):
+    """
+    Build the upsert that bumps a user's TODO version, run in the same transaction as the write.
+
+    The new version is sent with pg_notify on TODO_EVENTS_CHANNEL in the same statement, Postgres
+    delivers it to the listeners when the write commits and drops it on rollback.
+    """
+    statement = pg_insert(todo_version_table).values(user_id=user_id, version=1)
+    bumped = statement.on_conflict_do_update(
+        index_elements=[todo_version_table.c.user_id],
+        set_={"version": todo_version_table.c.version + 1},
+    ).returning(todo_version_table.c.user_id, todo_version_table.c.version).cte("bumped")
+    payload = func.json_build_object("user_id", bumped.c.user_id, "version", bumped.c.version)
+    return select(func.pg_notify(TODO_EVENTS_CHANNEL, cast(payload, Text))).select_from(bumped)
+
+
+def todo_stats_statements(user_id: UUID, before: list[TodoState], after: list[TodoState]) -> list:
+    """
+    Build the upserts that apply a write to a user's stats rollups.
+
+    Args:
+        user_id (UUID): The user's ID.
+        before (list[TodoState]): The changed items that existed before the write, as they were.
+        after (list[TodoState]): The changed items that exist after the write, as they are.
+
+    Returns:
+        list: Zero to two statements, todo_stats and then todo_completion_day.
+    """
+    statements = []
+    total = len(after) - len(before)
+    completed = sum(state[0] for state in after) - sum(state[0] for state in before)
+    if total or completed:
+        statement = pg_insert(todo_stats_table).values(user_id=user_id, total=total, completed=completed)
+        statements.append(statement.on_conflict_do_update(
+            index_elements=[todo_stats_table.c.user_id],
+            set_={"total": todo_stats_table.c.total + statement.excluded.total,
+                  "completed": todo_stats_table.c.completed + statement.excluded.completed},
+        ))
+
+    days = Counter()
+    for completed, completed_at in after:
+        if completed and completed_at is not None:
+            days[completed_at.date()] += 1
+    for completed, completed_at in before:
+        if completed and completed_at is not None:
+            days[completed_at.date()] -= 1
+    # Sorted, so concurrent writes lock the day rows in the same order
+    rows = [{"user_id": user_id, "day": day, "completions": count} for day, count in sorted(days.items()) if count]
+    if rows:
+        statement = pg_insert(todo_completion_day_table).values(rows)
+        statements.append(statement.on_conflict_do_update(
+            index_elements=[todo_completion_day_table.c.user_id, todo_completion_day_table.c.day],
+            set_={"completions": todo_completion_day_table.c.completions + statement.excluded.completions},
+        ))
+    return statements
+
+
+def todo_stats_query(user_id: UUID):
+    """
+    Build the query for a user's stats row.
+    """
+    return select(todo_stats_table.c.total, todo_stats_table.c.completed).where(todo_stats_table.c.user_id == user_id)
+
+
+def todo_completion_days_query(user_id: UUID, since: date):
+    """
+    Build the query for a user's completions per day since a day, most recent first.
+    """
+    return (select(todo_completion_day_table.c.day, todo_completion_day_table.c.completions)
+            .where(todo_completion_day_table.c.user_id == user_id,
+                   todo_completion_day_table.c.day >= since,
+                   todo_completion_day_table.c.completions > 0)
+            .order_by(todo_completion_day_table.c.day.desc()))
+
+
+def todo_changes_query(user_id: UUID, after: tuple[datetime, UUID], limit: int):
+    """
+    Build the query for a user's TODO items created or updated after a (updated_at, id) cursor, oldest first.
+    """
+    return (select(TODO)
+            .where(TODO.user_id == user_id, tuple_(TODO.updated_at, TODO.id) > tuple_(*after))
+            .order_by(TODO.updated_at, TODO.id)
+            .limit(limit))
+
+
+def todo_tombstones_query(user_id: UUID, after: tuple[datetime, UUID], limit: int):
+    """
+    Build the query for a user's TODO items deleted after a (deleted_at, id) cursor, oldest first.
+    """
+    key = tuple_(todo_tombstone_table.c.deleted_at, todo_tombstone_table.c.id)
+    return (select(todo_tombstone_table.c.id, todo_tombstone_table.c.deleted_at)
+            .where(todo_tombstone_table.c.user_id == user_id, key > tuple_(*after))
+            .order_by(todo_tombstone_table.c.deleted_at, todo_tombstone_table.c.id)
+            .limit(limit))
+
+
+def todo_tombstone_statements(user_id: UUID, todo_ids: list[UUID]) -> list:
+    """
+    Build the statements that record deleted TODO items for the change feed.
+
+    The upsert stamps the tombstones, an id imported again and deleted twice keeps its latest
+    deletion. The user's tombstones past TODO_TOMBSTONE_RETENTION_DAYS are pruned in the same
+    go, a short seek on (user_id, deleted_at).
+    """
+    deleted_at = datetime.now()
+    upsert = pg_insert(todo_tombstone_table).values([
+        {"id": todo_id, "user_id": user_id, "deleted_at": deleted_at} for todo_id in sorted(todo_ids)
+    ])
+    upsert = upsert.on_conflict_do_update(
+        index_elements=[todo_tombstone_table.c.id],
+        set_={"user_id": upsert.excluded.user_id, "deleted_at": upsert.excluded.deleted_at},
+    )
+    prune = delete(todo_tombstone_table).where(
+        todo_tombstone_table.c.user_id == user_id,
+        todo_tombstone_table.c.deleted_at < deleted_at - timedelta(days=TODO_TOMBSTONE_RETENTION_DAYS),
+    )
+    return [upsert, prune]
+
+
+def todos_export_query(user_id: UUID):
+    """
+    Build the query for all of a user's TODO items as plain rows, in get_all_todo_data order.
+    """
+    return select(*todo_columns).where(todo_table.c.user_id == user_id).order_by(todo_table.c.created_at, todo_table.c.id)
+
+
+def get_todo_version(db: Session, user_id: UUID) -> int:
+    """
+    Get the user's TODO version, 0 until their first write.
+
+    Args:
+        db (Session): The database session.
+        user_id (UUID): The user's ID.
+
+    Returns:
+        int: The version, it changes whenever any of the user's TODO items change.
+    """
+    try:
+        return db.execute(todo_version_query(user_id)).scalar() or 0
+    except SQLAlchemyError as e:
+        # Log the exception for debugging purposes
+        print(f"Error getting TODO version: {e}")
+        # Re-raise the exception to be handled at a higher level
+        raise
+
+async def get_todo_version_async(db: AsyncSession, user_id: UUID) -> int:
+    """
+    Async variant of get_todo_version.
+    """
+    try:
+        return (await db.execute(todo_version_query(user_id))).scalar() or 0
+    except SQLAlchemyError as e:
+        # Log the exception for debugging purposes
+        print(f"Error getting TODO version: {e}")
+        # Re-raise the exception to be handled at a higher level
+        raise
+
+
+def get_todo_stats(db: Session, user_id: UUID, days: int) -> dict:
+    """
+    Get a user's TODO counts and recent completions per day from the rollups.
+
+    Args:
+        db (Session): The database session.
+        user_id (UUID): The user's ID.
+        days (int): How many days of completions, including today.
+
+    Returns:
+        dict: total, open, completed & completions_per_day.
+    """
+    try:
+        row = db.execute(todo_stats_query(user_id)).first()
+        completion_days = db.execute(todo_completion_days_query(user_id, date.today() - timedelta(days=days - 1))).all()
+        return todo_stats_result(row, completion_days)
+    except SQLAlchemyError as e:
+        # Log the exception for debugging purposes
+        print(f"Error getting TODO stats: {e}")
+        # Re-raise the exception to be handled at a higher level
+        raise
+
+async def get_todo_stats_async(db: AsyncSession, user_id: UUID, days: int) -> dict:
+    """
+    Async variant of get_todo_stats.
+    """
+    try:
+        row = (await db.execute(todo_stats_query(user_id))).first()
+        completion_days = (await db.execute(todo_completion_days_query(user_id, date.today() - timedelta(days=days - 1)))).all()
+        return todo_stats_result(row, completion_days)
+    except SQLAlchemyError as e:
+        # Log the exception for debugging purposes
+        print(f"Error getting TODO stats: {e}")
+        # Re-raise the exception to be handled at a higher level
+        raise
+
+
+def get_todo_changes(db: Session, user_id: UUID, after: tuple[datetime, UUID], limit: int) -> tuple[Sequence[TODO], Sequence]:
+    """
+    Get the TODO items changed and deleted after a cursor.
+
+    Args:
+        db (Session): The database session.
+        user_id (UUID): The user's ID.
+        after (tuple[datetime, UUID]): The (time, id) of the last change the client has.
+        limit (int): The most rows read from each of todo and todo_tombstone.
+
+    Returns:
+        tuple[Sequence[TODO], Sequence]: The changed items & the (id, deleted_at) tombstones, oldest first.
+    """
+    try:
+        todos = db.exec(todo_changes_query(user_id, after, limit)).all()
+        tombstones = db.execute(todo_tombstones_query(user_id, after, limit)).all()
+        return todos, tombstones
+    except SQLAlchemyError as e:
+        # Log the exception for debugging purposes
+        print(f"Error getting TODO changes: {e}")
+        # Re-raise the exception to be handled at a higher level
+        raise
+
+async def get_todo_changes_async(db: AsyncSession, user_id: UUID, after: tuple[datetime, UUID], limit: int) -> tuple[Sequence[TODO], Sequence]:
+    """
+    Async variant of get_todo_changes.
+    """
+    try:
+        todos = (await db.exec(todo_changes_query(user_id, after, limit))).all()
+        tombstones = (await db.execute(todo_tombstones_query(user_id, after, limit))).all()
+        return todos, tombstones
+    except SQLAlchemyError as e:
+        # Log the exception for debugging purposes
+        print(f"Error getting TODO changes: {e}")
+        # Re-raise the exception to be handled at a higher level
+        raise
+
+
+def todo_stats_result(row, completion_days: Sequence) -> dict:
+    total, completed = (row.total, row.completed) if row is not None else (0, 0)
+    return {
+        "total": total,
+        "open": total - completed,
+        "completed": completed,
+        "completions_per_day": [{"day": day.day, "completions": day.completions} for day in completion_days],
+    }
+
+
+# Every write records itself in the same transaction: the version bump for ETags, the stats rollups
+# & tombstones for the change feed
+
+def record_todo_changes(db: Session, user_id: UUID, before: list[TodoState], after: list[TodoState], deleted: Sequence[UUID] = ()) -> None:
+    """
+    Record a write to a user's TODO items, before commit.
+
+    Args:
+        db (Session): The database session, in the write's transaction.
+        user_id (UUID): The user's ID.
+        before (list[TodoState]): The changed items that existed before the write, as they were.
+        after (list[TodoState]): The changed items that exist after the write, as they are.
+        deleted (Sequence[UUID], optional): The ids of the deleted items.
+    """
+    db.execute(bump_todo_version_statement(user_id))
+    for statement in todo_stats_statements(user_id, before, after):
+        db.execute(statement)
+    if deleted:
+        for statement in todo_tombstone_statements(user_id, list(deleted)):
+            db.execute(statement)
+
+async def record_todo_changes_async(db: AsyncSession, user_id: UUID, before: list[TodoState], after: list[TodoState], deleted: Sequence[UUID] = ()) -> None:
+    """
+    Async variant of record_todo_changes.
+    """
+    await db.execute(bump_todo_version_statement(user_id))
+    for statement in todo_stats_statements(user_id, before, after):
+        await db.execute(statement)
+    if deleted:
+        for statement in todo_tombstone_statements(user_id, list(deleted)):
+            await db.execute(statement)
+
+
+def stamp_completed_at(db_todos: list[TODO]) -> None:
+    """
+    Set completed_at on new TODO items created as completed.
+    """
+    for db_todo in db_todos:
+        if db_todo.completed and db_todo.completed_at is None:
+            db_todo.completed_at = db_todo.created_at
+
+
+def get_all_todo_data(db: Session, user_id: UUID, offset: int, per_page: int, after: tuple[datetime, UUID] | None = None, filters: TODOFilter | None = None) -> Sequence[TODO]:
     """
     Get TODO items with pagination from the database.
 
@@ -22,12 +459,14 @@ def get_all_todo_data(db: Session, user_id: UUID, offset: int, per_page: int) ->
         user_id (UUID): The user's ID.
         offset (int): The number of items to skip.
         per_page (int): The number of items per page.
+        after (tuple[datetime, UUID], optional): Keyset cursor, replaces offset when set.
+        filters (TODOFilter, optional): Filters & sort order.
 
     Returns:
         Sequence[TODO]: The list of TODO items.
     """
     try:
-        query = select(TODO).where(TODO.user_id == user_id).offset(offset).limit(per_page)
+        query = todos_page_query(user_id, offset, per_page, after, filters)
         results = db.exec(query).all()
         return results
     except SQLAlchemyError as e:
@@ -41,6 +480,56 @@ def get_all_todo_data(db: Session, user_id: UUID, offset: int, per_page: int) ->
         # Re-raise the exception to be handled at the endpoint level
         raise
 
+async def get_all_todo_data_async(db: AsyncSession, user_id: UUID, offset: int, per_page: int, after: tuple[datetime, UUID] | None = None, filters: TODOFilter | None = None) -> Sequence[TODO]:
+    """
+    Async variant of get_all_todo_data.
+    """
+    try:
+        query = todos_page_query(user_id, offset, per_page, after, filters)
+        results = (await db.exec(query)).all()
+        return results
+    except SQLAlchemyError as e:
+        # Log the exception for debugging purposes
+        print(f"Error getting TODO items with pagination: {e}")
+        # Re-raise the exception to be handled at the endpoint level
+        raise
+
+# search TODO items
+def search_todo_data(db: Session, user_id: UUID, q: str, per_page: int, after: tuple[float, UUID] | None = None) -> Sequence[tuple[TODO, float]]:
+    """
+    Search a user's TODO items by title and description.
+
+    Args:
+        db (Session): The database session.
+        user_id (UUID): The user's ID.
+        q (str): The search terms.
+        per_page (int): The number of items per page.
+        after (tuple[float, UUID], optional): Keyset cursor from the previous page.
+
+    Returns:
+        Sequence[tuple[TODO, float]]: The matching TODO items with their rank, best first.
+    """
+    try:
+        return db.execute(todos_search_query(user_id, q, per_page, after)).tuples().all()
+    except SQLAlchemyError as e:
+        # Log the exception for debugging purposes
+        print(f"Error searching TODO items: {e}")
+        # Re-raise the exception to be handled at a higher level
+        raise
+
+async def search_todo_data_async(db: AsyncSession, user_id: UUID, q: str, per_page: int, after: tuple[float, UUID] | None = None) -> Sequence[tuple[TODO, float]]:
+    """
+    Async variant of search_todo_data.
+    """
+    try:
+        return (await db.execute(todos_search_query(user_id, q, per_page, after))).tuples().all()
+    except SQLAlchemyError as e:
+        # Log the exception for debugging purposes
+        print(f"Error searching TODO items: {e}")
+        # Re-raise the exception to be handled at a higher level
+        raise
+
+
 # get a single TODO item
 def get_single_todo_data(todo_id: UUID, db: Session, user_id: UUID) -> TODO:
     """
@@ -54,7 +543,7 @@ def get_single_todo_data(todo_id: UUID, db: Session, user_id: UUID) -> TODO:
         TODO: The retrieved TODO item.
     """
     try:
-        db_todo_query = select(TODO).where(TODO.id == todo_id, TODO.user_id == user_id)
+        db_todo_query = todo_query(todo_id, user_id)
         db_todo = db.exec(db_todo_query).first()
         if db_todo is None:
             raise TodoNotFoundError(f"Todo with id {todo_id} not found")
@@ -64,6 +553,22 @@ def get_single_todo_data(todo_id: UUID, db: Session, user_id: UUID) -> TODO:
         print(f"Error getting TODO item: {e}")
         # Re-raise the exception to be handled at a higher level
         raise
+
+async def get_single_todo_data_async(todo_id: UUID, db: AsyncSession, user_id: UUID) -> TODO:
+    """
+    Async variant of get_single_todo_data.
+    """
+    try:
+        db_todo_query = todo_query(todo_id, user_id)
+        db_todo = (await db.exec(db_todo_query)).first()
+        if db_todo is None:
+            raise TodoNotFoundError(f"Todo with id {todo_id} not found")
+        return db_todo
+    except SQLAlchemyError as e:
+        # Log the exception for debugging purposes
+        print(f"Error getting TODO item: {e}")
+        # Re-raise the exception to be handled at a higher level
+        raise
     
 def create_todo_data(db_todo: TODO, db: Session) -> TODO:
     """
@@ -77,7 +582,9 @@ def create_todo_data(db_todo: TODO, db: Session) -> TODO:
         TODO: The created TODO item.
     """
     try:
+        stamp_completed_at([db_todo])
         db.add(db_todo)
+        record_todo_changes(db, db_todo.user_id, [], [(db_todo.completed, db_todo.completed_at)])
         db.commit()
         # db.refresh(db_todo)
         return db_todo
@@ -89,6 +596,24 @@ def create_todo_data(db_todo: TODO, db: Session) -> TODO:
         # Re-raise the exception to be handled at a higher level
         raise
 
+async def create_todo_data_async(db_todo: TODO, db: AsyncSession) -> TODO:
+    """
+    Async variant of create_todo_data.
+    """
+    try:
+        stamp_completed_at([db_todo])
+        db.add(db_todo)
+        await record_todo_changes_async(db, db_todo.user_id, [], [(db_todo.completed, db_todo.completed_at)])
+        await db.commit()
+        return db_todo
+    except SQLAlchemyError as e:
+        # Rollback the transaction in case of error
+        await db.rollback()
+        # Log the exception for debugging purposes
+        print(f"Error creating TODO item: {e}")
+        # Re-raise the exception to be handled at a higher level
+        raise
+
 
 def full_update_todo_data(todo_id: UUID, todo_data: TODOBase, db: Session, user_id: UUID) -> TODO:
     """
@@ -103,15 +628,13 @@ def full_update_todo_data(todo_id: UUID, todo_data: TODOBase, db: Session, user_
         TODO: The updated TODO item.
     """
     try:
-        db_todo_query = select(TODO).where(TODO.id == todo_id, TODO.user_id == user_id)
-        db_todo = db.exec(db_todo_query).first()
-        if db_todo is None:
-            raise TodoNotFoundError(f"Todo with id {todo_id} not found")
         update_data = todo_data.model_dump(exclude_unset=True)
-        for key, value in update_data.items():
-            setattr(db_todo, key, value)
+        row = db.execute(todo_update_statement(todo_id, user_id, update_data)).first()
+        if row is None:
+            raise TodoNotFoundError(f"Todo with id {todo_id} not found")
+        record_todo_changes(db, user_id, [(row.was_completed, row.was_completed_at)], [(row.completed, row.completed_at)])
         db.commit()
-        return db_todo
+        return TODO.model_validate(row._mapping)
     except SQLAlchemyError as e:
         # Rollback the transaction in case of error
         db.rollback()
@@ -120,17 +643,35 @@ def full_update_todo_data(todo_id: UUID, todo_data: TODOBase, db: Session, user_
         # Re-raise the exception to be handled at a higher level
         raise
 
-def partial_update_todo_data(todo_id: UUID, todo_data: TODOBase, db: Session, user_id: UUID) -> TODO:
+async def full_update_todo_data_async(todo_id: UUID, todo_data: TODOBase, db: AsyncSession, user_id: UUID) -> TODO:
+    """
+    Async variant of full_update_todo_data.
+    """
     try:
-        db_todo_query = select(TODO).where(TODO.id == todo_id, TODO.user_id == user_id)
-        db_todo = db.exec(db_todo_query).first()
-        if db_todo is None:
+        update_data = todo_data.model_dump(exclude_unset=True)
+        row = (await db.execute(todo_update_statement(todo_id, user_id, update_data))).first()
+        if row is None:
             raise TodoNotFoundError(f"Todo with id {todo_id} not found")
+        await record_todo_changes_async(db, user_id, [(row.was_completed, row.was_completed_at)], [(row.completed, row.completed_at)])
+        await db.commit()
+        return TODO.model_validate(row._mapping)
+    except SQLAlchemyError as e:
+        # Rollback the transaction in case of error
+        await db.rollback()
+        # Log the exception for debugging purposes
+        print(f"Error updating TODO item: {e}")
+        # Re-raise the exception to be handled at a higher level
+        raise
+
+def partial_update_todo_data(todo_id: UUID, todo_data: TODOBase, db: Session, user_id: UUID) -> TODO:
+    try:
         update_data = todo_data.model_dump(exclude_unset=True)
-        for key, value in update_data.items():
-            setattr(db_todo, key, value)
+        row = db.execute(todo_update_statement(todo_id, user_id, update_data)).first()
+        if row is None:
+            raise TodoNotFoundError(f"Todo with id {todo_id} not found")
+        record_todo_changes(db, user_id, [(row.was_completed, row.was_completed_at)], [(row.completed, row.completed_at)])
         db.commit()
-        return db_todo
+        return TODO.model_validate(row._mapping)
     except SQLAlchemyError as e:
         # Rollback the transaction in case of error
         db.rollback()
@@ -139,6 +680,26 @@ def partial_update_todo_data(todo_id: UUID, todo_data: TODOBase, db: Session, us
         # Re-raise the exception to be handled at a higher level
         raise
 
+async def partial_update_todo_data_async(todo_id: UUID, todo_data: TODOBase, db: AsyncSession, user_id: UUID) -> TODO:
+    """
+    Async variant of partial_update_todo_data.
+    """
+    try:
+        update_data = todo_data.model_dump(exclude_unset=True)
+        row = (await db.execute(todo_update_statement(todo_id, user_id, update_data))).first()
+        if row is None:
+            raise TodoNotFoundError(f"Todo with id {todo_id} not found")
+        await record_todo_changes_async(db, user_id, [(row.was_completed, row.was_completed_at)], [(row.completed, row.completed_at)])
+        await db.commit()
+        return TODO.model_validate(row._mapping)
+    except SQLAlchemyError as e:
+        # Rollback the transaction in case of error
+        await db.rollback()
+        # Log the exception for debugging purposes
+        print(f"Error updating TODO item: {e}")
+        # Re-raise the exception to be handled at a higher level
+        raise
+
 def delete_todo_data(todo_id: UUID, db: Session, user_id: UUID) -> None:
     """
     Delete an existing TODO item from the database.
@@ -148,11 +709,10 @@ def delete_todo_data(todo_id: UUID, db: Session, user_id: UUID) -> None:
         db (Session): The database session.
     """
     try:
-        db_todo_query = select(TODO).where(TODO.id == todo_id, TODO.user_id == user_id)
-        db_todo = db.exec(db_todo_query).first()
-        if db_todo is None:
+        row = db.execute(todo_delete_statement(todo_id, user_id)).first()
+        if row is None:
             raise TodoNotFoundError(f"Todo with id {todo_id} not found")
-        db.delete(db_todo)
+        record_todo_changes(db, user_id, [(row.completed, row.completed_at)], [], deleted=[row.id])
         db.commit()
     except SQLAlchemyError as e:
         # Rollback the transaction in case of error
@@ -160,4 +720,393 @@ def delete_todo_data(todo_id: UUID, db: Session, user_id: UUID) -> None:
         # Log the exception for debugging purposes
         print(f"Error deleting TODO item: {e}")
         # Re-raise the exception to be handled at a higher level
-        raise
\ No newline at end of file
+        raise
+
+async def delete_todo_data_async(todo_id: UUID, db: AsyncSession, user_id: UUID) -> None:
+    """
+    Async variant of delete_todo_data.
+    """
+    try:
+        row = (await db.execute(todo_delete_statement(todo_id, user_id))).first()
+        if row is None:
+            raise TodoNotFoundError(f"Todo with id {todo_id} not found")
+        await record_todo_changes_async(db, user_id, [(row.completed, row.completed_at)], [], deleted=[row.id])
+        await db.commit()
+    except SQLAlchemyError as e:
+        # Rollback the transaction in case of error
+        await db.rollback()
+        # Log the exception for debugging purposes
+        print(f"Error deleting TODO item: {e}")
+        # Re-raise the exception to be handled at a higher level
+        raise
+
+
+# Export reads the rows through a server-side cursor, yield_per turns on stream_results
+# so only one partition of rows is held in memory at a time
+
+def export_todo_data(db: Session, user_id: UUID, chunk_size: int = 1000) -> Iterator[Sequence]:
+    """
+    Stream all of a user's TODO items from the database.
+
+    Args:
+        db (Session): The database session, kept open while iterating.
+        user_id (UUID): The user's ID.
+        chunk_size (int): Rows fetched from the cursor at a time.
+
+    Yields:
+        Sequence: Partitions of up to chunk_size rows.
+    """
+    try:
+        result = db.execute(todos_export_query(user_id).execution_options(yield_per=chunk_size))
+        for partition in result.partitions():
+            yield partition
+    except SQLAlchemyError as e:
+        # Log the exception for debugging purposes
+        print(f"Error exporting TODO items: {e}")
+        # Re-raise the exception to be handled at a higher level
+        raise
+
+async def export_todo_data_async(db: AsyncSession, user_id: UUID, chunk_size: int = 1000) -> AsyncIterator[Sequence]:
+    """
+    Async variant of export_todo_data.
+    """
+    try:
+        result = await db.stream(todos_export_query(user_id).execution_options(yield_per=chunk_size))
+        async for partition in result.partitions():
+            yield partition
+    except SQLAlchemyError as e:
+        # Log the exception for debugging purposes
+        print(f"Error exporting TODO items: {e}")
+        # Re-raise the exception to be handled at a higher level
+        raise
+
+
+# Batch operations run as one transaction with multi-row statements, rows are
+# returned through RETURNING so nothing is loaded back after the commit
+
+
+def batch_insert_statement(db_todos: list[TODO]):
+    """
+    Build a single multi-row INSERT ... RETURNING for new TODO items.
+    """
+    rows = [db_todo.model_dump() for db_todo in db_todos]
+    return insert(todo_table).values(rows).returning(*todo_columns)
+
+
+def batch_update_statements(items: list[dict], user_id: UUID) -> list:
+    """
+    Build UPDATE ... FROM (VALUES ...) RETURNING statements for partial updates.
+
+    Items setting the same fields share one statement, so a typical batch is a
+    single UPDATE. Each item is a dict with "id" and the fields to set. Like
+    todo_update_statement, RETURNING has was_completed & was_completed_at, read
+    from the items locked FOR UPDATE.
+    """
+    groups: dict[tuple[str, ...], list[dict]] = {}
+    for item in items:
+        keys = tuple(sorted(key for key in item if key != "id"))
+        groups.setdefault(keys, []).append(item)
+
+    statements = []
+    for keys, group in groups.items():
+        old = locked_todo_states(todo_table.c.id.in_([item["id"] for item in group]), user_id)
+        batch = values(
+            column("id", todo_table.c.id.type),
+            *[column(key, todo_table.c[key].type) for key in keys],
+            name="batch",
+        ).data([(item["id"], *(item[key] for key in keys)) for item in group])
+        update_data = {key: batch.c[key] for key in keys}
+        if "completed" in update_data:
+            update_data["completed_at"] = completed_at_value(batch.c.completed)
+        statements.append(
+            update(todo_table)
+            .where(todo_table.c.id == batch.c.id, todo_table.c.user_id == user_id, old.c.id == todo_table.c.id)
+            .values(update_data)
+            .returning(*todo_columns, old.c.completed.label("was_completed"), old.c.completed_at.label("was_completed_at"))
+        )
+    return statements
+
+
+def batch_delete_statement(todo_ids: list[UUID], user_id: UUID):
+    """
+    Build a single DELETE ... RETURNING id, completed, completed_at for the user's TODO items.
+    """
+    return (delete(todo_table)
+            .where(todo_table.c.user_id == user_id, todo_table.c.id.in_(todo_ids))
+            .returning(todo_table.c.id, todo_table.c.completed, todo_table.c.completed_at))
+
+
+def create_todo_batch_data(db_todos: list[TODO], db: Session) -> list[TODO]:
+    """
+    Create many TODO items in one transaction.
+
+    Args:
+        db_todos (list[TODO]): The TODO items to be created.
+        db (Session): The database session.
+
+    Returns:
+        list[TODO]: The created TODO items.
+    """
+    try:
+        stamp_completed_at(db_todos)
+        rows = db.execute(batch_insert_statement(db_todos)).all()
+        record_todo_changes(db, db_todos[0].user_id, [], [(row.completed, row.completed_at) for row in rows])
+        db.commit()
+        return [TODO.model_validate(row._mapping) for row in rows]
+    except SQLAlchemyError as e:
+        # Rollback the transaction in case of error
+        db.rollback()
+        # Log the exception for debugging purposes
+        print(f"Error creating TODO items: {e}")
+        # Re-raise the exception to be handled at a higher level
+        raise
+
+async def create_todo_batch_data_async(db_todos: list[TODO], db: AsyncSession) -> list[TODO]:
+    """
+    Async variant of create_todo_batch_data.
+    """
+    try:
+        stamp_completed_at(db_todos)
+        rows = (await db.execute(batch_insert_statement(db_todos))).all()
+        await record_todo_changes_async(db, db_todos[0].user_id, [], [(row.completed, row.completed_at) for row in rows])
+        await db.commit()
+        return [TODO.model_validate(row._mapping) for row in rows]
+    except SQLAlchemyError as e:
+        # Rollback the transaction in case of error
+        await db.rollback()
+        # Log the exception for debugging purposes
+        print(f"Error creating TODO items: {e}")
+        # Re-raise the exception to be handled at a higher level
+        raise
+
+
+def update_todo_batch_data(items: list[dict], db: Session, user_id: UUID) -> dict[UUID, TODO]:
+    """
+    Partially update many TODO items in one transaction.
+
+    Args:
+        items (list[dict]): Each item's "id" and the fields to set.
+        db (Session): The database session.
+        user_id (UUID): The user's ID, items owned by other users are not updated.
+
+    Returns:
+        dict[UUID, TODO]: The updated TODO items by id, missing ids were not found.
+    """
+    try:
+        updated, before = {}, []
+        for statement in batch_update_statements(items, user_id):
+            for row in db.execute(statement):
+                updated[row.id] = TODO.model_validate(row._mapping)
+                before.append((row.was_completed, row.was_completed_at))
+        if updated:
+            record_todo_changes(db, user_id, before, [(todo.completed, todo.completed_at) for todo in updated.values()])
+        db.commit()
+        return updated
+    except SQLAlchemyError as e:
+        # Rollback the transaction in case of error
+        db.rollback()
+        # Log the exception for debugging purposes
+        print(f"Error updating TODO items: {e}")
+        # Re-raise the exception to be handled at a higher level
+        raise
+
+async def update_todo_batch_data_async(items: list[dict], db: AsyncSession, user_id: UUID) -> dict[UUID, TODO]:
+    """
+    Async variant of update_todo_batch_data.
+    """
+    try:
+        updated, before = {}, []
+        for statement in batch_update_statements(items, user_id):
+            for row in await db.execute(statement):
+                updated[row.id] = TODO.model_validate(row._mapping)
+                before.append((row.was_completed, row.was_completed_at))
+        if updated:
+            await record_todo_changes_async(db, user_id, before, [(todo.completed, todo.completed_at) for todo in updated.values()])
+        await db.commit()
+        return updated
+    except SQLAlchemyError as e:
+        # Rollback the transaction in case of error
+        await db.rollback()
+        # Log the exception for debugging purposes
+        print(f"Error updating TODO items: {e}")
+        # Re-raise the exception to be handled at a higher level
+        raise
+
+
+def delete_todo_batch_data(todo_ids: list[UUID], db: Session, user_id: UUID) -> set[UUID]:
+    """
+    Delete many TODO items in one transaction.
+
+    Args:
+        todo_ids (list[UUID]): The IDs of the TODO items to delete.
+        db (Session): The database session.
+        user_id (UUID): The user's ID, items owned by other users are not deleted.
+
+    Returns:
+        set[UUID]: The deleted ids, missing ids were not found.
+    """
+    try:
+        rows = db.execute(batch_delete_statement(todo_ids, user_id)).all()
+        if rows:
+            record_todo_changes(db, user_id, [(row.completed, row.completed_at) for row in rows], [], deleted=[row.id for row in rows])
+        db.commit()
+        deleted = {row.id for row in rows}
+        return deleted
+    except SQLAlchemyError as e:
+        # Rollback the transaction in case of error
+        db.rollback()
+        # Log the exception for debugging purposes
+        print(f"Error deleting TODO items: {e}")
+        # Re-raise the exception to be handled at a higher level
+        raise
+
+async def delete_todo_batch_data_async(todo_ids: list[UUID], db: AsyncSession, user_id: UUID) -> set[UUID]:
+    """
+    Async variant of delete_todo_batch_data.
+    """
+    try:
+        rows = (await db.execute(batch_delete_statement(todo_ids, user_id))).all()
+        if rows:
+            await record_todo_changes_async(db, user_id, [(row.completed, row.completed_at) for row in rows], [], deleted=[row.id for row in rows])
+        await db.commit()
+        deleted = {row.id for row in rows}
+        return deleted
+    except SQLAlchemyError as e:
+        # Rollback the transaction in case of error
+        await db.rollback()
+        # Log the exception for debugging purposes
+        print(f"Error deleting TODO items: {e}")
+        # Re-raise the exception to be handled at a higher level
+        raise
+
+
+
+# Imports bypass the ORM and load rows with COPY on the session's own psycopg connection
+
+IMPORT_COLUMNS = ("id", "title", "description", "completed", "updated_at", "created_at", "completed_at", "user_id")
+copy_statement = f"COPY {todo_table.name} ({', '.join(IMPORT_COLUMNS)}) FROM STDIN"
+
+
+def import_rows(todos: list[TODOBase], user_id: UUID) -> list[tuple]:
+    """
+    Build the COPY rows, in IMPORT_COLUMNS order, for validated TODO items.
+    """
+    now = datetime.now()
+    return [(uuid4(), todo.title, todo.description, todo.completed, now, now, now if todo.completed else None, user_id) for todo in todos]
+
+
+def copy_todo_data(todos: list[TODOBase], db: Session, user_id: UUID) -> int:
+    """
+    Load TODO items into the database with COPY and commit them.
+
+    Args:
+        todos (list[TODOBase]): The validated TODO items.
+        db (Session): The database session.
+        user_id (UUID): The user's ID.
+
+    Returns:
+        int: The number of items loaded.
+    """
+    try:
+        rows = import_rows(todos, user_id)
+        connection = db.connection().connection.driver_connection
+        with connection.cursor() as cursor:
+            with cursor.copy(copy_statement) as copy:
+                for row in rows:
+                    copy.write_row(row)
+        record_todo_changes(db, user_id, [], [(row[3], row[6]) for row in rows])
+        db.commit()
+        return len(todos)
+    except (SQLAlchemyError, PsycopgError) as e:
+        # Rollback the transaction in case of error
+        db.rollback()
+        # Log the exception for debugging purposes
+        print(f"Error importing TODO items: {e}")
+        # Re-raise the exception to be handled at a higher level
+        raise
+
+async def copy_todo_data_async(todos: list[TODOBase], db: AsyncSession, user_id: UUID) -> int:
+    """
+    Async variant of copy_todo_data.
+    """
+    try:
+        rows = import_rows(todos, user_id)
+        connection = (await (await db.connection()).get_raw_connection()).driver_connection
+        async with connection.cursor() as cursor:
+            async with cursor.copy(copy_statement) as copy:
+                for row in rows:
+                    await copy.write_row(row)
+        await record_todo_changes_async(db, user_id, [], [(row[3], row[6]) for row in rows])
+        await db.commit()
+        return len(todos)
+    except (SQLAlchemyError, PsycopgError) as e:
+        # Rollback the transaction in case of error
+        await db.rollback()
+        # Log the exception for debugging purposes
+        print(f"Error importing TODO items: {e}")
+        # Re-raise the exception to be handled at a higher level
+        raise
+
+
+# Rebuilding recomputes the rollups from the todo table, to repair drift or fill them in for existing data
+
+def rebuild_todo_stats_statements(user_id: UUID | None = None) -> list:
+    """
+    Build the statements that replace the stats rollups with counts from the todo table.
+
+    The rollup tables are locked first. Writes that already changed their stats commit
+    before the counts are read, later ones wait and apply their delta on top.
+
+    Args:
+        user_id (UUID, optional): Only rebuild this user's rollups, all users when None.
+
+    Returns:
+        list: The statements, to run in order in one transaction.
+    """
+    counts = select(
+        todo_table.c.user_id,
+        func.count().label("total"),
+        func.count().filter(todo_table.c.completed).label("completed"),
+    ).group_by(todo_table.c.user_id)
+    completion_day = cast(todo_table.c.completed_at, Date)
+    completion_days = select(
+        todo_table.c.user_id,
+        completion_day.label("day"),
+        func.count().label("completions"),
+    ).where(todo_table.c.completed, todo_table.c.completed_at.is_not(None)).group_by(todo_table.c.user_id, completion_day)
+    delete_stats = delete(todo_stats_table)
+    delete_days = delete(todo_completion_day_table)
+    if user_id is not None:
+        counts = counts.where(todo_table.c.user_id == user_id)
+        completion_days = completion_days.where(todo_table.c.user_id == user_id)
+        delete_stats = delete_stats.where(todo_stats_table.c.user_id == user_id)
+        delete_days = delete_days.where(todo_completion_day_table.c.user_id == user_id)
+
+    return [
+        text(f"LOCK TABLE {todo_stats_table.name}, {todo_completion_day_table.name} IN EXCLUSIVE MODE"),
+        delete_stats,
+        delete_days,
+        insert(todo_stats_table).from_select(["user_id", "total", "completed"], counts),
+        insert(todo_completion_day_table).from_select(["user_id", "day", "completions"], completion_days),
+    ]
+
+
+def rebuild_todo_stats(db: Session, user_id: UUID | None = None) -> None:
+    """
+    Rebuild the stats rollups from the todo table.
+
+    Args:
+        db (Session): The database session.
+        user_id (UUID, optional): Only rebuild this user's rollups, all users when None.
+    """
+    try:
+        for statement in rebuild_todo_stats_statements(user_id):
+            db.execute(statement)
+        db.commit()
+    except SQLAlchemyError as e:
+        # Rollback the transaction in case of error
+        db.rollback()
+        # Log the exception for debugging purposes
+        print(f"Error rebuilding TODO stats: {e}")
+        # Re-raise the exception to be handled at a higher level
+        raise
@@ -1,23 +1,40 @@
-from fastapi import Depends, FastAPI, HTTPException, Query, Header
+from fastapi import Depends, FastAPI, HTTPException, Query, Header, Request, Response
+from fastapi.responses import StreamingResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlmodel import Session
 
+from datetime import datetime, timedelta
 from uuid import UUID
-from typing import Annotated
+from typing import Annotated, Literal
 from contextlib import asynccontextmanager
-import httpx
+from urllib.parse import urlencode
 
 # Now you can use relative imports
-from app.core.config_db import get_db, create_db_and_tables
-from app.core.settings import AUTH_SERVER_URL
-from app.models import TODOBase, TODOResponse, PaginatedTodos
-from app.service import create_todo_service, get_todo_by_id_service, get_all_todos_service, full_update_todo_service, partial_update_todo_service, delete_todo_data
+from app.core.cursor import encode_cursor, decode_cursor, InvalidCursorError
+from app.core.etag import todo_etag, todo_item_etag, etag_matches, etag_headers
+from app.core.fast_json import paginated_todos_response
+from app.core.settings import FAST_JSON, TODO_TOMBSTONE_RETENTION_DAYS, TODO_EVENTS_LISTEN
+from app.core.config_db import get_session, create_db_and_tables, pool_stats, DBSession
+from app.core.http_client import auth_client
+from app.core.events import change_broker, change_listener
+from app.core.metrics import MetricsMiddleware, metrics_response
+from app.core.query_budget import QueryBudgetMiddleware
+from app.core.utils import LOCAL_TOKEN_VERIFICATION, verify_token_local, verify_token_remote, response_detail, token_cache, internal_endpoints_enabled
+from app.models import TODOBase, TODOResponse, PaginatedTodos, TODOFilter, TODOStatsResponse, TODOChanges, TODOBatchUpdate, TODOBatchDelete, TODOBatchResponse, TODOImportResult
+from app.service import (create_todo_service, get_todo_by_id_service, get_all_todos_service, full_update_todo_service, partial_update_todo_service, delete_todo_data, delete_todo_data_async, run_crud,
+                         create_todo_batch_service, update_todo_batch_service, delete_todo_batch_service, export_todos_service,
+                         import_todos_service, get_todo_version_service, search_todos_service, get_todo_stats_service,
+                         get_todo_changes_service, todo_events_service)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     print("Creating Tables")
     create_db_and_tables()
+    await auth_client.start()
+    if TODO_EVENTS_LISTEN:
+        await change_listener.start()
     yield
+    await change_listener.aclose()
+    await auth_client.aclose()
 
 
 app = FastAPI(
@@ -38,40 +55,46 @@ app = FastAPI(
     docs_url="/api/docs"
 )
 
+# Request latency & in-flight requests for /metrics
+app.add_middleware(MetricsMiddleware)
+# SQL statements per request, X-DB-Queries headers with QUERY_DEBUG_HEADERS
+app.add_middleware(QueryBudgetMiddleware)
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
-# Call Auth Server and get str user_id owith 200 or an error message in JSON - use httpx 
-def get_current_user_dep(token: Annotated[str | None, Depends(oauth2_scheme)]):
-    print("get_user_id token", token)
-    print("\n-------\n\\\\\\\\-n  AUTH_SERVER_URL", AUTH_SERVER_URL)
-    url = f"{AUTH_SERVER_URL}/api/users/me"
-    headers = {"Authorization": f"Bearer {token}"}
+# Verify the token locally with the shared signing key, or call Auth Server when TOKEN_VERIFICATION=remote
+async def get_current_user_dep(token: Annotated[str | None, Depends(oauth2_scheme)]):
+    if LOCAL_TOKEN_VERIFICATION:
+        return verify_token_local(token)
+    return await verify_token_remote(token)
 
-    response = httpx.get(url, headers=headers)
 
-    print( "get_user_id" ,response.json())
+# A browser's EventSource can't set an Authorization header, the event stream also takes the token as ?access_token=
+stream_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token", auto_error=False)
 
-    if response.status_code == 200:
-        return response.json()
-    else:
-        raise HTTPException(status_code=response.status_code, detail=response.json().get('detail'))
+
+async def get_stream_user_dep(token: Annotated[str | None, Depends(stream_oauth2_scheme)],
+                              access_token: str | None = Query(None, description="Access token, for clients that can't set an Authorization header")):
+    token = token or access_token
+    if not token:
+        raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+    return await get_current_user_dep(token)
 
 
 # Call Auth Server to login and get token using /token endpoint - use httpx
 @app.post("/api/token")
-def login_for_access_token(form_data: Annotated[OAuth2PasswordRequestForm, Depends()]):
+async def login_for_access_token(form_data: Annotated[OAuth2PasswordRequestForm, Depends()]):
     # Send a POST request to the Auth Server's /api/oauth/login endpoint with form_data: Annotated[OAuth2PasswordRequestForm, Depends()]
-    url = f"{AUTH_SERVER_URL}/api/oauth/login"
     data = {
         "username": form_data.username,
         "password": form_data.password
     }
-    response = httpx.post(url, data=data)
+    response = await auth_client.post("/api/oauth/login", data=data)
 
     if response.status_code == 200:
         return response.json()
     
-    raise HTTPException(status_code=response.status_code, detail=response.json().get('detail'))
+    raise HTTPException(status_code=response.status_code, detail=response_detail(response))
     
 
 
@@ -80,59 +103,307 @@ def login_for_access_token(form_data: Annotated[OAuth2PasswordRequestForm, Depen
 def read_root():
     return {"Hello": "World"}
 
+# Hit/miss counters for sizing TOKEN_CACHE_MAXSIZE
+@app.get("/api/internal/token-cache", include_in_schema=False, dependencies=[Depends(internal_endpoints_enabled)])
+async def token_cache_stats():
+    return {**token_cache.stats(), "auth_client": auth_client.stats()}
+
+# Prometheus scrape endpoint: request latency, DB statement timings, pool stats & auth-server calls
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return metrics_response()
+
+# Connection pool saturation, checked out vs size + max_overflow, waits & timeouts per engine
+@app.get("/api/internal/db-pool", include_in_schema=False, dependencies=[Depends(internal_endpoints_enabled)])
+async def db_pool_stats():
+    return pool_stats()
+
 # Get ALL TODOS
 @app.get("/api/todos", response_model=PaginatedTodos, tags=["TODO Crud"])
-def get_todos(db: Session = Depends(get_db), user_id = Depends(get_current_user_dep), page: int = Query(1, description="Page number", ge=1),
-              per_page: int = Query(10, description="Items per page", ge=1, le=100)):
+async def get_todos(response: Response, db: DBSession = Depends(get_session), user_id = Depends(get_current_user_dep), page: int = Query(1, description="Page number", ge=1),
+              per_page: int = Query(10, description="Items per page", ge=1, le=100),
+              cursor: str | None = Query(None, description="next_cursor of the previous page, replaces page"),
+              filters: TODOFilter = Depends(), if_none_match: str | None = Header(None)):
     """
     Get ALL TODOS
 
+    Filters by completed and created_at / updated_at ranges (after is inclusive, before exclusive)
+    and sorts by created_at or updated_at, "-" for descending. A cursor only continues the listing
+    it came from, send the same filters & sort with it.
+
+    Responses carry an ETag from the user's TODO version, a matching If-None-Match gets a 304
+    after a single primary key lookup.
+
     Args:
-        db (Session, optional):  Dependency Injection
+        response (Response): Sets the ETag
+        db (DBSession, optional):  Dependency Injection
         user_id (UUID, optional):  Dependency Injection
         page (int, optional): Page number. Defaults to Query(1).
         per_page (int, optional): Items per page. Defaults to Query(10).
+        cursor (str, optional): Keyset cursor from next_cursor. Defaults to Query(None).
+        filters (TODOFilter, optional): completed, created_after, created_before, updated_after, updated_before & sort query parameters
+        if_none_match (str, optional): ETag of the client's copy. Defaults to Header(None).
 
     Returns:
 
         PaginatedTodos: Paginated Todos
     """
     try:
+        after = decode_cursor(cursor, datetime, UUID) if cursor else None
+    except InvalidCursorError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    try:
+        # Read the version before the items, a write in between only leaves the ETag older than the body
+        etag = todo_etag(user_id, await get_todo_version_service(db, user_id))
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=etag_headers(etag))
+        response.headers.update(etag_headers(etag))
+
         print("\n IN API ROUTE user_id", user_id)
         # Calculate the offset to skip the appropriate number of items
         offset = (page - 1) * per_page
-        all_todos = get_all_todos_service(db, user_id, offset, per_page)
+        all_todos = await get_all_todos_service(db, user_id, offset, per_page, after, filters)
 
-        # Calculate next and previous page URLs
-        next_page = f"?page={page + 1}&per_page={per_page}" if len(all_todos) == per_page else None
-        previous_page = f"?page={page - 1}&per_page={per_page}" if page > 1 else None
+        # Cursor for the page after the last item, in (sort field, id) order
+        sort_field = filters.sort.lstrip("-")
+        next_cursor = encode_cursor(getattr(all_todos[-1], sort_field), all_todos[-1].id) if len(all_todos) == per_page else None
+
+        # Calculate next and previous page URLs, keeping the filters & sort
+        filter_params = filters.model_dump(mode="json", exclude_defaults=True)
+        if after is not None:
+            next_page = f"?{urlencode({'cursor': next_cursor, 'per_page': per_page, **filter_params})}" if next_cursor else None
+            previous_page = None
+        else:
+            next_page = f"?{urlencode({'page': page + 1, 'per_page': per_page, **filter_params})}" if len(all_todos) == per_page else None
+            previous_page = f"?{urlencode({'page': page - 1, 'per_page': per_page, **filter_params})}" if page > 1 else None
 
         # Return data in paginated format
-        paginated_data = {"count": len(all_todos), "next": next_page, "previous": previous_page, "todos": all_todos}
+        paginated_data = {"count": len(all_todos), "next": next_page, "previous": previous_page, "next_cursor": next_cursor, "todos": all_todos}
 
+        if FAST_JSON:
+            return paginated_todos_response(paginated_data, headers=etag_headers(etag))
         return paginated_data
         # return get_all_todos_service(db, user_id)
     except Exception as e:
         # Handle specific exceptions with different HTTP status codes if needed
         raise HTTPException(status_code=500, detail=f"An error occurred: {e}")
 
+# TODO stats, declared before /api/todos/{todo_id} so "stats" isn't parsed as an id
+@app.get("/api/todos/stats", response_model=TODOStatsResponse, tags=["TODO Crud"])
+async def get_todo_stats(db: DBSession = Depends(get_session), user_id: UUID = Depends(get_current_user_dep),
+                         days: int = Query(30, description="Days of completions, including today", ge=1, le=366)):
+    """
+    Get TODO stats
+
+    Reads the per-user rollups kept by every write, not the TODO items.
+
+    Args:
+        db (DBSession, optional):  Dependency Injection
+        user_id (UUID, optional):  Dependency Injection
+        days (int, optional): Days of completions. Defaults to Query(30).
+
+    Returns:
+        TODOStatsResponse: Total, open & completed counts with completions per day
+    """
+    try:
+        return await get_todo_stats_service(db, user_id, days)
+    except Exception as e:
+        # Handle specific exceptions with different HTTP status codes if needed
+        raise HTTPException(status_code=500, detail=f"An error occurred: {e}")
+
+# Search TODOS, declared before /api/todos/{todo_id} so "search" isn't parsed as an id
+@app.get("/api/todos/search", response_model=PaginatedTodos, tags=["TODO Crud"])
+async def search_todos(q: str = Query(..., description="Search terms, supports \"phrases\", or and -word", min_length=1, max_length=200),
+                       db: DBSession = Depends(get_session), user_id: UUID = Depends(get_current_user_dep),
+                       per_page: int = Query(10, description="Items per page", ge=1, le=100),
+                       cursor: str | None = Query(None, description="next_cursor of the previous page")):
+    """
+    Search TODOS
+
+    Full-text search over title and description, ranked with title matches first.
+
+    Args:
+        q (str): Search terms
+        db (DBSession, optional):  Dependency Injection
+        user_id (UUID, optional):  Dependency Injection
+        per_page (int, optional): Items per page. Defaults to Query(10).
+        cursor (str, optional): Keyset cursor from next_cursor. Defaults to Query(None).
+
+    Returns:
+
+        PaginatedTodos: Matching Todos, best first
+    """
+    try:
+        after = decode_cursor(cursor, float, UUID) if cursor else None
+    except InvalidCursorError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    try:
+        results = await search_todos_service(db, user_id, q, per_page, after)
+        todos = [todo for todo, _ in results]
+
+        # Cursor for the page after the last item, in (rank, id) order
+        next_cursor = encode_cursor(results[-1][1], results[-1][0].id) if len(results) == per_page else None
+        next_page = f"?{urlencode({'q': q, 'cursor': next_cursor, 'per_page': per_page})}" if next_cursor else None
+
+        paginated_data = {"count": len(todos), "next": next_page, "previous": None, "next_cursor": next_cursor, "todos": todos}
+
+        if FAST_JSON:
+            return paginated_todos_response(paginated_data)
+        return paginated_data
+    except Exception as e:
+        # Handle specific exceptions with different HTTP status codes if needed
+        raise HTTPException(status_code=500, detail=f"An error occurred: {e}")
+
+# TODO changes, declared before /api/todos/{todo_id} so "changes" isn't parsed as an id
+@app.get("/api/todos/changes", response_model=TODOChanges, tags=["TODO Crud"])
+async def get_todo_changes(db: DBSession = Depends(get_session), user_id: UUID = Depends(get_current_user_dep),
+                           since: str | None = Query(None, description="next_cursor of the previous call, everything when omitted"),
+                           per_page: int = Query(100, description="Most changes returned", ge=1, le=1000)):
+    """
+    Get TODO changes
+
+    Delta sync: the items created or updated and the ids deleted after a cursor, oldest first. Polling
+    reads only what changed, seeking (user_id, updated_at) and (user_id, deleted_at).
+
+    Args:
+        db (DBSession, optional):  Dependency Injection
+        user_id (UUID, optional):  Dependency Injection
+        since (str, optional): Cursor from next_cursor. Defaults to Query(None).
+        per_page (int, optional): Most changes returned. Defaults to Query(100).
+
+    Returns:
+        TODOChanges: Changed items, deleted ids & the cursor for the next call, 410 when the cursor
+        is older than the deletes kept and the client has to fetch its list again
+    """
+    try:
+        after = decode_cursor(since, datetime, UUID) if since else None
+    except InvalidCursorError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if after is not None and after[0] < datetime.now() - timedelta(days=TODO_TOMBSTONE_RETENTION_DAYS):
+        raise HTTPException(status_code=410, detail="Cursor expired, fetch the full list again")
+
+    try:
+        if after is None:
+            return await get_todo_changes_service(db, user_id, per_page)
+        return await get_todo_changes_service(db, user_id, per_page, after)
+    except Exception as e:
+        # Handle specific exceptions with different HTTP status codes if needed
+        raise HTTPException(status_code=500, detail=f"An error occurred: {e}")
+
+# TODO events, declared before /api/todos/{todo_id} so "events" isn't parsed as an id
+@app.get("/api/todos/events", tags=["TODO Crud"], response_class=StreamingResponse)
+async def todo_events(db: DBSession = Depends(get_session), user_id: UUID = Depends(get_stream_user_dep)):
+    """
+    Stream TODO events
+
+    Server-Sent Events pushed when any of the user's TODO items change, instead of polling. Each
+    event carries the new TODO version (null after the server missed notifications), the first
+    one the current version; fetch /api/todos/changes on each.
+
+    Takes the usual Authorization header, or the access token as ?access_token= for a browser's
+    EventSource, which can't set headers. A token in the URL can end up in access logs, it is only
+    accepted here and expires like any access token: once it has, EventSource gets a 401 and stops
+    reconnecting, open a new one with a fresh token.
+
+    Args:
+        db (DBSession, optional):  Dependency Injection
+        user_id (UUID, optional):  Dependency Injection
+
+    Returns:
+        StreamingResponse: text/event-stream of "todos" events
+    """
+    # Subscribed before reading the version, so a write in between is still pushed
+    queue = change_broker.subscribe(user_id)
+    try:
+        version = await get_todo_version_service(db, user_id)
+    except Exception as e:
+        change_broker.unsubscribe(user_id, queue)
+        raise HTTPException(status_code=500, detail=f"An error occurred: {e}")
+
+    return StreamingResponse(
+        todo_events_service(user_id, queue, version),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# Export ALL TODOS, declared before /api/todos/{todo_id} so "export" isn't parsed as an id
+@app.get("/api/todos/export", tags=["TODO Crud"], response_class=StreamingResponse)
+async def export_todos(user_id: UUID = Depends(get_current_user_dep),
+                       export_format: Literal["ndjson", "csv"] = Query("ndjson", alias="format", description="ndjson or csv")):
+    """
+    Export ALL TODOS
+
+    Streams every TODO item from a server-side cursor, memory use doesn't grow with the number of items.
+
+    Args:
+        user_id (UUID, optional):  Dependency Injection
+        export_format (str, optional): ndjson or csv. Defaults to Query("ndjson").
+
+    Returns:
+        StreamingResponse: One JSON object per line, or CSV with a header row
+    """
+    media_type = "text/csv" if export_format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        export_todos_service(user_id, export_format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="todos.{export_format}"'},
+    )
+
+# Import TODO items, declared before /api/todos/{todo_id} like export
+@app.post("/api/todos/import", response_model=TODOImportResult, tags=["TODO Crud"])
+async def import_todos(request: Request, db: DBSession = Depends(get_session), user_id: UUID = Depends(get_current_user_dep),
+                       import_format: Literal["ndjson", "csv"] = Query("ndjson", alias="format", description="ndjson or csv")):
+    """
+    Import TODO items
+
+    Reads the body as it streams in, one JSON object per line or CSV with a header row
+    (title, description, completed), the format /api/todos/export writes. Rows are loaded
+    with COPY in chunks, invalid rows are reported and skipped. Lines longer than
+    TODO_IMPORT_MAX_LINE_LENGTH are row errors, in CSV they stop the import.
+
+    Args:
+        request (Request): The NDJSON or CSV body
+        db (DBSession, optional):  Dependency Injection
+        user_id (UUID, optional):  Dependency Injection
+        import_format (str, optional): ndjson or csv. Defaults to Query("ndjson").
+
+    Returns:
+        TODOImportResult: Imported & failed counts with row errors
+    """
+    try:
+        return await import_todos_service(request.stream(), import_format, db, user_id)
+    except Exception as e:
+        # Handle specific exceptions with different HTTP status codes if needed
+        raise HTTPException(status_code=500, detail=f"An error occurred: {e}")
+
 # Get a Single TODO item
 @app.get("/api/todos/{todo_id}", response_model=TODOResponse, tags=["TODO Crud"])
-def get_todo_by_id(todo_id: UUID, db: Session = Depends(get_db), user_id: UUID = Depends(get_current_user_dep)):
+async def get_todo_by_id(todo_id: UUID, response: Response, db: DBSession = Depends(get_session), user_id: UUID = Depends(get_current_user_dep),
+                         if_none_match: str | None = Header(None)):
     """
     Get a Single TODO item
 
     Args:
         todo_id (UUID): TODO ID
-        db (Session, optional):  Dependency Injection
+        response (Response): Sets the ETag
+        db (DBSession, optional):  Dependency Injection
         user_id (UUID, optional):  Dependency Injection
+        if_none_match (str, optional): ETag of the client's copy. Defaults to Header(None).
 
     Returns:
         TODOResponse: TODO Response
     
     """
     try:
-        return get_todo_by_id_service(todo_id, db, user_id)
+        # Look the TODO up first, a missing one is a 404 even for If-None-Match: *
+        todo = await get_todo_by_id_service(todo_id, db, user_id)
+        etag = todo_item_etag(todo.id, todo.updated_at)
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=etag_headers(etag))
+        response.headers.update(etag_headers(etag))
+        return todo
     except HTTPException as e:
         # If the service layer raised an HTTPException, re-raise it
         raise e
@@ -143,41 +414,109 @@ def get_todo_by_id(todo_id: UUID, db: Session = Depends(get_db), user_id: UUID =
 
 # Create a new TODO item
 @app.post("/api/todos", response_model=TODOResponse, tags=["TODO Crud"], status_code=201)
-def create_todo(todo: TODOBase, db: Session = Depends(get_db), user_id: UUID = Depends(get_current_user_dep)):
+async def create_todo(todo: TODOBase, db: DBSession = Depends(get_session), user_id: UUID = Depends(get_current_user_dep)):
     """
     Create a new TODO item
 
     Args:
         todo (TODOBase): TODO Data
-        db (Session, optional):  Dependency Injection
+        db (DBSession, optional):  Dependency Injection
         user_id (UUID, optional):  Dependency Injection
 
     Returns:
         TODOResponse: TODO Response
     """
     try:
-        return create_todo_service(todo, db, user_id)
+        return await create_todo_service(todo, db, user_id)
     except Exception as e:
         # Handle specific exceptions with different HTTP status codes if needed
         raise HTTPException(status_code=500, detail=f"An error occurred: {e}")
 
+# Batch endpoints are declared before /api/todos/{todo_id} so "batch" isn't parsed as an id
+
+# Create many TODO items
+@app.post("/api/todos/batch", response_model=TODOBatchResponse, tags=["TODO Batch"], status_code=201)
+async def create_todos_batch(todos: list[TODOBase], db: DBSession = Depends(get_session), user_id: UUID = Depends(get_current_user_dep)):
+    """
+    Create many TODO items in one transaction
+
+    Args:
+        todos (list[TODOBase]): TODO Data
+        db (DBSession, optional):  Dependency Injection
+        user_id (UUID, optional):  Dependency Injection
+
+    Returns:
+        TODOBatchResponse: Per-item results
+    """
+    try:
+        return await create_todo_batch_service(todos, db, user_id)
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An error occurred: {e}")
+
+
+# Partially update many TODO items
+@app.patch("/api/todos/batch", response_model=TODOBatchResponse, tags=["TODO Batch"])
+async def update_todos_batch(items: list[TODOBatchUpdate], db: DBSession = Depends(get_session), user_id: UUID = Depends(get_current_user_dep)):
+    """
+    Partially update many TODO items in one transaction
+
+    Args:
+        items (list[TODOBatchUpdate]): TODO IDs and the fields to update
+        db (DBSession, optional):  Dependency Injection
+        user_id (UUID, optional):  Dependency Injection
+
+    Returns:
+        TODOBatchResponse: Per-item results
+    """
+    try:
+        return await update_todo_batch_service(items, db, user_id)
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An error occurred: {e}")
+
+
+# Delete many TODO items
+@app.delete("/api/todos/batch", response_model=TODOBatchResponse, tags=["TODO Batch"])
+async def delete_todos_batch(batch: TODOBatchDelete, db: DBSession = Depends(get_session), user_id: UUID = Depends(get_current_user_dep)):
+    """
+    Delete many TODO items in one transaction
+
+    Args:
+        batch (TODOBatchDelete): TODO IDs
+        db (DBSession, optional):  Dependency Injection
+        user_id (UUID, optional):  Dependency Injection
+
+    Returns:
+        TODOBatchResponse: Per-item results
+    """
+    try:
+        return await delete_todo_batch_service(batch.ids, db, user_id)
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An error occurred: {e}")
+
+
 # Update a Single TODO item Completly
 @app.put("/api/todos/{todo_id}", response_model=TODOResponse, tags=["TODO Crud"])
-def update_todo(todo_id: UUID, updated_todo: TODOBase, db: Session = Depends(get_db), user_id: UUID = Depends(get_current_user_dep)):
+async def update_todo(todo_id: UUID, updated_todo: TODOBase, db: DBSession = Depends(get_session), user_id: UUID = Depends(get_current_user_dep)):
     """
     Update a Single TODO item Completly
 
     Args:
         todo_id (UUID): TODO ID
         updated_todo (TODOBase): Updated TODO Data
-        db (Session, optional):  Dependency Injection
+        db (DBSession, optional):  Dependency Injection
         user_id (UUID, optional):  Dependency Injection
 
     Returns:
         TODOResponse: TODO Response
     """
     try:
-        return full_update_todo_service(todo_id, updated_todo, db, user_id)
+        return await full_update_todo_service(todo_id, updated_todo, db, user_id)
     except Exception as e:
         # Handle specific exceptions with different HTTP status codes if needed
         raise HTTPException(status_code=500, detail=f"An error occurred: {e}")
@@ -185,21 +524,21 @@ def update_todo(todo_id: UUID, updated_todo: TODOBase, db: Session = Depends(get
 
 # Update a Single TODO item partially
 @app.patch("/api/todos/{todo_id}", response_model=TODOResponse, tags=["TODO Crud"])
-def update_todo_partial(todo_id: UUID, updated_todo: TODOBase, db: Session = Depends(get_db), user_id: UUID = Depends(get_current_user_dep)):
+async def update_todo_partial(todo_id: UUID, updated_todo: TODOBase, db: DBSession = Depends(get_session), user_id: UUID = Depends(get_current_user_dep)):
     """
     Partially Update a Single TODO item
 
     Args:
         todo_id (UUID): TODO ID
         updated_todo (TODOBase): Updated TODO Data
-        db (Session, optional): Dependency Injection
+        db (DBSession, optional): Dependency Injection
         user_id (UUID, optional):  Dependency Injection
 
     Returns:
         TODOResponse: TODO Response
     """
     try:
-        return partial_update_todo_service(todo_id, updated_todo, db, user_id)
+        return await partial_update_todo_service(todo_id, updated_todo, db, user_id)
     except Exception as e:
         # Handle specific exceptions with different HTTP status codes if needed
         raise HTTPException(status_code=500, detail=f"An error occurred: {e}")
@@ -207,20 +546,20 @@ def update_todo_partial(todo_id: UUID, updated_todo: TODOBase, db: Session = Dep
 
 # DELETE a single TODO item
 @app.delete("/api/todos/{todo_id}", tags=["TODO Crud"])
-def delete_todo(todo_id: UUID, db: Session = Depends(get_db), user_id: UUID = Depends(get_current_user_dep)):
+async def delete_todo(todo_id: UUID, db: DBSession = Depends(get_session), user_id: UUID = Depends(get_current_user_dep)):
     """
     Delete a Single TODO item
 
     Args:
         todo_id (UUID): TODO ID
-        db (Session, optional):  Dependency Injection
+        db (DBSession, optional):  Dependency Injection
         user_id (UUID, optional):  Dependency Injection
 
     Returns:
         null
     """
     try:
-        return delete_todo_data(todo_id, db, user_id)
+        return await run_crud(db, delete_todo_data, delete_todo_data_async, todo_id=todo_id, user_id=user_id)
     except Exception as e:
         # Handle specific exceptions with different HTTP status codes if needed
         raise HTTPException(status_code=500, detail=f"An error occurred: {e}")
\ No newline at end of file
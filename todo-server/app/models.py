@@ -1,29 +1,105 @@
-from datetime import datetime
+from datetime import date, datetime
 from sqlmodel import SQLModel, Field
+from sqlalchemy import BigInteger, Column, Computed, Index, false
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from uuid import uuid4, UUID
-from typing import Optional, Union
+from typing import Literal, Optional, Union
 
 class TODOBase(SQLModel):
     """
     Represents a TODO in the database.
     """
-    title: str = Field(index=True)
-    description: str = Field(default=None, nullable=True)  # Made description optional
+    title: str = Field()
+    description: Union[str, None] = Field(default=None, nullable=True)  # Made description optional
     completed: bool = Field(default=False)
 
 class TODO(TODOBase, table=True):
     """
     Represents a TODO in the database.
     """
+    # Every query is scoped by user_id: lists seek (user_id, created_at, id) or (user_id, updated_at, id),
+    # lookups (user_id, id). Open items, the most common list, have their own smaller partial index
+    __table_args__ = (
+        Index("ix_todo_user_id_created_at_id", "user_id", "created_at", "id"),
+        Index("ix_todo_user_id_updated_at_id", "user_id", "updated_at", "id"),
+        Index("ix_todo_open_user_id_created_at_id", "user_id", "created_at", "id", postgresql_where=Column("completed") == false()),
+        Index("ix_todo_user_id_id", "user_id", "id"),
+    )
 
-    id: UUID | None = Field(primary_key=True, index=True, default_factory=uuid4)
+    id: UUID | None = Field(primary_key=True, default_factory=uuid4)
     
     updated_at: datetime | None = Field(default_factory=datetime.now, sa_column_kwargs={"onupdate": datetime.now})
     created_at: datetime | None = Field(default_factory=datetime.now)
+    # Set when completed turns true, cleared when it turns false, the day counts in todo_completion_day
+    completed_at: datetime | None = Field(default=None)
     # Foreign key to reference the user
     user_id: Optional[UUID] = Field(default=None)
 
 
+# Text search configuration for the search_vector column, changing it needs the column rebuilt
+SEARCH_CONFIG = "english"
+
+# Maintained by Postgres from title (weight A) & description (weight B) on every write, it's a
+# plain table column rather than a field so TODO items never load or serialize it
+TODO.__table__.append_column(Column(
+    "search_vector",
+    TSVECTOR,
+    Computed(
+        f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(title, '')), 'A') || "
+        f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(description, '')), 'B')",
+        persisted=True,
+    ),
+))
+Index("ix_todo_search_vector", TODO.__table__.c.search_vector, postgresql_using="gin")
+
+
+class TODOVersion(SQLModel, table=True):
+    """
+    Represents a user's TODO change counter, bumped in the same transaction as every write.
+    """
+    __tablename__ = "todo_version"
+
+    user_id: UUID = Field(primary_key=True)
+    version: int = Field(default=0, sa_type=BigInteger)
+
+
+class TODOUserStats(SQLModel, table=True):
+    """
+    Represents a user's TODO counts, updated in the same transaction as every write.
+    """
+    __tablename__ = "todo_stats"
+
+    user_id: UUID = Field(primary_key=True)
+    total: int = Field(default=0, sa_type=BigInteger)
+    completed: int = Field(default=0, sa_type=BigInteger)
+
+
+class TODOCompletionDay(SQLModel, table=True):
+    """
+    Represents how many of a user's completed TODO items were completed on a day.
+    """
+    __tablename__ = "todo_completion_day"
+
+    user_id: UUID = Field(primary_key=True)
+    day: date = Field(primary_key=True)
+    completions: int = Field(default=0)
+
+
+class TODOTombstone(SQLModel, table=True):
+    """
+    Represents a deleted TODO item, kept for TODO_TOMBSTONE_RETENTION_DAYS so the change feed can report it.
+    """
+    __tablename__ = "todo_tombstone"
+    # The change feed seeks (user_id, deleted_at, id), like (user_id, updated_at, id) on the todo table
+    __table_args__ = (
+        Index("ix_todo_tombstone_user_id_deleted_at_id", "user_id", "deleted_at", "id"),
+    )
+
+    id: UUID = Field(primary_key=True)
+    user_id: UUID
+    deleted_at: datetime = Field(default_factory=datetime.now)
+
+
 class TODOCreate(TODOBase):
     """
     Represents a TODO item to be created.
@@ -41,6 +117,18 @@ class TODOResponse(TODOBase):
     user_id: UUID
 
 
+class TODOFilter(SQLModel):
+    """
+    Represents the filters & sort order of a TODO list, sort is a field name, "-" for descending.
+    """
+    completed: Union[bool, None] = None
+    created_after: Union[datetime, None] = None
+    created_before: Union[datetime, None] = None
+    updated_after: Union[datetime, None] = None
+    updated_before: Union[datetime, None] = None
+    sort: Literal["created_at", "-created_at", "updated_at", "-updated_at"] = "created_at"
+
+
 class PaginatedTodos(SQLModel):
     """
     Represents a paginated list of TODO items.
@@ -48,4 +136,96 @@ class PaginatedTodos(SQLModel):
     count: int
     next:  Union[str, None] = None
     previous:  Union[str, None] = None
+    # Opaque keyset cursor for the page after this one
+    next_cursor: Union[str, None] = None
+    todos: list[TODOResponse]
+
+
+class TODOBatchUpdate(SQLModel):
+    """
+    Represents a partial update of one TODO item in a batch.
+    """
+    id: UUID
+    title: Union[str, None] = None
+    description: Union[str, None] = None
+    completed: Union[bool, None] = None
+
+
+class TODOBatchDelete(SQLModel):
+    """
+    Represents the TODO items to delete in a batch.
+    """
+    ids: list[UUID]
+
+
+class TODOBatchResult(SQLModel):
+    """
+    Represents the outcome of one item in a batch, status follows the single item endpoints.
+    """
+    id: UUID
+    status: int
+    todo: Union[TODOResponse, None] = None
+    detail: Union[str, None] = None
+
+
+class TODOBatchResponse(SQLModel):
+    """
+    Represents the per-item results of a batch, in request order.
+    """
+    results: list[TODOBatchResult]
+
+
+
+class TODODeleted(SQLModel):
+    """
+    Represents a TODO item deleted since the change feed cursor.
+    """
+    id: UUID
+    deleted_at: datetime
+
+
+class TODOChanges(SQLModel):
+    """
+    Represents the TODO items created, updated or deleted after a cursor, oldest change first.
+
+    next_cursor is always set, has_more means the next page is ready to be fetched right away.
+    """
     todos: list[TODOResponse]
+    deleted: list[TODODeleted]
+    next_cursor: str
+    has_more: bool
+
+
+class TODOCompletionDayResponse(SQLModel):
+    """
+    Represents the number of TODO items completed on a day.
+    """
+    day: date
+    completions: int
+
+
+class TODOStatsResponse(SQLModel):
+    """
+    Represents a user's TODO counts and completions per day, most recent day first.
+    """
+    total: int
+    open: int
+    completed: int
+    completions_per_day: list[TODOCompletionDayResponse]
+
+
+class TODOImportError(SQLModel):
+    """
+    Represents a row that wasn't imported, row is the 1-based line (NDJSON) or record (CSV) number.
+    """
+    row: int
+    detail: str
+
+
+class TODOImportResult(SQLModel):
+    """
+    Represents the outcome of an import, errors lists the first TODO_IMPORT_MAX_ERRORS failed rows.
+    """
+    imported: int
+    failed: int
+    errors: list[TODOImportError]
@@ -0,0 +1,25 @@
+"""
+Rebuild the TODO stats rollups from the todo table, to repair drift.
+
+    python -m app.rebuild_stats [--user-id UUID]
+"""
+from sqlmodel import Session
+from uuid import UUID
+import argparse
+
+from app.core.config_db import engine
+from app.crud import rebuild_todo_stats
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Rebuild the TODO stats rollups from the todo table.")
+    parser.add_argument("--user-id", type=UUID, default=None, help="Only rebuild this user's stats")
+    args = parser.parse_args(argv)
+
+    with Session(engine) as db:
+        rebuild_todo_stats(db, args.user_id)
+    print(f"Rebuilt TODO stats for {args.user_id or 'all users'}")
+
+
+if __name__ == "__main__":
+    main()
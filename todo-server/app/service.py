@@ -1,28 +1,114 @@
 from fastapi import HTTPException
-from sqlmodel import Session
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import SQLAlchemyError
 
-from app.models import TODOBase, TODO
-from app.crud import create_todo_data, get_single_todo_data, get_all_todo_data, full_update_todo_data, partial_update_todo_data, delete_todo_data, TodoNotFoundError
+from app.core import config_db
+from app.core.config_db import DBSession
+from app.core.cursor import encode_cursor
+from app.core.events import change_broker
+from app.core.settings import TODO_BATCH_MAX_ITEMS, TODO_IMPORT_CHUNK_SIZE, TODO_IMPORT_MAX_ERRORS, TODO_IMPORT_MAX_LINE_LENGTH, TODO_CHANGES_LAG, TODO_EVENTS_HEARTBEAT
+from app.models import TODOBase, TODO, TODOBatchUpdate, TODOFilter
+from app.crud import (create_todo_data, get_single_todo_data, get_all_todo_data, full_update_todo_data, partial_update_todo_data, delete_todo_data,
+                      create_todo_data_async, get_single_todo_data_async, get_all_todo_data_async, full_update_todo_data_async, partial_update_todo_data_async, delete_todo_data_async,
+                      create_todo_batch_data, update_todo_batch_data, delete_todo_batch_data,
+                      create_todo_batch_data_async, update_todo_batch_data_async, delete_todo_batch_data_async,
+                      export_todo_data, export_todo_data_async, todo_columns,
+                      copy_todo_data, copy_todo_data_async, get_todo_version, get_todo_version_async,
+                      search_todo_data, search_todo_data_async, get_todo_stats, get_todo_stats_async,
+                      get_todo_changes, get_todo_changes_async,
+                      TodoNotFoundError)
+
+from sqlmodel import Session
+from psycopg import Error as PsycopgError
+from pydantic import ValidationError
 
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Callable, Iterator, Sequence
 from uuid import UUID
+import asyncio
+import codecs
+import csv
+import io
+import json
+
+
+async def run_crud(db: DBSession, sync_fn: Callable[..., Any], async_fn: Callable[..., Any], **kwargs: Any) -> Any:
+    """
+    Run a crud function against the session in use.
+
+    Args:
+        db (DBSession): A sync Session or an AsyncSession, depending on DB_ASYNC.
+        sync_fn (Callable): The crud function for a sync Session, run in the threadpool.
+        async_fn (Callable): Its async variant for an AsyncSession, awaited on the event loop.
+        **kwargs: Arguments for the crud function, except db.
+
+    Returns:
+        The crud function's result.
+    """
+    if isinstance(db, AsyncSession):
+        return await async_fn(db=db, **kwargs)
+    return await run_in_threadpool(sync_fn, db=db, **kwargs)
+
+# get a user's TODO version, for ETags
+async def get_todo_version_service(db: DBSession, user_id: UUID) -> int:
+    """
+    Get the user's TODO version without reading any TODO items.
+
+    Args:
+        db (DBSession): The database session.
+        user_id (UUID): The user's ID.
+
+    Returns:
+        int: The version, bumped by every write to the user's TODO items.
+    """
+    try:
+        return await run_crud(db, get_todo_version, get_todo_version_async, user_id=user_id)
+    except Exception as e:
+        # Log the exception for debugging purposes
+        print(f"Error getting TODO version: {e}")
+        # Re-raise the exception to be handled at the endpoint level
+        raise
+
+# get a user's TODO stats
+async def get_todo_stats_service(db: DBSession, user_id: UUID, days: int) -> dict:
+    """
+    Get a user's TODO counts and completions per day from the rollups, without reading any TODO items.
+
+    Args:
+        db (DBSession): The database session.
+        user_id (UUID): The user's ID.
+        days (int): How many days of completions, including today.
+
+    Returns:
+        dict: total, open, completed & completions_per_day.
+    """
+    try:
+        return await run_crud(db, get_todo_stats, get_todo_stats_async, user_id=user_id, days=days)
+    except Exception as e:
+        # Log the exception for debugging purposes
+        print(f"Error getting TODO stats: {e}")
+        # Re-raise the exception to be handled at the endpoint level
+        raise
 
 # get all TODO items
-def get_all_todos_service(db: Session, user_id: UUID, offset: int, per_page: int):
+async def get_all_todos_service(db: DBSession, user_id: UUID, offset: int, per_page: int, after: tuple[datetime, UUID] | None = None, filters: TODOFilter | None = None):
     """
     Get all TODO items with pagination from the database.
 
     Args:
-        db (Session): The database session.
+        db (DBSession): The database session.
         user_id (UUID): The user's ID.
         offset (int): The number of items to skip.
         per_page (int): The number of items per page.
+        after (tuple[datetime, UUID], optional): Keyset cursor, replaces offset when set.
+        filters (TODOFilter, optional): Filters & sort order.
 
     Returns:
         List[TODO]: The list of TODO items.
     """
     try:
-        get_todos = get_all_todo_data(db, user_id, offset, per_page)
+        get_todos = await run_crud(db, get_all_todo_data, get_all_todo_data_async, user_id=user_id, offset=offset, per_page=per_page, after=after, filters=filters)
         return get_todos
     except Exception as e:
         # Log the exception for debugging purposes
@@ -30,10 +116,129 @@ def get_all_todos_service(db: Session, user_id: UUID, offset: int, per_page: int
         # Re-raise the exception to be handled at the endpoint level
         raise
 
+# search TODO items
+async def search_todos_service(db: DBSession, user_id: UUID, q: str, per_page: int, after: tuple[float, UUID] | None = None):
+    """
+    Search a user's TODO items by title and description, best match first.
+
+    Args:
+        db (DBSession): The database session.
+        user_id (UUID): The user's ID.
+        q (str): The search terms.
+        per_page (int): The number of items per page.
+        after (tuple[float, UUID], optional): Keyset cursor from the previous page.
+
+    Returns:
+        List[tuple[TODO, float]]: The matching TODO items with their rank.
+    """
+    try:
+        return await run_crud(db, search_todo_data, search_todo_data_async, user_id=user_id, q=q, per_page=per_page, after=after)
+    except Exception as e:
+        # Log the exception for debugging purposes
+        print(f"Error searching TODO items: {e}")
+        # Re-raise the exception to be handled at the endpoint level
+        raise
+
+# The change feed's first cursor, before any change
+CHANGES_START = (datetime.min, UUID(int=0))
+
+
+def todo_changes_page(todos: Sequence[TODO], tombstones: Sequence, after: tuple[datetime, UUID], per_page: int, settled_before: datetime) -> dict:
+    """
+    Merge changed items and tombstones into one page of the change feed, in (time, id) order.
+
+    Once the client has caught up the cursor trails settled_before: a write whose updated_at was
+    stamped before a poll but committed after it is then returned by the next poll, at the cost of
+    repeating the last few seconds of changes, which clients apply idempotently.
+
+    Args:
+        todos (Sequence[TODO]): Changed items after the cursor, at most per_page + 1.
+        tombstones (Sequence): (id, deleted_at) rows after the cursor, at most per_page + 1.
+        after (tuple[datetime, UUID]): The client's cursor.
+        per_page (int): The most changes on the page.
+        settled_before (datetime): Writes stamped before this are assumed committed.
+
+    Returns:
+        dict: todos, deleted, next_cursor & has_more.
+    """
+    changes = sorted([(todo.updated_at, todo.id, todo) for todo in todos] + [(row.deleted_at, row.id, row) for row in tombstones],
+                     key=lambda change: change[:2])
+    has_more = len(changes) > per_page
+    changes = changes[:per_page]
+
+    last = changes[-1][:2] if changes else after
+    if not has_more:
+        last = max(after, min(last, (settled_before, UUID(int=0))))
+
+    return {
+        "todos": [change for _, _, change in changes if isinstance(change, TODO)],
+        "deleted": [{"id": change.id, "deleted_at": change.deleted_at} for _, _, change in changes if not isinstance(change, TODO)],
+        "next_cursor": encode_cursor(*last),
+        "has_more": has_more,
+    }
+
+# get TODO items changed after a cursor
+async def get_todo_changes_service(db: DBSession, user_id: UUID, per_page: int, after: tuple[datetime, UUID] = CHANGES_START) -> dict:
+    """
+    Get the user's TODO items created, updated or deleted after a cursor.
+
+    Args:
+        db (DBSession): The database session.
+        user_id (UUID): The user's ID.
+        per_page (int): The most changes returned.
+        after (tuple[datetime, UUID], optional): The cursor from next_cursor, from the start when omitted.
+
+    Returns:
+        dict: todos, deleted, next_cursor & has_more.
+    """
+    try:
+        # Taken before reading, anything stamped earlier and committed later is picked up next time
+        settled_before = datetime.now() - timedelta(seconds=TODO_CHANGES_LAG)
+        todos, tombstones = await run_crud(db, get_todo_changes, get_todo_changes_async, user_id=user_id, after=after, limit=per_page + 1)
+        return todo_changes_page(todos, tombstones, after, per_page, settled_before)
+    except Exception as e:
+        # Log the exception for debugging purposes
+        print(f"Error getting TODO changes: {e}")
+        # Re-raise the exception to be handled at the endpoint level
+        raise
+
+def format_todo_event(version: int | None) -> str:
+    """
+    Format a change as a Server-Sent Event, the version is also the event id.
+    """
+    event_id = f"id: {version}\n" if version is not None else ""
+    return f"{event_id}event: todos\ndata: {json.dumps({'version': version})}\n\n"
+
+# stream a user's TODO change events
+async def todo_events_service(user_id: UUID, queue: asyncio.Queue, version: int) -> AsyncIterator[str]:
+    """
+    Stream a user's TODO change events as Server-Sent Events until the client disconnects.
+
+    Args:
+        user_id (UUID): The user's ID.
+        queue (asyncio.Queue): The user's change_broker subscription, subscribed before version was read.
+        version (int): The user's TODO version when the stream opened, sent first.
+
+    Yields:
+        str: Events with the new version, keepalive comments while idle.
+    """
+    try:
+        yield format_todo_event(version)
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), TODO_EVENTS_HEARTBEAT)
+            except asyncio.TimeoutError:
+                # Keeps proxies from closing an idle stream
+                yield ": keepalive\n\n"
+                continue
+            yield format_todo_event(event["version"])
+    finally:
+        change_broker.unsubscribe(user_id, queue)
+
 # get a single TODO item
-def get_todo_by_id_service(todo_id: UUID, db: Session, user_id: UUID) -> TODO:
+async def get_todo_by_id_service(todo_id: UUID, db: DBSession, user_id: UUID) -> TODO:
     try:
-        todo = get_single_todo_data(todo_id, db, user_id)
+        todo = await run_crud(db, get_single_todo_data, get_single_todo_data_async, todo_id=todo_id, user_id=user_id)
         return todo
     except TodoNotFoundError:
         raise HTTPException(status_code=404, detail="Todo not found")
@@ -47,13 +252,13 @@ def get_todo_by_id_service(todo_id: UUID, db: Session, user_id: UUID) -> TODO:
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
-def create_todo_service(todo_data: TODOBase, db: Session, user_id: UUID) -> TODO:
+async def create_todo_service(todo_data: TODOBase, db: DBSession, user_id: UUID) -> TODO:
     """
     Create a new TODO item.
 
     Args:
         todo (TODOSchema): The TODO item to be created.
-        db (Session): The database session.
+        db (DBSession): The database session.
 
     Raises:
         HTTPException: If there is a database error or an unexpected error.
@@ -67,7 +272,7 @@ def create_todo_service(todo_data: TODOBase, db: Session, user_id: UUID) -> TODO
         # Validate the data
         db_todo = TODO.model_validate(todo_data)
         db_todo.user_id = user_id
-        return create_todo_data(db_todo, db)
+        return await run_crud(db, create_todo_data, create_todo_data_async, db_todo=db_todo)
     except SQLAlchemyError as e:
         print(f"Database error when creating TODO item: {e}")
         raise HTTPException(status_code=500, detail="Database error")
@@ -76,14 +281,14 @@ def create_todo_service(todo_data: TODOBase, db: Session, user_id: UUID) -> TODO
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
-def full_update_todo_service(todo_id: UUID, todo_data: TODOBase, db: Session, user_id: UUID) -> TODO:
+async def full_update_todo_service(todo_id: UUID, todo_data: TODOBase, db: DBSession, user_id: UUID) -> TODO:
     """
     Update an existing TODO item.
 
     Args:
         todo_id (UUID): The ID of the TODO item to be updated.
         todo (TODOSchema): The updated TODO item.
-        db (Session): The database session.
+        db (DBSession): The database session.
 
     Raises:
         HTTPException: If the TODO item is not found, or if there is a database error or an unexpected error.
@@ -92,7 +297,7 @@ def full_update_todo_service(todo_id: UUID, todo_data: TODOBase, db: Session, us
         TODO: The updated TODO item.
     """
     try:
-        return full_update_todo_data(todo_id, todo_data, db, user_id)
+        return await run_crud(db, full_update_todo_data, full_update_todo_data_async, todo_id=todo_id, todo_data=todo_data, user_id=user_id)
     except TodoNotFoundError:
         raise HTTPException(status_code=404, detail="Todo not found")
     except SQLAlchemyError as e:
@@ -103,20 +308,20 @@ def full_update_todo_service(todo_id: UUID, todo_data: TODOBase, db: Session, us
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
-def partial_update_todo_service(todo_id: UUID, todo_data: TODOBase, db: Session, user_id: UUID) -> TODO:
+async def partial_update_todo_service(todo_id: UUID, todo_data: TODOBase, db: DBSession, user_id: UUID) -> TODO:
     """
     Partially update an existing TODO item.
 
     Args:
         todo_id (str): The ID of the TODO item to update.
         todo_data (TODOBase): The updated TODO item data.
-        db (Session): The database session.
+        db (DBSession): The database session.
 
     Returns:
         TODO: The updated TODO item.
     """
     try:
-        return partial_update_todo_data(todo_id, todo_data, db, user_id)
+        return await run_crud(db, partial_update_todo_data, partial_update_todo_data_async, todo_id=todo_id, todo_data=todo_data, user_id=user_id)
     except TodoNotFoundError:
         raise HTTPException(status_code=404, detail="Todo not found")
     except SQLAlchemyError as e:
@@ -127,16 +332,16 @@ def partial_update_todo_service(todo_id: UUID, todo_data: TODOBase, db: Session,
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
-def delete_todo_service(todo_id: UUID, db: Session, user_id: UUID) -> None:
+async def delete_todo_service(todo_id: UUID, db: DBSession, user_id: UUID) -> None:
     """
     Delete a TODO item from the database.
 
     Args:
         todo_id (str): The ID of the TODO item to delete.
-        db (Session): The database session.
+        db (DBSession): The database session.
     """
     try:
-        return delete_todo_data(todo_id, db, user_id)
+        return await run_crud(db, delete_todo_data, delete_todo_data_async, todo_id=todo_id, user_id=user_id)
     except TodoNotFoundError:
         raise HTTPException(status_code=404, detail="Todo not found")
     except SQLAlchemyError as e:
@@ -145,3 +350,347 @@ def delete_todo_service(todo_id: UUID, db: Session, user_id: UUID) -> None:
     except Exception as e:
         print(f"Error deleting TODO item: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
+
+
+def validate_batch(todo_ids: list[UUID]) -> None:
+    """
+    Validate the size of a batch and that no TODO item appears twice.
+
+    Raises:
+        HTTPException: 422 if the batch is empty, too large or has duplicate ids.
+    """
+    if not todo_ids:
+        raise HTTPException(status_code=422, detail="Batch is empty")
+    if len(todo_ids) > TODO_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=422, detail=f"Batch has more than {TODO_BATCH_MAX_ITEMS} items")
+    if len(set(todo_ids)) != len(todo_ids):
+        raise HTTPException(status_code=422, detail="Batch has duplicate ids")
+
+
+async def create_todo_batch_service(todos_data: list[TODOBase], db: DBSession, user_id: UUID) -> dict:
+    """
+    Create many TODO items in a single transaction.
+
+    Args:
+        todos_data (list[TODOBase]): The TODO items to be created.
+        db (DBSession): The database session.
+        user_id (UUID): The user's ID.
+
+    Raises:
+        HTTPException: If the batch is invalid, or if there is a database error or an unexpected error.
+
+    Returns:
+        dict: The per-item results.
+    """
+    db_todos = []
+    for todo_data in todos_data:
+        db_todo = TODO.model_validate(todo_data)
+        db_todo.user_id = user_id
+        db_todos.append(db_todo)
+    validate_batch([db_todo.id for db_todo in db_todos])
+
+    try:
+        created = await run_crud(db, create_todo_batch_data, create_todo_batch_data_async, db_todos=db_todos)
+        return {"results": [{"id": todo.id, "status": 201, "todo": todo} for todo in created]}
+    except SQLAlchemyError as e:
+        print(f"Database error when creating TODO items: {e}")
+        raise HTTPException(status_code=500, detail="Database error")
+    except Exception as e:
+        print(f"Error creating TODO items: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+
+async def update_todo_batch_service(items: list[TODOBatchUpdate], db: DBSession, user_id: UUID) -> dict:
+    """
+    Partially update many TODO items in a single transaction.
+
+    Args:
+        items (list[TODOBatchUpdate]): Each TODO item's id and the fields to set.
+        db (DBSession): The database session.
+        user_id (UUID): The user's ID.
+
+    Raises:
+        HTTPException: If the batch is invalid, or if there is a database error or an unexpected error.
+
+    Returns:
+        dict: The per-item results, 404 for items that were not found.
+    """
+    validate_batch([item.id for item in items])
+    updates = [item.model_dump(exclude_unset=True) for item in items]
+    for update_data in updates:
+        if len(update_data) == 1:
+            raise HTTPException(status_code=422, detail=f"No fields to update for todo {update_data['id']}")
+        # description is nullable like in a single update, title & completed aren't
+        if update_data.get("title", "") is None or update_data.get("completed", False) is None:
+            raise HTTPException(status_code=422, detail=f"title and completed can't be null for todo {update_data['id']}")
+
+    try:
+        updated = await run_crud(db, update_todo_batch_data, update_todo_batch_data_async, items=updates, user_id=user_id)
+        return {"results": [{"id": item.id, "status": 200, "todo": updated[item.id]} if item.id in updated
+                            else {"id": item.id, "status": 404, "detail": "Todo not found"} for item in items]}
+    except SQLAlchemyError as e:
+        print(f"Database error when updating TODO items: {e}")
+        raise HTTPException(status_code=500, detail="Database error")
+    except Exception as e:
+        print(f"Error updating TODO items: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+
+async def delete_todo_batch_service(todo_ids: list[UUID], db: DBSession, user_id: UUID) -> dict:
+    """
+    Delete many TODO items in a single transaction.
+
+    Args:
+        todo_ids (list[UUID]): The IDs of the TODO items to delete.
+        db (DBSession): The database session.
+        user_id (UUID): The user's ID.
+
+    Raises:
+        HTTPException: If the batch is invalid, or if there is a database error or an unexpected error.
+
+    Returns:
+        dict: The per-item results, 404 for items that were not found.
+    """
+    validate_batch(todo_ids)
+
+    try:
+        deleted = await run_crud(db, delete_todo_batch_data, delete_todo_batch_data_async, todo_ids=todo_ids, user_id=user_id)
+        return {"results": [{"id": todo_id, "status": 204} if todo_id in deleted
+                            else {"id": todo_id, "status": 404, "detail": "Todo not found"} for todo_id in todo_ids]}
+    except SQLAlchemyError as e:
+        print(f"Database error when deleting TODO items: {e}")
+        raise HTTPException(status_code=500, detail="Database error")
+    except Exception as e:
+        print(f"Error deleting TODO items: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+
+EXPORT_COLUMNS = [column.name for column in todo_columns]
+
+
+def _export_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    return value
+
+
+def format_export_rows(rows: Sequence, export_format: str, header: bool = False) -> str:
+    """
+    Serialize a partition of exported rows as NDJSON lines or CSV records.
+
+    Args:
+        rows (Sequence): Rows from todos_export_query.
+        export_format (str): "ndjson" or "csv".
+        header (bool): Start with the CSV header row.
+
+    Returns:
+        str: The serialized chunk.
+    """
+    if export_format == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if header:
+            writer.writerow(EXPORT_COLUMNS)
+        writer.writerows([_export_value(row._mapping[name]) for name in EXPORT_COLUMNS] for row in rows)
+        return buffer.getvalue()
+    return "".join(json.dumps({name: _export_value(row._mapping[name]) for name in EXPORT_COLUMNS}) + "\n" for row in rows)
+
+
+def _export_todos(user_id: UUID, export_format: str) -> Iterator[str]:
+    with Session(config_db.engine) as db:
+        if export_format == "csv":
+            yield format_export_rows([], export_format, header=True)
+        for rows in export_todo_data(db, user_id):
+            yield format_export_rows(rows, export_format)
+
+
+async def _export_todos_async(user_id: UUID, export_format: str) -> AsyncIterator[str]:
+    async with AsyncSession(config_db.async_engine) as db:
+        if export_format == "csv":
+            yield format_export_rows([], export_format, header=True)
+        async for rows in export_todo_data_async(db, user_id):
+            yield format_export_rows(rows, export_format)
+
+
+def export_todos_service(user_id: UUID, export_format: str) -> Iterator[str] | AsyncIterator[str]:
+    """
+    Stream all of a user's TODO items as NDJSON or CSV.
+
+    The response body outlives the request's session dependency, so the export
+    opens its own session that stays open until the last row is sent.
+
+    Args:
+        user_id (UUID): The user's ID.
+        export_format (str): "ndjson" or "csv".
+
+    Returns:
+        Iterator[str] | AsyncIterator[str]: Text chunks for a StreamingResponse, async when DB_ASYNC is set.
+    """
+    if config_db.async_engine is not None:
+        return _export_todos_async(user_id, export_format)
+    return _export_todos(user_id, export_format)
+
+
+IMPORT_FIELDS = set(TODOBase.model_fields)
+
+
+async def _import_lines(body: AsyncIterator[bytes], max_length: int) -> AsyncIterator[str | None]:
+    # Decode incrementally so a multi-byte character split across chunks survives, utf-8-sig drops a BOM
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    buffer = ""
+    # A line over max_length is yielded as None, its text is dropped as it arrives instead of buffered
+    too_long = False
+    async for chunk in body:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield None if too_long or len(line) > max_length else line
+            too_long = False
+        if len(buffer) > max_length:
+            too_long, buffer = True, ""
+    buffer += decoder.decode(b"", final=True)
+    if too_long or len(buffer) > max_length:
+        yield None
+    elif buffer:
+        yield buffer
+
+
+async def parse_import_records(body: AsyncIterator[bytes], import_format: str,
+                               max_line_length: int = TODO_IMPORT_MAX_LINE_LENGTH) -> AsyncIterator[tuple[int, dict | None, str | None]]:
+    """
+    Parse a streamed NDJSON or CSV body into records, one line or CSV record at a time.
+
+    An NDJSON line longer than max_line_length is reported as a row error and skipped.
+    A CSV record can't be resynchronized after an overlong line, parsing stops there.
+
+    Args:
+        body (AsyncIterator[bytes]): The request body.
+        import_format (str): "ndjson" or "csv", CSV starts with a header row.
+        max_line_length (int, optional): Longest line or CSV record, in characters. Defaults to TODO_IMPORT_MAX_LINE_LENGTH.
+
+    Yields:
+        tuple[int, dict | None, str | None]: The row number, and the record or why it couldn't be parsed.
+    """
+    too_long = f"Longer than {max_line_length} characters"
+    row = 0
+    if import_format == "csv":
+        header = None
+        pending: list[str] = []
+        pending_length = 0
+        async for line in _import_lines(body, max_line_length):
+            if line is None or pending_length + len(line) > max_line_length:
+                yield row + 1, None, f"{too_long}, import stopped"
+                return
+            pending.append(line)
+            pending_length += len(line) + 1
+            # A quoted field can span lines, the record is complete once its quotes are balanced
+            text = "\n".join(pending)
+            if text.count('"') % 2:
+                continue
+            pending, pending_length = [], 0
+            if not text.strip():
+                continue
+            try:
+                fields = next(csv.reader([text]))
+            except csv.Error as e:
+                fields, error = None, f"Invalid CSV: {e}"
+            if header is None:
+                header = fields or []
+                continue
+            row += 1
+            if fields is None:
+                yield row, None, error
+            elif len(fields) != len(header):
+                yield row, None, f"Expected {len(header)} fields, got {len(fields)}"
+            else:
+                yield row, dict(zip(header, fields)), None
+        if pending:
+            yield row + 1, None, "Invalid CSV: unterminated quoted field"
+        return
+
+    async for line in _import_lines(body, max_line_length):
+        row += 1
+        if line is None:
+            yield row, None, too_long
+            continue
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield row, None, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(record, dict):
+            yield row, None, "Expected a JSON object"
+            continue
+        yield row, record, None
+
+
+def validate_import_record(record: dict) -> TODOBase:
+    """
+    Validate an imported record against TODOBase.
+
+    Unknown keys such as an exported id or timestamps are ignored, so are empty values.
+    A missing description is stored as "", TODOResponse doesn't accept null. Items get
+    new ids on import.
+
+    Raises:
+        ValidationError: If the record isn't a valid TODO item.
+    """
+    return TODOBase.model_validate({"description": "", **{key: value for key, value in record.items() if key in IMPORT_FIELDS and value not in (None, "")}})
+
+
+def _import_error_detail(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(loc) for loc in err['loc'])}: {err['msg']}" for err in error.errors())
+
+
+def _import_failed(result: dict, rows: list[int], detail: str) -> None:
+    result["failed"] += len(rows)
+    room = TODO_IMPORT_MAX_ERRORS - len(result["errors"])
+    result["errors"].extend({"row": row, "detail": detail} for row in rows[:max(room, 0)])
+
+
+async def _import_chunk(result: dict, chunk: list[tuple[int, TODOBase]], db: DBSession, user_id: UUID) -> None:
+    try:
+        result["imported"] += await run_crud(db, copy_todo_data, copy_todo_data_async, todos=[todo for _, todo in chunk], user_id=user_id)
+    except (SQLAlchemyError, PsycopgError) as e:
+        # Only this chunk is rolled back, the ones before it are already committed
+        print(f"Database error when importing TODO items: {e}")
+        _import_failed(result, [row for row, _ in chunk], "Database error")
+
+
+async def import_todos_service(body: AsyncIterator[bytes], import_format: str, db: DBSession, user_id: UUID) -> dict:
+    """
+    Import TODO items from a streamed NDJSON or CSV body.
+
+    Rows are validated as they arrive and loaded with COPY in chunks of
+    TODO_IMPORT_CHUNK_SIZE, each committed on its own. Invalid rows, and the
+    rows of a chunk that failed to load, are reported without stopping the import.
+
+    Args:
+        body (AsyncIterator[bytes]): The request body.
+        import_format (str): "ndjson" or "csv".
+        db (DBSession): The database session.
+        user_id (UUID): The user's ID.
+
+    Returns:
+        dict: The imported and failed counts, and the first TODO_IMPORT_MAX_ERRORS row errors.
+    """
+    result = {"imported": 0, "failed": 0, "errors": []}
+    chunk: list[tuple[int, TODOBase]] = []
+    async for row, record, error in parse_import_records(body, import_format):
+        if error is None:
+            try:
+                chunk.append((row, validate_import_record(record)))
+            except ValidationError as e:
+                error = _import_error_detail(e)
+        if error is not None:
+            _import_failed(result, [row], error)
+        if len(chunk) >= TODO_IMPORT_CHUNK_SIZE:
+            await _import_chunk(result, chunk, db, user_id)
+            chunk = []
+    if chunk:
+        await _import_chunk(result, chunk, db, user_id)
+    return result
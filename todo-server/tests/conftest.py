@@ -0,0 +1,41 @@
+from contextlib import contextmanager
+import time
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.query_budget import QueryStats
+
+
+@pytest.fixture
+def query_budget():
+    """
+    Fail the test when a block runs more SQL statements than its budget, on any engine.
+
+        with query_budget(2):
+            client.get("/api/todos", headers=headers)
+    """
+    @contextmanager
+    def budget(max_queries: int):
+        stats = QueryStats()
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            context._query_budget_test_start = time.perf_counter()
+
+        def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            stats.record(statement, time.perf_counter() - context._query_budget_test_start)
+
+        event.listen(Engine, "before_cursor_execute", before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", after_cursor_execute)
+        try:
+            yield stats
+        finally:
+            event.remove(Engine, "before_cursor_execute", before_cursor_execute)
+            event.remove(Engine, "after_cursor_execute", after_cursor_execute)
+
+        if stats.count > max_queries:
+            statements = "\n".join(f"  {count}x {' '.join(statement.split())[:200]}" for statement, count in stats.statements.most_common())
+            pytest.fail(f"{stats.count} SQL statements, budget {max_queries}:\n{statements}")
+
+    return budget
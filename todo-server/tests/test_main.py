@@ -1,9 +1,34 @@
 from fastapi.testclient import TestClient
+from fastapi.exceptions import HTTPException
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch, AsyncMock, Mock
+import asyncio
+import time
+import threading
+import httpx
+from uuid import UUID
+from jose import jwt
 import requests
 import pytest
-from app.main import app
+from pydantic import ValidationError
+from app.main import app, get_stream_user_dep
 from app.core import settings
 from app.core.config_db import get_db
+from app.core.utils import verify_token_local
+from app.core.token_cache import TokenCache
+from app.core.http_client import AuthServerClient, CircuitBreaker
+from app.core.db_pool import StatsQueuePool
+from app.core.query_budget import QueryStats
+from app.crud import todo_stats_statements
+from app.service import run_crud, todo_changes_page, todo_events_service, format_export_rows, parse_import_records, validate_import_record
+from app.core.cursor import encode_cursor, decode_cursor, InvalidCursorError
+from app.core.etag import todo_etag, todo_item_etag, etag_matches
+from app.core.fast_json import paginated_todos_response
+from app.core.events import ChangeBroker, ChangeListener
+from app.models import TODO, PaginatedTodos
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import text
 from sqlmodel import SQLModel, create_engine, Session
 
 connection_string = str(settings.TEST_DB_URL).replace(
@@ -16,7 +41,8 @@ SQLModel.metadata.create_all(engine)
 
 
 def get_session_override():
-    with Session(engine) as session:
+    # Same session options as get_db, so query counts match production
+    with Session(engine, expire_on_commit=False) as session:
         return session
 
 app.dependency_overrides[get_db] = get_session_override
@@ -126,6 +152,36 @@ def test_get_todo_by_id_not_found(bearer, mock_todo_id):
     assert response.status_code == 404
     assert response.json() == {"detail": "Todo not found"}
 
+
+def test_get_todo_by_id_not_found_if_none_match_any(bearer, mock_todo_id):
+    response = client.get(
+        f"/api/todos/{mock_todo_id}", headers={"Authorization": f"Bearer {bearer}", "If-None-Match": "*"}
+    )
+
+    assert response.status_code == 404
+
+
+def test_get_todo_by_id_etag(bearer):
+    headers = {"Authorization": f"Bearer {bearer}"}
+    todo_id = client.post("/api/todos", headers=headers, json={"title": "Coaster Cast"}).json()["id"]
+
+    response = client.get(f"/api/todos/{todo_id}", headers=headers)
+    etag = response.headers["ETag"]
+    assert response.status_code == 200
+    assert client.get(f"/api/todos/{todo_id}", headers={**headers, "If-None-Match": etag}).status_code == 304
+    assert client.get(f"/api/todos/{todo_id}", headers={**headers, "If-None-Match": "*"}).status_code == 304
+
+    # Another TODO of the same user doesn't change this one's ETag
+    other_id = client.post("/api/todos", headers=headers, json={"title": "Other"}).json()["id"]
+    assert client.get(f"/api/todos/{todo_id}", headers={**headers, "If-None-Match": etag}).status_code == 304
+
+    assert client.patch(f"/api/todos/{todo_id}", headers=headers, json={"title": "Coaster Cast", "completed": True}).status_code == 200
+    response = client.get(f"/api/todos/{todo_id}", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200 and response.headers["ETag"] != etag
+
+    client.delete(f"/api/todos/{todo_id}", headers=headers)
+    client.delete(f"/api/todos/{other_id}", headers=headers)
+
 # DELETE /api/todos/{todo_id}
 
 
@@ -298,3 +354,670 @@ def test_create_todo_valid(bearer):
             }
         ]
     }
+
+
+def test_create_todo_without_description_and_patch(bearer):
+    headers = {"Authorization": f"Bearer {bearer}"}
+    response = client.post("/api/todos", headers=headers, json={"title": "Coaster Cast"})
+
+    assert response.status_code == 201
+    assert response.json()["description"] is None
+    todo_id = response.json()["id"]
+
+    response = client.patch(f"/api/todos/{todo_id}", headers=headers, json={"title": "Coaster Cast", "completed": True})
+
+    assert response.status_code == 200
+    assert response.json()["description"] is None and response.json()["completed"] is True
+    client.delete(f"/api/todos/{todo_id}", headers=headers)
+
+
+# Local token verification
+
+
+def make_token(secret: str, claims: dict, expires_delta: timedelta = timedelta(minutes=1)):
+    to_encode = claims.copy()
+    to_encode.update({"exp": datetime.now(timezone.utc) + expires_delta})
+    return jwt.encode(to_encode, secret, algorithm="HS256")
+
+
+def test_verify_token_local():
+    user_id = UUID("123e4567-e89b-12d3-a456-426655440000")
+    token = make_token("testsecret", {"sub": "test", "id": str(user_id)})
+
+    with patch('app.core.utils.SECRET_KEY', "testsecret"), patch('app.core.utils.ALGORITHM', "HS256"):
+        assert verify_token_local(token) == user_id
+
+
+@pytest.mark.parametrize("secret, claims, expires_delta", [
+    ("othersecret", {"id": "123e4567-e89b-12d3-a456-426655440000"}, timedelta(minutes=1)),
+    ("testsecret", {"id": "123e4567-e89b-12d3-a456-426655440000"}, timedelta(minutes=-1)),
+    ("testsecret", {"sub": "test"}, timedelta(minutes=1)),
+    ("testsecret", {"id": "not-a-uuid"}, timedelta(minutes=1)),
+])
+def test_verify_token_local_invalid(secret, claims, expires_delta):
+    token = make_token(secret, claims, expires_delta)
+
+    with patch('app.core.utils.SECRET_KEY', "testsecret"), patch('app.core.utils.ALGORITHM', "HS256"):
+        with pytest.raises(HTTPException) as exc_info:
+            verify_token_local(token)
+
+    assert exc_info.value.status_code == 401
+    assert exc_info.value.detail == "Invalid authentication credentials"
+
+
+# Token cache
+
+
+def test_token_cache_hit_until_exp():
+    cache = TokenCache(maxsize=10, negative_ttl=5)
+    loader = AsyncMock(return_value="123e4567-e89b-12d3-a456-426655440000")
+    token = make_token("testsecret", {"id": "123e4567-e89b-12d3-a456-426655440000"})
+
+    async def resolve_twice():
+        return [await cache.resolve(token, loader) for _ in range(2)]
+
+    assert asyncio.run(resolve_twice()) == ["123e4567-e89b-12d3-a456-426655440000"] * 2
+
+    loader.assert_awaited_once_with(token)
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_token_cache_negative():
+    cache = TokenCache(maxsize=10, negative_ttl=5)
+    loader = AsyncMock(side_effect=HTTPException(status_code=401, detail="Invalid authentication credentials"))
+    token = make_token("testsecret", {"id": "123e4567-e89b-12d3-a456-426655440000"})
+
+    for _ in range(2):
+        with pytest.raises(HTTPException):
+            asyncio.run(cache.resolve(token, loader))
+
+    loader.assert_awaited_once_with(token)
+    assert cache.stats()["negative_hits"] == 1
+
+
+def test_token_cache_coalesces_concurrent_lookups():
+    cache = TokenCache(maxsize=10, negative_ttl=5)
+    calls = []
+
+    async def loader(token):
+        calls.append(token)
+        await asyncio.sleep(0.01)
+        return "123e4567-e89b-12d3-a456-426655440000"
+
+    token = make_token("testsecret", {"id": "123e4567-e89b-12d3-a456-426655440000"})
+
+    async def resolve_concurrently():
+        return await asyncio.gather(*(cache.resolve(token, loader) for _ in range(4)))
+
+    assert asyncio.run(resolve_concurrently()) == ["123e4567-e89b-12d3-a456-426655440000"] * 4
+    assert len(calls) == 1
+    assert cache.stats()["coalesced"] == 3
+
+
+def test_token_cache_bounded():
+    cache = TokenCache(maxsize=2, negative_ttl=5)
+
+    async def loader(token):
+        return token
+
+    for i in range(3):
+        asyncio.run(cache.resolve(make_token("testsecret", {"id": str(i)}), loader))
+
+    assert cache.stats()["size"] == 2
+
+
+# Auth server client
+
+
+def test_circuit_breaker_opens_and_half_opens():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+    for _ in range(2):
+        assert breaker.allow_request()
+        breaker.record_failure()
+
+    assert breaker.state == "open"
+    assert not breaker.allow_request()
+
+    with patch('app.core.http_client.time.monotonic', return_value=time.monotonic() + 31):
+        assert breaker.state == "half-open"
+        assert breaker.allow_request()
+        assert not breaker.allow_request()
+
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def test_auth_client_closes_client_of_previous_loop():
+    client = AuthServerClient("http://auth-server")
+
+    async def get_client():
+        return client._get_client()
+
+    # A client created on a loop that keeps running in another thread
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever)
+    thread.start()
+    try:
+        old = asyncio.run_coroutine_threadsafe(get_client(), loop).result()
+        new = asyncio.run(get_client())
+        # The close was scheduled on the old loop, wait for it there
+        deadline = time.monotonic() + 5
+        while not old.is_closed and time.monotonic() < deadline:
+            asyncio.run_coroutine_threadsafe(asyncio.sleep(0.01), loop).result()
+        assert old.is_closed
+        assert new is not old and not new.is_closed
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+
+def test_auth_client_retries_then_fails_fast():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(502, text="Bad Gateway")
+
+    client = AuthServerClient("http://auth-server")
+    client.retries = 1
+    client.retry_backoff = 0
+    client.breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+
+    async def call_twice():
+        client._client = httpx.AsyncClient(base_url=client.base_url, transport=httpx.MockTransport(handler))
+        client._loop = asyncio.get_running_loop()
+        response = await client.get("/api/users/me")
+        assert response.status_code == 502
+        with pytest.raises(HTTPException) as exc_info:
+            await client.get("/api/users/me")
+        await client.aclose()
+        return exc_info.value
+
+    error = asyncio.run(call_twice())
+    assert error.status_code == 503
+    assert len(calls) == 2
+
+
+# Sync / async session dispatch
+
+
+def test_run_crud_uses_async_variant_for_async_session():
+    db = Mock(spec=AsyncSession)
+    sync_fn = Mock()
+    async_fn = AsyncMock(return_value="async")
+
+    assert asyncio.run(run_crud(db, sync_fn, async_fn, user_id="user")) == "async"
+    async_fn.assert_awaited_once_with(db=db, user_id="user")
+    sync_fn.assert_not_called()
+
+
+def test_run_crud_uses_sync_variant_for_session():
+    db = Mock(spec=Session)
+    sync_fn = Mock(return_value="sync")
+    async_fn = AsyncMock()
+
+    assert asyncio.run(run_crud(db, sync_fn, async_fn, user_id="user")) == "sync"
+    sync_fn.assert_called_once_with(db=db, user_id="user")
+    async_fn.assert_not_awaited()
+
+
+# Keyset pagination cursors
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2024, 3, 1, 12, 30, 15, 123456)
+    todo_id = UUID("1973c28c-7dc5-4a57-8a4c-b5db155621f2")
+
+    cursor = encode_cursor(created_at, todo_id)
+
+    assert decode_cursor(cursor, datetime, UUID) == (created_at, todo_id)
+
+
+@pytest.mark.parametrize("cursor", ["garbage", encode_cursor("not-a-date", "not-a-uuid"), encode_cursor(1)])
+def test_cursor_invalid(cursor):
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(cursor, datetime, UUID)
+
+
+def test_get_todos_invalid_cursor(bearer):
+    response = client.get(
+        "/api/todos?cursor=garbage", headers={"Authorization": f"Bearer {bearer}"}
+    )
+
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Invalid cursor"}
+
+
+# /api/todos/batch
+
+
+def test_create_todos_batch_unauthorized():
+    response = client.post("/api/todos/batch", json=[{"title": "Coaster Cast"}])
+
+    assert response.status_code == 401
+    assert response.json() == {"detail": "Not authenticated"}
+
+
+def test_create_todos_batch_empty(bearer):
+    response = client.post(
+        "/api/todos/batch", headers={"Authorization": f"Bearer {bearer}"}, json=[]
+    )
+
+    assert response.status_code == 422
+    assert response.json() == {"detail": "Batch is empty"}
+
+
+def test_update_todos_batch_duplicate_ids(bearer, mock_todo_id):
+    response = client.patch(
+        "/api/todos/batch",
+        headers={"Authorization": f"Bearer {bearer}"},
+        json=[{"id": mock_todo_id, "title": "One"}, {"id": mock_todo_id, "title": "Two"}],
+    )
+
+    assert response.status_code == 422
+    assert response.json() == {"detail": "Batch has duplicate ids"}
+
+
+def test_update_todos_batch_null_title(bearer, mock_todo_id):
+    # description may be cleared with null, title & completed may not
+    response = client.patch(
+        "/api/todos/batch",
+        headers={"Authorization": f"Bearer {bearer}"},
+        json=[{"id": mock_todo_id, "title": None, "description": None}],
+    )
+
+    assert response.status_code == 422
+    assert response.json() == {"detail": f"title and completed can't be null for todo {mock_todo_id}"}
+
+
+def test_delete_todos_batch_notfound(bearer, mock_todo_id):
+    response = client.request(
+        "DELETE",
+        "/api/todos/batch",
+        headers={"Authorization": f"Bearer {bearer}"},
+        json={"ids": [mock_todo_id]},
+    )
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "results": [{"id": mock_todo_id, "status": 404, "todo": None, "detail": "Todo not found"}]
+    }
+
+
+# /api/todos/stats
+
+
+def test_get_todo_stats_unauthorized():
+    response = client.get("/api/todos/stats")
+
+    assert response.status_code == 401
+    assert response.json() == {"detail": "Not authenticated"}
+
+
+def test_todo_stats_statements():
+    user_id = UUID("123e4567-e89b-12d3-a456-426655440000")
+    monday, tuesday = datetime(2024, 3, 4, 9, 0), datetime(2024, 3, 5, 9, 0)
+
+    # Editing an open item's title changes no counts
+    assert todo_stats_statements(user_id, [(False, None)], [(False, None)]) == []
+    # Creating an open item only changes todo_stats
+    assert len(todo_stats_statements(user_id, [], [(False, None)])) == 1
+    # Completing an item changes todo_stats and the day it was completed on
+    assert len(todo_stats_statements(user_id, [(False, None)], [(True, tuesday)])) == 2
+    # Deleting a completed item takes it off both
+    assert len(todo_stats_statements(user_id, [(True, monday)], [])) == 2
+
+    # A completed item deleted & another created completed on the same day cancel out
+    day_rows = todo_stats_statements(user_id, [(True, monday)], [(True, datetime(2024, 3, 4, 17, 0))])
+    assert day_rows == []
+    day_rows = todo_stats_statements(user_id, [(True, monday)], [(True, tuesday)])[0].compile().params
+    assert day_rows["day_m0"] == monday.date() and day_rows["completions_m0"] == -1
+    assert day_rows["day_m1"] == tuesday.date() and day_rows["completions_m1"] == 1
+
+
+# /metrics
+
+
+def test_metrics():
+    client.get("/api/todos/1973c28c-7dc5-4a57-8a4c-b5db155621f2")
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    # Labeled with the route template, not the id
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/todos/{todo_id}",status="401"}' in response.text
+    assert 'db_pool_size{engine="sync"}' in response.text
+
+def test_internal_endpoints_disabled_by_default():
+    assert client.get("/api/internal/token-cache").status_code == 404
+    assert client.get("/api/internal/db-pool").status_code == 404
+
+
+def test_internal_endpoints_enabled():
+    with patch.object(settings, "INTERNAL_ENDPOINTS", True):
+        assert "hits" in client.get("/api/internal/token-cache").json()
+        assert "sync" in client.get("/api/internal/db-pool").json()
+
+
+# Query budgets, a new statement on these paths is a round trip on every request
+
+
+def test_get_todos_query_budget(bearer, query_budget):
+    # TODO version for the ETag, one page
+    with query_budget(2):
+        response = client.get("/api/todos", headers={"Authorization": f"Bearer {bearer}"})
+
+    assert response.status_code == 200
+
+
+def test_create_todo_query_budget(bearer, query_budget):
+    # INSERT ... RETURNING, version bump & NOTIFY, stats upsert
+    with query_budget(3):
+        response = client.post("/api/todos", json={"title": "Coaster Cast", "description": "Budget"}, headers={"Authorization": f"Bearer {bearer}"})
+
+    assert response.status_code == 201
+    client.delete(f"/api/todos/{response.json()['id']}", headers={"Authorization": f"Bearer {bearer}"})
+
+
+def test_query_budget_fails_over_budget(query_budget):
+    with pytest.raises(pytest.fail.Exception, match="2 SQL statements, budget 1"):
+        with query_budget(1):
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+                conn.execute(text("SELECT 1"))
+
+
+def test_query_stats_repeated():
+    stats = QueryStats()
+    for _ in range(3):
+        stats.record("SELECT * FROM todo WHERE id = %(id)s", 0.001)
+    stats.record("SELECT 1", 0.001)
+
+    assert stats.count == 4
+    assert stats.repeated(3) == [("SELECT * FROM todo WHERE id = %(id)s", 3)]
+
+
+# Connection pool stats
+
+
+def test_stats_queue_pool_counts_checkouts_and_timeouts():
+    pool = StatsQueuePool(lambda: Mock(), pool_size=1, max_overflow=0, timeout=0.01)
+
+    held = pool.connect()
+    assert pool.stats()["checked_out"] == 1
+    with pytest.raises(PoolTimeoutError):
+        pool.connect()
+    held.close()
+
+    stats = pool.stats()
+    assert stats["checked_out"] == 0 and stats["checked_in"] == 1
+    assert stats["checkouts"] == 2 and stats["checkout_timeouts"] == 1
+    assert stats["wait_seconds_max"] >= 0.01
+
+
+# /api/todos/changes
+
+
+def test_get_todo_changes_unauthorized():
+    response = client.get("/api/todos/changes")
+
+    assert response.status_code == 401
+    assert response.json() == {"detail": "Not authenticated"}
+
+
+def test_todo_changes_page():
+    user_id = UUID("123e4567-e89b-12d3-a456-426655440000")
+    start = (datetime(2024, 3, 1, 12, 0), UUID(int=0))
+    todos = [TODO(title=f"Todo {i}", id=UUID(int=i), user_id=user_id, updated_at=datetime(2024, 3, 1, 12, i)) for i in (1, 3)]
+    tombstones = [Mock(id=UUID(int=2), deleted_at=datetime(2024, 3, 1, 12, 2))]
+
+    # Changes & tombstones are merged in time order, the cursor is the last one on a full page
+    page = todo_changes_page(todos, tombstones, start, 2, datetime(2024, 3, 1, 13, 0))
+    assert [todo.id for todo in page["todos"]] == [UUID(int=1)]
+    assert page["deleted"] == [{"id": UUID(int=2), "deleted_at": datetime(2024, 3, 1, 12, 2)}]
+    assert page["has_more"] is True
+    assert decode_cursor(page["next_cursor"], datetime, UUID) == (datetime(2024, 3, 1, 12, 2), UUID(int=2))
+
+    # Caught up, the cursor trails the settle point but never goes back past the client's cursor
+    page = todo_changes_page(todos, tombstones, start, 10, datetime(2024, 3, 1, 12, 2, 30))
+    assert page["has_more"] is False
+    assert decode_cursor(page["next_cursor"], datetime, UUID) == (datetime(2024, 3, 1, 12, 2, 30), UUID(int=0))
+    page = todo_changes_page([], [], start, 10, datetime(2024, 3, 1, 11, 0))
+    assert decode_cursor(page["next_cursor"], datetime, UUID) == start
+
+
+# /api/todos/events
+
+
+def test_todo_events_unauthorized():
+    response = client.get("/api/todos/events")
+
+    assert response.status_code == 401
+    assert response.json() == {"detail": "Not authenticated"}
+
+
+def test_todo_events_query_token_invalid():
+    response = client.get("/api/todos/events", params={"access_token": "invalid"})
+
+    assert response.status_code == 401
+
+
+def test_get_stream_user_dep_accepts_header_or_query_token():
+    user_id = UUID("123e4567-e89b-12d3-a456-426655440000")
+
+    with patch("app.main.get_current_user_dep", new=AsyncMock(return_value=user_id)) as get_user:
+        assert asyncio.run(get_stream_user_dep("header-token", "query-token")) == user_id
+        get_user.assert_awaited_with("header-token")
+        assert asyncio.run(get_stream_user_dep(None, "query-token")) == user_id
+        get_user.assert_awaited_with("query-token")
+        with pytest.raises(HTTPException) as exc_info:
+            asyncio.run(get_stream_user_dep(None, None))
+        assert exc_info.value.status_code == 401
+
+
+def test_change_broker_fans_out_per_user_and_keeps_latest():
+    user_id = UUID("123e4567-e89b-12d3-a456-426655440000")
+    other_user_id = UUID("223e4567-e89b-12d3-a456-426655440000")
+
+    async def scenario():
+        broker = ChangeBroker()
+        first, second, other = broker.subscribe(user_id), broker.subscribe(user_id), broker.subscribe(other_user_id)
+        broker.publish(user_id, {"version": 1})
+        broker.publish(user_id, {"version": 2})
+        assert first.get_nowait() == second.get_nowait() == {"version": 2}
+        assert other.empty()
+
+        broker.unsubscribe(user_id, first)
+        broker.unsubscribe(user_id, second)
+        assert broker.subscriber_count == 1
+        broker.publish_all({"version": None})
+        assert other.get_nowait() == {"version": None}
+
+    asyncio.run(scenario())
+
+
+def test_change_listener_dispatch():
+    broker = Mock()
+    listener = ChangeListener("postgresql://", broker)
+
+    listener.dispatch('{"user_id": "123e4567-e89b-12d3-a456-426655440000", "version": 7}')
+    listener.dispatch("not json")
+    listener.dispatch('{"version": 8}')
+
+    broker.publish.assert_called_once_with(UUID("123e4567-e89b-12d3-a456-426655440000"), {"version": 7})
+
+
+def test_todo_events_service():
+    user_id = UUID("123e4567-e89b-12d3-a456-426655440000")
+
+    async def scenario():
+        queue = asyncio.Queue()
+        await queue.put({"version": 4})
+        events = todo_events_service(user_id, queue, 3)
+        assert await events.__anext__() == 'id: 3\nevent: todos\ndata: {"version": 3}\n\n'
+        assert await events.__anext__() == 'id: 4\nevent: todos\ndata: {"version": 4}\n\n'
+        await events.aclose()
+
+    asyncio.run(scenario())
+
+
+# /api/todos/search
+
+
+def test_search_todos_unauthorized():
+    response = client.get("/api/todos/search", params={"q": "coaster"})
+
+    assert response.status_code == 401
+    assert response.json() == {"detail": "Not authenticated"}
+
+
+# /api/todos/export
+
+
+def test_export_todos_unauthorized():
+    response = client.get("/api/todos/export")
+
+    assert response.status_code == 401
+    assert response.json() == {"detail": "Not authenticated"}
+
+
+def test_format_export_rows():
+    row = Mock(_mapping={
+        "title": "Coaster, Cast",
+        "description": "cold",
+        "completed": False,
+        "id": UUID("1973c28c-7dc5-4a57-8a4c-b5db155621f2"),
+        "updated_at": datetime(2024, 3, 1, 12, 0),
+        "created_at": datetime(2024, 3, 1, 12, 0),
+        "completed_at": None,
+        "user_id": UUID("123e4567-e89b-12d3-a456-426655440000"),
+    })
+
+    assert format_export_rows([row], "ndjson") == (
+        '{"title": "Coaster, Cast", "description": "cold", "completed": false, '
+        '"id": "1973c28c-7dc5-4a57-8a4c-b5db155621f2", "updated_at": "2024-03-01T12:00:00", '
+        '"created_at": "2024-03-01T12:00:00", "completed_at": null, "user_id": "123e4567-e89b-12d3-a456-426655440000"}\n'
+    )
+    assert format_export_rows([row], "csv", header=True) == (
+        "title,description,completed,id,updated_at,created_at,completed_at,user_id\r\n"
+        '"Coaster, Cast",cold,False,1973c28c-7dc5-4a57-8a4c-b5db155621f2,2024-03-01T12:00:00,'
+        "2024-03-01T12:00:00,,123e4567-e89b-12d3-a456-426655440000\r\n"
+    )
+
+
+# /api/todos/import
+
+
+def test_import_todos_unauthorized():
+    response = client.post("/api/todos/import", content=b'{"title": "Coaster Cast"}\n')
+
+    assert response.status_code == 401
+    assert response.json() == {"detail": "Not authenticated"}
+
+
+async def _collect_records(chunks, import_format, **kwargs):
+    async def body():
+        for chunk in chunks:
+            yield chunk
+    return [record async for record in parse_import_records(body(), import_format, **kwargs)]
+
+
+def test_parse_import_records_ndjson():
+    # "é" is split across chunks, rows are numbered by line including blank ones
+    chunks = [b'{"title": "caf\xc3', b'\xa9"}\n\nnot json\n[1]\n{"title": "last"}']
+    records = asyncio.run(_collect_records(chunks, "ndjson"))
+
+    assert [(row, record) for row, record, _ in records] == [(1, {"title": "café"}), (3, None), (4, None), (5, {"title": "last"})]
+    assert records[1][2].startswith("Invalid JSON")
+    assert records[2][2] == "Expected a JSON object"
+
+
+def test_parse_import_records_csv():
+    chunks = [b'title,description,completed\r\n"two\nlines, one field",d,', b'true\r\nshort,row\r\n']
+    records = asyncio.run(_collect_records(chunks, "csv"))
+
+    assert records == [
+        (1, {"title": "two\nlines, one field", "description": "d", "completed": "true"}, None),
+        (2, None, "Expected 3 fields, got 2"),
+    ]
+
+
+def test_parse_import_records_line_too_long():
+    # The long line arrives over several chunks and is dropped, not buffered, the rows after it still import
+    chunks = [b'{"title": "a"}\n{"title": "', b"x" * 40, b"x" * 40, b'"}\n{"title": "b"}\n', b'{"title": "' + b"y" * 40 + b'"}']
+    records = asyncio.run(_collect_records(chunks, "ndjson", max_line_length=32))
+
+    assert records == [(1, {"title": "a"}, None), (2, None, "Longer than 32 characters"), (3, {"title": "b"}, None),
+                       (4, None, "Longer than 32 characters")]
+
+
+def test_parse_import_records_csv_record_too_long():
+    chunks = [b'title,description\nshort,row\n"', b"x\n" * 40, b'",d\nnever,read\n']
+    records = asyncio.run(_collect_records(chunks, "csv", max_line_length=32))
+
+    assert records == [(1, {"title": "short", "description": "row"}, None), (2, None, "Longer than 32 characters, import stopped")]
+
+
+def test_validate_import_record():
+    todo = validate_import_record({"title": "Coaster Cast", "description": "", "completed": "False", "id": "ignored"})
+
+    assert todo.title == "Coaster Cast"
+    assert todo.description == ""
+    assert todo.completed is False
+    with pytest.raises(ValidationError):
+        validate_import_record({"description": "no title"})
+
+
+# ETags
+
+
+def test_todo_etag():
+    user_id = UUID("123e4567-e89b-12d3-a456-426655440000")
+    other_user_id = UUID("223e4567-e89b-12d3-a456-426655440000")
+
+    assert todo_etag(user_id, 3) == todo_etag(user_id, 3)
+    assert todo_etag(user_id, 3) != todo_etag(user_id, 4)
+    assert todo_etag(user_id, 3) != todo_etag(other_user_id, 3)
+    assert todo_etag(user_id, 3).startswith('"') and todo_etag(user_id, 3).endswith('"')
+
+
+def test_todo_item_etag():
+    todo_id = UUID("1973c28c-7dc5-4a57-8a4c-b5db155621f2")
+    other_todo_id = UUID("2973c28c-7dc5-4a57-8a4c-b5db155621f2")
+    updated_at = datetime(2024, 3, 1, 12, 0, 0, 123456)
+
+    assert todo_item_etag(todo_id, updated_at) == todo_item_etag(todo_id, updated_at)
+    assert todo_item_etag(todo_id, updated_at) != todo_item_etag(todo_id, datetime(2024, 3, 1, 12, 0, 0, 123457))
+    assert todo_item_etag(todo_id, updated_at) != todo_item_etag(other_todo_id, updated_at)
+
+
+@pytest.mark.parametrize("if_none_match, expected", [
+    (None, False),
+    ('"abc"', True),
+    ('W/"abc"', True),
+    ('"xyz", "abc"', True),
+    ("*", True),
+    ('"xyz"', False),
+    ("abc", False),
+])
+def test_etag_matches(if_none_match, expected):
+    assert etag_matches(if_none_match, '"abc"') is expected
+
+
+# FAST_JSON
+
+
+def test_paginated_todos_response_matches_response_model():
+    todos = [
+        TODO(title="Coaster Cast", description="cold", completed=True,
+             id=UUID("1973c28c-7dc5-4a57-8a4c-b5db155621f2"), user_id=UUID("123e4567-e89b-12d3-a456-426655440000"),
+             created_at=datetime(2024, 3, 1, 12, 0), updated_at=datetime(2024, 3, 1, 12, 0, 0, 123456)),
+    ]
+    paginated = {"count": 1, "next": None, "previous": None, "next_cursor": "abc", "todos": todos}
+    response = paginated_todos_response(paginated, headers={"ETag": '"abc"'})
+
+    assert response.headers["ETag"] == '"abc"'
+    assert response.body == PaginatedTodos.model_validate(paginated).model_dump_json().encode()
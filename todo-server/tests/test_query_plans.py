@@ -0,0 +1,143 @@
+from datetime import date, datetime
+from concurrent.futures import ThreadPoolExecutor
+from uuid import UUID, uuid4
+import json
+import time
+import pytest
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+from sqlmodel import SQLModel, create_engine
+
+from app.core import settings
+from app.models import TODOFilter
+from app.crud import todos_page_query, todos_export_query, todos_search_query, todo_query, todo_version_query, todo_stats_query, todo_completion_days_query, todo_changes_query, todo_tombstones_query, todo_tombstone_statements, todo_update_statement, todo_delete_statement, batch_update_statements, batch_delete_statement
+
+# EXPLAIN every query in app/crud.py against a local Postgres and fail on plans
+# that scan the whole todo table or sort it. Seq scans and sorts are disabled for
+# the planner, so it only falls back to them when no index can serve the query.
+
+pytestmark = pytest.mark.skipif(not str(settings.PLAN_TEST_DB_URL), reason="PLAN_TEST_DB_URL is not set")
+
+user_id = UUID("123e4567-e89b-12d3-a456-426655440000")
+todo_id = UUID("1973c28c-7dc5-4a57-8a4c-b5db155621f2")
+
+
+@pytest.fixture(scope="module")
+def engine():
+    connection_string = str(settings.PLAN_TEST_DB_URL).replace(
+        "postgresql", "postgresql+psycopg")
+    engine = create_engine(connection_string)
+    SQLModel.metadata.drop_all(engine)
+    SQLModel.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+def explain(engine, query, setup: tuple = ()) -> dict:
+    compiled = query.compile(dialect=postgresql.psycopg.dialect(), compile_kwargs={"render_postcompile": True})
+    with engine.connect() as conn:
+        # Rolled back with the rest of the transaction
+        for statement in setup:
+            conn.execute(statement)
+        conn.execute(text("SET LOCAL enable_seqscan = off"))
+        conn.execute(text("SET LOCAL enable_sort = off"))
+        result = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params).scalar()
+        conn.rollback()
+    plan = result if isinstance(result, list) else json.loads(result)
+    return plan[0]["Plan"]
+
+
+def plan_nodes(plan: dict):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+QUERIES = {
+    "get_all_todo_data": todos_page_query(user_id, 0, 10),
+    "get_all_todo_data_deep_page": todos_page_query(user_id, 5000, 100),
+    "get_all_todo_data_cursor": todos_page_query(user_id, 0, 10, (datetime(2024, 3, 1), todo_id)),
+    "get_all_todo_data_open": todos_page_query(user_id, 0, 10, filters=TODOFilter(completed=False)),
+    "get_all_todo_data_completed": todos_page_query(user_id, 0, 10, filters=TODOFilter(completed=True)),
+    "get_all_todo_data_created_range": todos_page_query(user_id, 0, 10, filters=TODOFilter(created_after=datetime(2024, 3, 1), created_before=datetime(2024, 4, 1))),
+    "get_all_todo_data_updated_desc": todos_page_query(user_id, 0, 10, filters=TODOFilter(sort="-updated_at")),
+    "get_all_todo_data_updated_desc_cursor": todos_page_query(user_id, 0, 10, (datetime(2024, 3, 1), todo_id), TODOFilter(sort="-updated_at")),
+    "get_single_todo_data": todo_query(todo_id, user_id),
+    "export_todo_data": todos_export_query(user_id),
+    "get_todo_version": todo_version_query(user_id),
+    "get_todo_stats": todo_stats_query(user_id),
+    "get_todo_stats_completion_days": todo_completion_days_query(user_id, date(2024, 3, 1)),
+    "get_todo_changes": todo_changes_query(user_id, (datetime(2024, 3, 1), todo_id), 101),
+    "get_todo_changes_tombstones": todo_tombstones_query(user_id, (datetime(2024, 3, 1), todo_id), 101),
+    "delete_todo_data_prune_tombstones": todo_tombstone_statements(user_id, [todo_id])[1],
+    "update_todo_data": todo_update_statement(todo_id, user_id, {"title": "Coaster Cast"}),
+    "delete_todo_data": todo_delete_statement(todo_id, user_id),
+    "update_todo_batch_data": batch_update_statements([{"id": todo_id, "completed": True}], user_id)[0],
+    "delete_todo_batch_data": batch_delete_statement([todo_id], user_id),
+}
+
+
+@pytest.mark.parametrize("name", QUERIES)
+def test_query_plan_uses_index(engine, name):
+    nodes = [node["Node Type"] for node in plan_nodes(explain(engine, QUERIES[name]))]
+
+    assert "Seq Scan" not in nodes, f"{name} scans the todo table: {nodes}"
+    assert "Sort" not in nodes and "Incremental Sort" not in nodes, f"{name} sorts the todo table: {nodes}"
+
+
+def test_search_query_plan_uses_gin_index(engine):
+    # With a handful of items the user_id index is cheaper, the GIN index pays off on long lists.
+    # Ranked results are sorted after matching, so only the match has to come from an index
+    setup = (
+        text("INSERT INTO todo (id, title, description, completed, updated_at, created_at, user_id) "
+             "SELECT gen_random_uuid(), 'todo ' || i, 'description ' || i, false, now(), now(), :user_id "
+             "FROM generate_series(1, 5000) AS i").bindparams(user_id=user_id),
+        text("ANALYZE todo"),
+    )
+    nodes = list(plan_nodes(explain(engine, todos_search_query(user_id, "coaster cast", 10), setup)))
+
+    assert "Seq Scan" not in [node["Node Type"] for node in nodes]
+    assert "ix_todo_search_vector" in [node.get("Index Name") for node in nodes]
+
+
+def test_open_todos_query_plan_uses_partial_index(engine):
+    # Mostly completed items, the open ones are a small slice of the user's list
+    setup = (
+        text("INSERT INTO todo (id, title, description, completed, updated_at, created_at, user_id) "
+             "SELECT gen_random_uuid(), 'todo ' || i, 'description ' || i, i % 20 <> 0, now(), now(), :user_id "
+             "FROM generate_series(1, 5000) AS i").bindparams(user_id=user_id),
+        text("ANALYZE todo"),
+    )
+    query = todos_page_query(user_id, 0, 10, filters=TODOFilter(completed=False))
+    nodes = list(plan_nodes(explain(engine, query, setup)))
+
+    assert "ix_todo_open_user_id_created_at_id" in [node.get("Index Name") for node in nodes]
+
+
+@pytest.mark.parametrize("statement", [
+    lambda item_id: todo_update_statement(item_id, user_id, {"completed": True}),
+    lambda item_id: batch_update_statements([{"id": item_id, "completed": True}], user_id)[0],
+], ids=["update_todo_data", "update_todo_batch_data"])
+def test_concurrent_completes_count_once(engine, statement):
+    # Two requests completing the same item: the second waits on the first's lock and has to see
+    # its result, otherwise both report was_completed = false and the stats count it twice
+    item_id = uuid4()
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO todo (id, title, completed, updated_at, created_at, user_id) "
+                          "VALUES (:id, 'todo', false, now(), now(), :user_id)").bindparams(id=item_id, user_id=user_id))
+
+    def complete(conn):
+        return conn.execute(statement(item_id)).one()._mapping
+
+    try:
+        with engine.connect() as first, engine.connect() as second, ThreadPoolExecutor(max_workers=1) as executor:
+            assert complete(first)["was_completed"] is False
+            waiting = executor.submit(complete, second)
+            time.sleep(0.2)
+            assert not waiting.done(), "the second update didn't wait for the first"
+            first.commit()
+            assert waiting.result(timeout=5)["was_completed"] is True
+            second.commit()
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text("DELETE FROM todo WHERE id = :id").bindparams(id=item_id))